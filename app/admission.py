@@ -0,0 +1,274 @@
+# ------------------------------------------------------------------------------------------------------------------------------------------------------------------
+# MODULE : ADMISSION
+# Description : Contrôle d'admission des requêtes d'analyse, échéances (deadlines) et délestage en cas de surcharge.
+#
+# Objectif :
+#  - Sans limite, uvicorn accepte toutes les requêtes et les empile derrière les étapes NER (CPU) : en rafale,
+#    la latence p99 grandit sans borne et les clients abandonnent avant la réponse... dont le calcul est
+#    quand même fait, pour rien.
+#  - Au plus max_concurrent requêtes dans le pipeline par worker ; au-delà, file d'attente bornée (max_queue).
+#      - File pleine                      -> 429 immédiat, avec Retry-After.
+#      - Attente en file > queue_timeout  -> 503, avec Retry-After.
+#  - Échéance par requête : en-tête (X-Request-Timeout-Ms par défaut) = budget en millisecondes à partir
+#    de la réception. Une fois l'échéance passée, les étapes suivantes ne sont pas lancées, le travail encore
+#    en file (pool des détecteurs, micro-batcher) est annulé, et la requête reçoit un 503.
+#
+# Remarque :
+#  - Une inférence déjà commencée n'est pas interrompue (elle sert aussi les autres requêtes du lot) :
+#    seul son résultat est abandonné.
+#  - Les compteurs (requêtes actives, en file, refus par motif, échéances dépassées par étape) sont exposés
+#    dans /metrics ; le temps passé en file est l'étape "admission" de desens_stage_duration_seconds.
+#  - Section 'admission' de settings.json : enabled, max_concurrent, max_queue, queue_timeout_ms,
+#    retry_after_seconds, deadline_header, default_timeout_ms (0 = pas d'échéance par défaut).
+#  - Un lot (/sanitize-batch) compte pour une requête.
+# ------------------------------------------------------------------------------------------------------------------------------------------------------------------
+
+import asyncio
+import time
+from collections import deque
+from concurrent.futures import Future
+from contextlib import asynccontextmanager
+from typing import Any, Deque, Dict, Mapping, Optional, Tuple
+
+from app.config import get_admission_config
+from app.metrics import observe_stage, record_deadline_exceeded, record_rejected, register_callback
+
+# Valeurs par défaut si la section 'admission' de settings.json est incomplète
+DEFAULT_MAX_CONCURRENT = 16
+DEFAULT_MAX_QUEUE = 64
+DEFAULT_QUEUE_TIMEOUT_MS = 2_000
+DEFAULT_RETRY_AFTER_SECONDS = 1
+DEFAULT_DEADLINE_HEADER = "X-Request-Timeout-Ms"
+
+
+# ---------------------------------------------------------------------------------
+#                      ERREURS
+# ---------------------------------------------------------------------------------
+# Converties en réponse HTTP (statut + Retry-After) par le gestionnaire d'exceptions de main.py.
+
+class AdmissionRejected(Exception):
+
+    def __init__(self, status_code: int, reason: str, detail: str, retry_after: int = DEFAULT_RETRY_AFTER_SECONDS):
+        super().__init__(detail)
+        self.status_code = status_code
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class DeadlineExceeded(AdmissionRejected):
+
+    def __init__(self, stage: str):
+        super().__init__(503, "deadline", f"Échéance de la requête dépassée (étape {stage}).",
+                         get_admission_config().get("retry_after_seconds", DEFAULT_RETRY_AFTER_SECONDS))
+        self.stage = stage
+
+
+# ---------------------------------------------------------------------------------
+#                      ECHEANCE D'UNE REQUETE
+# ---------------------------------------------------------------------------------
+
+class Deadline:
+    __slots__ = ("expires_at",)
+
+    def __init__(self, expires_at: Optional[float] = None):
+        # Instant limite (time.monotonic), None = pas d'échéance
+        self.expires_at = expires_at
+
+    @classmethod
+    def after_ms(cls, timeout_ms: Optional[float]) -> "Deadline":
+        if not timeout_ms:
+            return NO_DEADLINE
+        return cls(time.monotonic() + timeout_ms / 1000.0)
+
+    # Secondes restantes (None = pas d'échéance, 0 si dépassée)
+    def remaining(self) -> Optional[float]:
+        if self.expires_at is None:
+            return None
+        return max(0.0, self.expires_at - time.monotonic())
+
+    def expired(self) -> bool:
+        return self.expires_at is not None and time.monotonic() >= self.expires_at
+
+    # Appelé avant chaque étape : l'étape n'est pas lancée si l'échéance est passée.
+    def check(self, stage: str):
+        if self.expired():
+            record_deadline_exceeded(stage)
+            raise DeadlineExceeded(stage)
+
+
+NO_DEADLINE = Deadline()
+
+
+# Échéance portée par l'en-tête de la requête (budget en ms), ou échéance par défaut de la configuration.
+# ValueError si l'en-tête n'est pas un nombre positif.
+def deadline_from_headers(headers: Mapping[str, str]) -> Deadline:
+    cfg = get_admission_config()
+    value = headers.get(cfg.get("deadline_header", DEFAULT_DEADLINE_HEADER))
+    if value is None:
+        return Deadline.after_ms(cfg.get("default_timeout_ms", 0))
+    timeout_ms = float(value)
+    if not timeout_ms > 0:
+        raise ValueError(f"Invalid request timeout: {value!r}")
+    return Deadline.after_ms(timeout_ms)
+
+
+# Attend le résultat d'un Future (pool des détecteurs, micro-batcher) sans dépasser l'échéance.
+# Échéance dépassée : le Future est annulé (le travail pas encore commencé n'est pas fait),
+# sauf cancel=False (Future partagé avec d'autres requêtes, ex: calcul en cours dans le cache).
+async def wait_future(future: Future, deadline: Deadline, stage: str, cancel: bool = True) -> Any:
+    wrapped = asyncio.wrap_future(future)
+    if deadline.expires_at is None:
+        return await wrapped
+    try:
+        return await asyncio.wait_for(wrapped if cancel else asyncio.shield(wrapped), deadline.remaining())
+    except asyncio.TimeoutError:
+        record_deadline_exceeded(stage)
+        raise DeadlineExceeded(stage)
+
+
+# ---------------------------------------------------------------------------------
+#                      CONTROLEUR D'ADMISSION
+# ---------------------------------------------------------------------------------
+# Sémaphore avec file d'attente bornée, utilisé uniquement depuis la boucle asynchrone (pas de verrou).
+# Une place libérée est transmise directement à la première requête en attente (ordre d'arrivée).
+
+class AdmissionController:
+
+    def __init__(self, max_concurrent: int = DEFAULT_MAX_CONCURRENT, max_queue: int = DEFAULT_MAX_QUEUE,
+                 queue_timeout_ms: float = DEFAULT_QUEUE_TIMEOUT_MS,
+                 retry_after_seconds: int = DEFAULT_RETRY_AFTER_SECONDS):
+        self.max_concurrent = max(1, max_concurrent)
+        self.max_queue = max(0, max_queue)
+        self.queue_timeout = queue_timeout_ms / 1000.0
+        self.retry_after = retry_after_seconds
+        self.active = 0
+        self._waiters: Deque[asyncio.Future] = deque()
+        self.admitted = 0
+        self.queued = 0
+
+    def queue_depth(self) -> int:
+        return len(self._waiters)
+
+    def _reject(self, status_code: int, reason: str, detail: str):
+        record_rejected(reason)
+        raise AdmissionRejected(status_code, reason, detail, self.retry_after)
+
+    async def acquire(self, deadline: Deadline = NO_DEADLINE):
+        deadline.check("admission")
+        if self.active < self.max_concurrent and not self._waiters:
+            self.active += 1
+            self.admitted += 1
+            return
+
+        if len(self._waiters) >= self.max_queue:
+            self._reject(429, "queue_full", "Service surchargé : file d'attente pleine.")
+
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        self.queued += 1
+        timeout = self.queue_timeout
+        remaining = deadline.remaining()
+        if remaining is not None:
+            timeout = min(timeout, remaining)
+
+        t0 = time.perf_counter()
+        try:
+            await asyncio.wait_for(asyncio.shield(waiter), timeout)
+        except asyncio.TimeoutError:
+            # La place a pu être transmise au moment même du délai : on la garde
+            if not waiter.done():
+                self._forget(waiter)
+                if deadline.expired():
+                    record_deadline_exceeded("admission")
+                    raise DeadlineExceeded("admission")
+                self._reject(503, "queue_timeout", "Service surchargé : attente trop longue.")
+        except asyncio.CancelledError:
+            # Client déconnecté pendant l'attente : place rendue si elle venait d'être transmise
+            if waiter.done():
+                self.release()
+            else:
+                self._forget(waiter)
+            raise
+        finally:
+            observe_stage("admission", time.perf_counter() - t0)
+        self.admitted += 1
+
+    def _forget(self, waiter: asyncio.Future):
+        waiter.cancel()
+        try:
+            self._waiters.remove(waiter)
+        except ValueError:
+            pass
+
+    def release(self):
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                # La place passe à la requête suivante (active inchangé)
+                waiter.set_result(None)
+                return
+        self.active -= 1
+
+    def stats(self) -> Dict[str, float]:
+        return {
+            "active": self.active,
+            "queued": len(self._waiters),
+            "max_concurrent": self.max_concurrent,
+            "max_queue": self.max_queue,
+            "admitted": self.admitted,
+            "queued_total": self.queued,
+        }
+
+
+# ---------------------------------------------------------------------------------
+#                      INSTANCE DE LA CONFIGURATION COURANTE
+# ---------------------------------------------------------------------------------
+# Recréée seulement si la section 'admission' change (les requêtes en cours rendent leur place
+# à l'instance qui les a admises). None si le contrôle d'admission est désactivé.
+
+_controller: Optional[AdmissionController] = None
+_controller_key: Optional[Tuple[Any, ...]] = None
+
+
+def get_admission_controller() -> Optional[AdmissionController]:
+    global _controller, _controller_key
+    cfg = get_admission_config()
+    if not cfg.get("enabled", False):
+        return None
+    key = (
+        cfg.get("max_concurrent", DEFAULT_MAX_CONCURRENT),
+        cfg.get("max_queue", DEFAULT_MAX_QUEUE),
+        cfg.get("queue_timeout_ms", DEFAULT_QUEUE_TIMEOUT_MS),
+        cfg.get("retry_after_seconds", DEFAULT_RETRY_AFTER_SECONDS),
+    )
+    if _controller is None or _controller_key != key:
+        _controller = AdmissionController(*key)
+        _controller_key = key
+    return _controller
+
+
+# Place dans le pipeline pour la durée du bloc (aucune limite si le contrôle est désactivé).
+@asynccontextmanager
+async def admitted(deadline: Deadline = NO_DEADLINE):
+    controller = get_admission_controller()
+    if controller is None:
+        deadline.check("admission")
+        yield
+        return
+    await controller.acquire(deadline)
+    try:
+        yield
+    finally:
+        controller.release()
+
+
+# Compteurs exposés dans /metrics
+def _admission_metrics():
+    controller = _controller
+    if controller is None:
+        return
+    for key, value in controller.stats().items():
+        yield (key,), value
+
+
+register_callback("desens_admission", "Contrôle d'admission : requêtes actives, en file, limites.", ("stat",), _admission_metrics)
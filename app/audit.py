@@ -1,10 +1,53 @@
+import atexit
 import json
+import os
+import queue
+import re
+import threading
+import time
+from contextlib import contextmanager
 from datetime import datetime
-from typing import List
-from app.models import Entity
+from typing import Any, Dict, List, Optional
+from app.models import Span
+from app.config import get_audit_config
 
+# Valeurs par défaut si la section 'audit' de settings.json est incomplète
+DEFAULT_AUDIT_PATH = "audit.log"
+DEFAULT_QUEUE_SIZE = 10_000
+DEFAULT_BATCH_SIZE = 256
+DEFAULT_FLUSH_INTERVAL_MS = 200
+DEFAULT_BLOCK_TIMEOUT_MS = 1000
 
-def log_audit(raw_text: str, entities: List[Entity], decision: str, risk_score: float):
+# fsync : après chaque lot ("always"), au plus toutes les fsync_interval_ms ("interval"), ou laissé à l'OS ("never")
+FSYNC_POLICIES = ("always", "interval", "never")
+# File pleine : attendre ("block"), ignorer la nouvelle entrée ("drop_new"), retirer la plus ancienne
+# ("drop_oldest") ou écrire directement depuis le thread de la requête ("sync")
+BACKPRESSURE_POLICIES = ("block", "drop_new", "drop_oldest", "sync")
+
+# Marqueur d'arrêt du thread d'écriture
+_STOP = object()
+
+try:
+    import fcntl
+except ImportError:  # Windows : pas de verrou entre processus
+    fcntl = None
+
+
+# Verrou entre processus (workers uvicorn qui partagent le même journal) pendant une rotation
+@contextmanager
+def _rotation_lock(path: str):
+    if fcntl is None:
+        yield
+        return
+    with open(path, "a") as f:
+        fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+
+
+def log_audit(raw_text: str, entities: List[Span], decision: str, risk_score: float):
     """
     Journalise une entrée d'audit pour une requête /sanitize.
     Principe :
@@ -15,24 +58,364 @@ def log_audit(raw_text: str, entities: List[Entity], decision: str, risk_score:
             - score de risque
             - nombre d'entités trouvées
             - nombre par type
+        - L'entrée est mise en file ; l'écriture sur disque est faite par lots par un thread dédié
+          (voir AuditWriter), hors du chemin de la requête.
 
     Args:
-        raw_text: Texte d'origine 
+        raw_text: Texte d'origine
         entities: Entités détectées
         decision: Décision globale
         risk_score: Score de risque global
     """
+    types_count: Dict[str, int] = {}
+    for e in entities:
+        types_count.setdefault(e.type, 0)
+        types_count[e.type] += 1
+
+    log_audit_counts(types_count, decision, risk_score)
+
+
+def log_audit_counts(types_count: Dict[str, int], decision: str, risk_score: float):
+    """
+    Même entrée d'audit que log_audit, à partir du nombre d'entités par type
+    (ex: document traité page par page, sans garder toutes les entités).
+    """
     audit_entry = {
         "timestamp": datetime.utcnow().isoformat(),
         "decision": decision,
         "risk_score": risk_score,
-        "entities_count": len(entities),
-        "types_count": {},
+        "entities_count": sum(types_count.values()),
+        "types_count": dict(types_count),
     }
 
-    for e in entities:
-        audit_entry["types_count"].setdefault(e.type, 0)
-        audit_entry["types_count"][e.type] += 1
+    get_audit_writer().write(audit_entry)
+
+
+class AuditWriter:
+    """
+    Écriture asynchrone du journal d'audit.
+
+    Principe :
+        - log_audit dépose l'entrée dans une file bornée (en mémoire).
+        - Un thread d'écriture vide la file par lots (batch_size entrées, ou toutes les flush_interval_ms),
+          écrit le lot en une fois, puis applique la politique de fsync.
+        - Rotation du fichier par taille (max_bytes) et/ou par âge (rotate_interval_seconds) ;
+          seules les backup_count archives les plus récentes sont conservées.
+        - Plusieurs processus (workers uvicorn) peuvent partager le fichier : rotation sous verrou
+          (fcntl.flock sur <path>.lock), et chaque processus rouvre le fichier avant un lot si un autre
+          l'a archivé entre-temps (inode changé) : aucune entrée n'est écrite dans une archive.
+        - close() vide la file avant de rendre la main : aucune entrée perdue à l'arrêt normal.
+    """
+
+    def __init__(self, path: str = DEFAULT_AUDIT_PATH, queue_size: int = DEFAULT_QUEUE_SIZE,
+                 batch_size: int = DEFAULT_BATCH_SIZE, flush_interval_ms: float = DEFAULT_FLUSH_INTERVAL_MS,
+                 fsync: str = "interval", fsync_interval_ms: float = 1000, backpressure: str = "block",
+                 block_timeout_ms: float = DEFAULT_BLOCK_TIMEOUT_MS, max_bytes: int = 0,
+                 rotate_interval_seconds: float = 0, backup_count: int = 10):
+        if fsync not in FSYNC_POLICIES:
+            raise ValueError(f"Unknown audit fsync policy '{fsync}'. Expected one of {FSYNC_POLICIES}.")
+        if backpressure not in BACKPRESSURE_POLICIES:
+            raise ValueError(f"Unknown audit backpressure policy '{backpressure}'. Expected one of {BACKPRESSURE_POLICIES}.")
+
+        self.path = path
+        self.batch_size = max(1, batch_size)
+        self.flush_interval = flush_interval_ms / 1000.0
+        self.fsync = fsync
+        self.fsync_interval = fsync_interval_ms / 1000.0
+        self.backpressure = backpressure
+        self.block_timeout = block_timeout_ms / 1000.0
+        self.max_bytes = max_bytes
+        self.rotate_interval = rotate_interval_seconds
+        self.backup_count = backup_count
+
+        self._queue: "queue.Queue[Any]" = queue.Queue(maxsize=queue_size)
+        # Protège le fichier : thread d'écriture et écritures directes (backpressure "sync")
+        self._file_lock = threading.Lock()
+        self._file = None
+        self._opened_at = 0.0
+        self._last_fsync = 0.0
+        self._thread: Optional[threading.Thread] = None
+        self._closed = False
+
+        # Compteurs (exposés par stats())
+        self.written = 0
+        self.dropped = 0
+        self.sync_writes = 0
+        self.rotations = 0
+
+    # ---------------------------------------------------------------------------------
+    #                      MISE EN FILE (thread de la requête)
+    # ---------------------------------------------------------------------------------
+
+    def write(self, entry: Dict[str, Any]):
+        # Après close() (ou si le thread est absent) : écriture directe pour ne rien perdre
+        if self._closed:
+            self._write_sync(entry)
+            return
+        self._ensure_started()
+
+        try:
+            self._queue.put_nowait(entry)
+            return
+        except queue.Full:
+            pass
+
+        # File pleine -> politique de backpressure
+        if self.backpressure == "block":
+            try:
+                self._queue.put(entry, timeout=self.block_timeout)
+            except queue.Full:
+                # Le disque ne suit pas : on écrit nous-mêmes plutôt que de perdre l'entrée
+                self._write_sync(entry)
+        elif self.backpressure == "drop_new":
+            self.dropped += 1
+        elif self.backpressure == "drop_oldest":
+            try:
+                self._queue.get_nowait()
+                self.dropped += 1
+            except queue.Empty:
+                pass
+            try:
+                self._queue.put_nowait(entry)
+            except queue.Full:
+                self.dropped += 1
+        else:
+            self._write_sync(entry)
+
+    def _ensure_started(self):
+        if self._thread is None:
+            with self._file_lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._run, name="audit-writer", daemon=True)
+                    self._thread.start()
+
+    # ---------------------------------------------------------------------------------
+    #                      THREAD D'ECRITURE
+    # ---------------------------------------------------------------------------------
+
+    def _run(self):
+        while True:
+            batch: List[Dict[str, Any]] = []
+            stop = False
+            deadline = time.monotonic() + self.flush_interval
+            # Collecte un lot : batch_size entrées ou flush_interval écoulé
+            while len(batch) < self.batch_size:
+                timeout = deadline - time.monotonic()
+                if timeout <= 0:
+                    break
+                try:
+                    item = self._queue.get(timeout=timeout)
+                except queue.Empty:
+                    break
+                if item is _STOP:
+                    stop = True
+                    break
+                batch.append(item)
+
+            if stop:
+                # Vide ce qui reste dans la file avant de s'arrêter
+                while True:
+                    try:
+                        item = self._queue.get_nowait()
+                    except queue.Empty:
+                        break
+                    if item is not _STOP:
+                        batch.append(item)
+
+            if batch:
+                try:
+                    self._write_batch(batch)
+                except Exception as e:
+                    print(f"[AUDIT] Write failed ({len(batch)} entries): {e}")
+            elif self.fsync == "interval":
+                with self._file_lock:
+                    self._maybe_fsync()
+
+            if stop:
+                return
+
+    def _write_sync(self, entry: Dict[str, Any]):
+        self.sync_writes += 1
+        self._write_batch([entry])
+
+    def _write_batch(self, batch: List[Dict[str, Any]]):
+        data = "".join(json.dumps(entry, ensure_ascii=False) + "\n" for entry in batch)
+        with self._file_lock:
+            self._reopen_if_rotated()
+            self._rotate_if_needed(len(data.encode("utf-8")))
+            f = self._open()
+            f.write(data)
+            f.flush()
+            self.written += len(batch)
+            if self.fsync == "always":
+                os.fsync(f.fileno())
+                self._last_fsync = time.monotonic()
+            else:
+                self._maybe_fsync()
+
+    def _maybe_fsync(self):
+        if self.fsync != "interval" or self._file is None:
+            return
+        now = time.monotonic()
+        if now - self._last_fsync >= self.fsync_interval:
+            os.fsync(self._file.fileno())
+            self._last_fsync = now
+
+    def _open(self):
+        if self._file is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self._file = open(self.path, "a", encoding="utf-8")
+            self._opened_at = time.time()
+        return self._file
+
+    def _close_file(self):
+        if self._file is not None:
+            self._file.flush()
+            if self.fsync != "never":
+                os.fsync(self._file.fileno())
+            self._file.close()
+            self._file = None
+
+    # Fichier archivé (ou supprimé) par un autre processus depuis son ouverture : fermé, rouvert au prochain lot
+    def _reopen_if_rotated(self):
+        if self._file is None:
+            return
+        try:
+            current = os.stat(self.path)
+        except FileNotFoundError:
+            current = None
+        own = os.fstat(self._file.fileno())
+        if current is None or (current.st_ino, current.st_dev) != (own.st_ino, own.st_dev):
+            self._close_file()
+
+    # ---------------------------------------------------------------------------------
+    #                      ROTATION
+    # ---------------------------------------------------------------------------------
+    # Archive : audit.log -> audit.log.AAAAMMJJ-HHMMSS(-n)
+
+    def _rotate_if_needed(self, incoming: int):
+        if not self.max_bytes and not self.rotate_interval:
+            return
+        try:
+            st = os.stat(self.path)
+        except OSError:
+            return
+        if st.st_size == 0:
+            return
+        if self._file is None:
+            self._opened_at = st.st_mtime if self.rotate_interval else time.time()
+        too_big = self.max_bytes and st.st_size + incoming > self.max_bytes
+        too_old = self.rotate_interval and time.time() - self._opened_at >= self.rotate_interval
+        if not (too_big or too_old):
+            return
+
+        self._close_file()
+        with _rotation_lock(self.path + ".lock"):
+            # Déjà archivé par un autre processus entre le stat et le verrou : rien à faire
+            try:
+                current = os.stat(self.path)
+            except OSError:
+                return
+            if (current.st_ino, current.st_dev) != (st.st_ino, st.st_dev):
+                return
+            archive = f"{self.path}.{datetime.utcnow().strftime('%Y%m%d-%H%M%S')}"
+            candidate, n = archive, 1
+            while os.path.exists(candidate):
+                candidate = f"{archive}-{n}"
+                n += 1
+            os.replace(self.path, candidate)
+            self.rotations += 1
+            self._prune_archives()
+
+    # Seuls les noms d'archive exacts (<path>.AAAAMMJJ-HHMMSS(-n)) sont supprimés : ni le verrou
+    # ni un autre fichier qui commencerait par le même nom
+    def _prune_archives(self):
+        if self.backup_count <= 0:
+            return
+        directory = os.path.dirname(self.path) or "."
+        pattern = re.compile(re.escape(os.path.basename(self.path)) + r"\.\d{8}-\d{6}(?:-\d+)?")
+        archives = sorted(
+            (os.path.join(directory, name) for name in os.listdir(directory) if pattern.fullmatch(name)),
+            key=os.path.getmtime,
+        )
+        for old in archives[:-self.backup_count]:
+            try:
+                os.remove(old)
+            except OSError:
+                pass
+
+    # ---------------------------------------------------------------------------------
+    #                      ARRET
+    # ---------------------------------------------------------------------------------
+
+    def close(self, timeout: Optional[float] = None):
+        # Les entrées déjà en file sont écrites avant l'arrêt du thread
+        if self._closed:
+            return
+        self._closed = True
+        if self._thread is not None:
+            self._queue.put(_STOP)
+            self._thread.join(timeout)
+        # Entrées déposées pendant l'arrêt
+        remaining = []
+        while True:
+            try:
+                item = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is not _STOP:
+                remaining.append(item)
+        if remaining:
+            self._write_batch(remaining)
+        with self._file_lock:
+            self._close_file()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "queued": self._queue.qsize(),
+            "written": self.written,
+            "dropped": self.dropped,
+            "sync_writes": self.sync_writes,
+            "rotations": self.rotations,
+        }
+
+
+# Instance unique par processus (créée au premier usage)
+_writer: Optional[AuditWriter] = None
+_writer_lock = threading.Lock()
+
+
+def get_audit_writer() -> AuditWriter:
+    global _writer
+    if _writer is None:
+        with _writer_lock:
+            if _writer is None:
+                cfg = get_audit_config()
+                rotation = cfg.get("rotation", {})
+                _writer = AuditWriter(
+                    path=cfg.get("path", DEFAULT_AUDIT_PATH),
+                    queue_size=cfg.get("queue_size", DEFAULT_QUEUE_SIZE),
+                    batch_size=cfg.get("batch_size", DEFAULT_BATCH_SIZE),
+                    flush_interval_ms=cfg.get("flush_interval_ms", DEFAULT_FLUSH_INTERVAL_MS),
+                    fsync=cfg.get("fsync", "interval"),
+                    fsync_interval_ms=cfg.get("fsync_interval_ms", 1000),
+                    backpressure=cfg.get("backpressure", "block"),
+                    block_timeout_ms=cfg.get("block_timeout_ms", DEFAULT_BLOCK_TIMEOUT_MS),
+                    max_bytes=rotation.get("max_bytes", 0),
+                    rotate_interval_seconds=rotation.get("interval_seconds", 0),
+                    backup_count=rotation.get("backup_count", 10),
+                )
+                # Filet de sécurité si l'application s'arrête sans passer par son lifespan
+                atexit.register(shutdown_audit)
+    return _writer
+
 
-    with open("audit.log", "a", encoding="utf-8") as f:
-        f.write(json.dumps(audit_entry, ensure_ascii=False) + "\n")
+# Vide la file et ferme le journal (appelé à l'arrêt de l'application).
+def shutdown_audit(timeout: Optional[float] = None):
+    global _writer
+    with _writer_lock:
+        if _writer is not None:
+            _writer.close(timeout)
+            _writer = None
@@ -0,0 +1,215 @@
+# ------------------------------------------------------------------------------------------------------------------------------------------------------------------
+# MODULE : BATCHING
+# Description : Regroupe l'inférence des deux modèles NER (camembert-ner + GLiNER) par lots.
+#
+# Objectif :
+#  - /sanitize-batch : un lot de textes -> une passe par modèle et par groupe de longueur.
+#  - /sanitize : les requêtes unitaires concurrentes sont fusionnées par un micro-batcher
+#    pendant une courte fenêtre de temps (max_wait_ms), puis passent ensemble dans les modèles.
+#
+# Remarque :
+#  - Les textes sont triés par nombre de jetons puis découpés en groupes de max_batch_size
+#    pour limiter le padding (un texte court ne paie pas la longueur d'un texte long).
+#  - Le résultat de chaque texte est identique à un appel unitaire des détecteurs.
+#  - Lot du micro-batcher en échec : chaque texte est repris seul, une requête n'échoue que pour son texte.
+#  - Mode "server" (section 'inference') : les lots sont envoyés au serveur d'inférence partagé
+#    (inference_server.py) au lieu d'être calculés dans ce processus.
+# ------------------------------------------------------------------------------------------------------------------------------------------------------------------
+
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import Callable, List, Optional, Tuple
+
+from app.models import Span
+from app.config import get_batching_config
+from app.executor import combine_futures, get_executor, submit_detector
+from app.inference_client import InferenceUnavailable, get_inference_client, is_remote
+from app.ner_general_hf import count_tokens, detect_entities_general, detect_entities_general_batch
+from app.ner_medical import detect_entities_medical, detect_entities_medical_batch
+
+# Valeurs par défaut si la section 'batching' de settings.json est incomplète
+DEFAULT_MAX_BATCH_SIZE = 16
+DEFAULT_MAX_WAIT_MS = 5
+
+# Résultat ML d'un texte : (entités générales, entités médicales)
+MLResult = Tuple[List[Span], List[Span]]
+
+
+# ---------------------------------------------------------------------------------
+#                      REGROUPEMENT PAR LONGUEUR
+# ---------------------------------------------------------------------------------
+# Trie les indices par longueur puis les découpe en groupes d'au plus max_batch_size.
+#  Args:
+#      - lengths: longueur (en jetons) de chaque texte.
+#      - max_batch_size: taille maximale d'un groupe.
+#  Returns:
+#      - Liste de groupes d'indices (dans la liste d'origine).
+
+def group_by_length(lengths: List[int], max_batch_size: int) -> List[List[int]]:
+    order = sorted(range(len(lengths)), key=lambda i: lengths[i])
+    return [order[i:i + max_batch_size] for i in range(0, len(order), max_batch_size)]
+
+
+# ---------------------------------------------------------------------------------
+#                      DETECTION ML SUR UN LOT
+# ---------------------------------------------------------------------------------
+# Exécute camembert-ner et GLiNER sur un lot de textes, groupe par groupe.
+# Les deux modèles tournent en parallèle sur le pool des détecteurs (voir executor.py),
+# chacun dans une seule tâche qui enchaîne les groupes.
+# Retourne les résultats dans l'ordre des textes d'entrée.
+
+def detect_entities_ml_batch(texts: List[str], max_batch_size: Optional[int] = None) -> List[MLResult]:
+    if not texts:
+        return []
+    if is_remote():
+        # Le serveur regroupe lui-même les textes par longueur
+        return get_inference_client().detect_batch(texts)
+    return detect_entities_ml_batch_local(texts, max_batch_size)
+
+
+# Exécute un détecteur par lot sur chaque groupe, l'un après l'autre.
+
+def _run_groups(detect_batch: Callable, group_texts: List[List[str]]) -> list:
+    return [detect_batch(texts) for texts in group_texts]
+
+
+# Même calcul avec les modèles de ce processus (mode "local", et le serveur d'inférence lui-même).
+
+def detect_entities_ml_batch_local(texts: List[str], max_batch_size: Optional[int] = None) -> List[MLResult]:
+    if not texts:
+        return []
+    if max_batch_size is None:
+        max_batch_size = get_batching_config().get("max_batch_size", DEFAULT_MAX_BATCH_SIZE)
+
+    results: List[Optional[MLResult]] = [None] * len(texts)
+
+    groups = group_by_length(count_tokens(texts), max_batch_size)
+    group_texts = [[texts[i] for i in group] for group in groups]
+    # Une tâche par modèle, qui enchaîne les groupes : un lot n'occupe jamais plus d'un thread
+    # du pool par modèle, les requêtes concurrentes gardent leur place dans le pool
+    general_future = submit_detector("general", _run_groups, detect_entities_general_batch, group_texts)
+    medical_future = submit_detector("medical", _run_groups, detect_entities_medical_batch, group_texts)
+
+    for group, general, medical in zip(groups, general_future.result(), medical_future.result()):
+        for i, g, m in zip(group, general, medical):
+            results[i] = (g, m)
+
+    return results
+
+
+# ---------------------------------------------------------------------------------
+#                      MICRO-BATCHER (REQUETES UNITAIRES CONCURRENTES)
+# ---------------------------------------------------------------------------------
+# Un thread de fond collecte les textes soumis pendant au plus max_wait_ms (ou jusqu'à
+# max_batch_size textes), puis exécute le lot et résout le Future de chaque appelant.
+
+class MicroBatcher:
+
+    def __init__(self, max_batch_size: int = DEFAULT_MAX_BATCH_SIZE, max_wait_ms: float = DEFAULT_MAX_WAIT_MS):
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+        self._queue: "queue.Queue[Tuple[str, Future]]" = queue.Queue()
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+
+    def submit(self, text: str) -> "Future[MLResult]":
+        # Démarre le thread de fond au premier appel
+        self._ensure_started()
+        future: "Future[MLResult]" = Future()
+        self._queue.put((text, future))
+        return future
+
+    def _ensure_started(self):
+        if self._thread is not None:
+            return
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="ner-micro-batcher", daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        while True:
+            # Attend le premier élément du lot, puis ouvre la fenêtre de collecte
+            batch = [self._queue.get()]
+            window_end = time.monotonic() + self.max_wait
+
+            while len(batch) < self.max_batch_size:
+                remaining = window_end - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+
+            self._process(batch)
+
+    def _process(self, batch: List[Tuple[str, Future]]):
+        # Ignore les appelants qui ont annulé entre-temps
+        batch = [(text, future) for text, future in batch if future.set_running_or_notify_cancel()]
+        if not batch:
+            return
+        try:
+            results = detect_entities_ml_batch([text for text, _ in batch], self.max_batch_size)
+        except InferenceUnavailable as e:
+            # Serveur d'inférence injoignable : même erreur pour tout le lot
+            for _, future in batch:
+                future.set_exception(e)
+            return
+        except Exception as e:
+            if len(batch) == 1:
+                batch[0][1].set_exception(e)
+                return
+            # Lot en échec (ex: un texte qui fait échouer le modèle) : chaque texte est repris seul,
+            # seules les requêtes dont le texte échoue encore reçoivent l'erreur
+            for text, future in batch:
+                try:
+                    future.set_result(detect_entities_ml_batch([text], self.max_batch_size)[0])
+                except Exception as single_error:
+                    future.set_exception(single_error)
+            return
+        for (_, future), result in zip(batch, results):
+            future.set_result(result)
+
+
+# Instance unique par processus (créée au premier usage)
+_batcher: Optional[MicroBatcher] = None
+_batcher_lock = threading.Lock()
+
+
+def get_batcher() -> MicroBatcher:
+    global _batcher
+    if _batcher is None:
+        with _batcher_lock:
+            if _batcher is None:
+                cfg = get_batching_config()
+                _batcher = MicroBatcher(
+                    max_batch_size=cfg.get("max_batch_size", DEFAULT_MAX_BATCH_SIZE),
+                    max_wait_ms=cfg.get("max_wait_ms", DEFAULT_MAX_WAIT_MS),
+                )
+    return _batcher
+
+
+# ---------------------------------------------------------------------------------
+#                      DETECTION ML D'UN TEXTE
+# ---------------------------------------------------------------------------------
+# Point d'entrée du pipeline unitaire : passe par le micro-batcher s'il est activé,
+# sinon lance les deux modèles en parallèle sur le pool des détecteurs (ou un aller-retour
+# vers le serveur d'inférence en mode "server").
+# Retourne un Future (attendu par le pipeline synchrone ou asynchrone).
+
+def submit_entities_ml(text: str) -> "Future[MLResult]":
+    if get_batching_config().get("enabled", False):
+        return get_batcher().submit(text)
+    if is_remote():
+        return get_executor().submit(lambda: get_inference_client().detect_batch([text])[0])
+    return combine_futures(
+        submit_detector("general", detect_entities_general, text),
+        submit_detector("medical", detect_entities_medical, text),
+    )
+
+
+def detect_entities_ml(text: str) -> MLResult:
+    return submit_entities_ml(text).result()
@@ -0,0 +1,122 @@
+# ------------------------------------------------------------------------------------------------------------------------------------------------------------------
+# MODULE : CHUNKING
+# Description : Découpage des textes longs en fenêtres glissantes pour les modèles NER.
+#
+# Objectif :
+#  - Les modèles ont une longueur maximale (512 jetons pour CamemBERT) et un coût d'attention
+#    quadratique : un long document est découpé en fenêtres de taille fixe qui se recouvrent.
+#  - Les fenêtres sont coupées en priorité aux frontières de phrase / paragraphe.
+#  - Les entités de chaque fenêtre sont ramenées en positions globales puis fusionnées.
+#
+# Remarque :
+#  - Le module ne dépend d'aucun modèle : l'appelant fournit les positions (début, fin) en
+#    caractères de ses unités (jetons du tokenizer, mots...).
+#  - Chaque fenêtre "possède" une zone du texte (le recouvrement est coupé en son milieu) :
+#    une entité n'est gardée que par la fenêtre qui possède son début -> pas de doublon.
+# ------------------------------------------------------------------------------------------------------------------------------------------------------------------
+
+import re
+from typing import List, Sequence, Tuple
+
+# Frontières : saut de ligne(s) ou espace après une ponctuation de fin de phrase
+BOUNDARY_RE = re.compile(r"\n\s*|(?<=[.!?…;:])\s+")
+
+
+# ---------------------------------------------------------------------------------
+#                      DEBUTS DE PHRASE / PARAGRAPHE
+# ---------------------------------------------------------------------------------
+# Retourne les positions (en caractères) où commence une nouvelle phrase ou un nouveau paragraphe.
+
+def segment_starts(text: str) -> List[int]:
+    return [m.end() for m in BOUNDARY_RE.finditer(text)]
+
+
+# ---------------------------------------------------------------------------------
+#                      PLANIFICATION DES FENETRES
+# ---------------------------------------------------------------------------------
+#  Args:
+#      - text: texte complet.
+#      - offsets: positions (début, fin) en caractères de chaque unité (jeton ou mot), dans l'ordre.
+#      - window: nombre maximal d'unités par fenêtre.
+#      - stride: recouvrement visé (en unités) entre deux fenêtres consécutives.
+#  Returns:
+#      - Liste d'intervalles (début, fin) en caractères, un par fenêtre.
+#        Un texte qui tient dans une fenêtre donne [(0, len(text))].
+
+def plan_windows(text: str, offsets: Sequence[Tuple[int, int]], window: int, stride: int) -> List[Tuple[int, int]]:
+    n = len(offsets)
+    if n <= window:
+        return [(0, len(text))]
+
+    # Le recouvrement doit laisser avancer la fenêtre
+    stride = max(0, min(stride, window // 2))
+
+    # cut[t] = True si l'unité t commence une nouvelle phrase (coupure possible avant t)
+    starts = segment_starts(text)
+    cut = [False] * (n + 1)
+    cut[n] = True
+    j = 0
+    for t in range(1, n):
+        prev_end = offsets[t - 1][1]
+        while j < len(starts) and starts[j] < prev_end:
+            j += 1
+        cut[t] = j < len(starts) and starts[j] <= offsets[t][0]
+
+    windows: List[Tuple[int, int]] = []
+    a = 0
+    while True:
+        b = min(a + window, n)
+        if b < n:
+            # Recule jusqu'à une frontière de phrase, sans réduire la fenêtre de plus de moitié
+            for t in range(b, a + window // 2, -1):
+                if cut[t]:
+                    b = t
+                    break
+        windows.append((offsets[a][0], offsets[b - 1][1]))
+        if b >= n:
+            break
+
+        # Début de la fenêtre suivante : dans la zone de recouvrement, sur un début de phrase si possible
+        next_a = max(b - stride, a + 1)
+        for t in range(next_a, b):
+            if cut[t]:
+                next_a = t
+                break
+        a = next_a
+
+    return windows
+
+
+# ---------------------------------------------------------------------------------
+#                      FUSION DES ENTITES DES FENETRES
+# ---------------------------------------------------------------------------------
+# Garde les entités dont le début tombe dans la zone possédée par leur fenêtre, puis
+# élimine les chevauchements résiduels (la première entité gagne).
+#  Args:
+#      - windows: intervalles (début, fin) des fenêtres, dans l'ordre.
+#      - window_entities: entités de chaque fenêtre, déjà en positions globales.
+#  Returns:
+#      - Entités triées par position, sans doublon ni chevauchement.
+
+def merge_window_entities(windows: List[Tuple[int, int]], window_entities: List[list]) -> list:
+    if len(windows) == 1:
+        return list(window_entities[0])
+
+    # Frontière de possession entre deux fenêtres = milieu de leur recouvrement
+    bounds = [0]
+    for (prev_start, prev_end), (start, _) in zip(windows, windows[1:]):
+        bounds.append((start + prev_end) // 2 if prev_end > start else start)
+    bounds.append(float("inf"))
+
+    kept = []
+    for i, entities in enumerate(window_entities):
+        own_start, own_end = bounds[i], bounds[i + 1]
+        kept.extend(e for e in entities if own_start <= e.start < own_end)
+
+    kept.sort(key=lambda e: e.start)
+    merged = []
+    for e in kept:
+        if merged and e.start < merged[-1].end:
+            continue
+        merged.append(e)
+    return merged
@@ -1,56 +1,250 @@
 # Importe la librairie standard pour travailler avec les données JSON.
 import json 
-from typing import Dict, Any, List 
+import os
+import threading
+import time
+from typing import Dict, Any, Callable, List, Optional, Tuple
 
 # Chemin du fichier de configuration par défaut
 CONFIG_FILE_PATH = "settings.json" 
 
-# Variable globale privée (convention _nom) pour stocker la configuration chargée, initialisée à un dictionnaire vide
-_config: Dict[str, Any] = {} 
+# ---------------------------------------------------------------------------------
+#                      INSTANTANES DE CONFIGURATION
+# ---------------------------------------------------------------------------------
+# La configuration en mémoire est un instantané immuable et versionné (ConfigSnapshot) :
+#   - Une modification (/config/weights, settings.json modifié sur disque) construit un NOUVEL instantané,
+#     le valide, précalcule ses objets dérivés (règles compilées, table de score...) puis le publie
+#     par une seule affectation : une requête voit l'ancien ou le nouveau, jamais un état à moitié modifié.
+#   - Lecture sans verrou : get_config() / get_snapshot() renvoient l'instantané courant.
+#   - La version sert à invalider les résultats mis en cache (voir result_cache.py).
+#   - Une configuration invalide est refusée : l'instantané courant reste en place.
+
+
+class ConfigError(ValueError):
+    pass
+
+
+def _readonly(*_args, **_kwargs):
+    raise TypeError("Configuration snapshots are read-only: use publish_config() / update_risk_weights().")
+
+
+# Dictionnaire / liste en lecture seule (restent des dict / list : json.dumps, isinstance, comparaisons)
+class FrozenDict(dict):
+    __setitem__ = __delitem__ = clear = pop = popitem = setdefault = update = __ior__ = _readonly
+
+    def __reduce__(self):
+        return FrozenDict, (dict(self),)
+
+
+class FrozenList(list):
+    __setitem__ = __delitem__ = __iadd__ = __imul__ = _readonly
+    append = extend = insert = remove = pop = clear = sort = reverse = _readonly
+
+    def __reduce__(self):
+        return FrozenList, (list(self),)
+
+
+def freeze(value: Any) -> Any:
+    if isinstance(value, dict):
+        return FrozenDict((k, freeze(v)) for k, v in value.items())
+    if isinstance(value, (list, tuple)):
+        return FrozenList(freeze(v) for v in value)
+    return value
+
+
+# Copie modifiable (dict / list ordinaires) d'une configuration figée
+def thaw(value: Any) -> Any:
+    if isinstance(value, dict):
+        return {k: thaw(v) for k, v in value.items()}
+    if isinstance(value, list):
+        return [thaw(v) for v in value]
+    return value
+
+
+# Objets dérivés d'un instantané : builder(data, précédent) -> objet.
+# `précédent` = objet de l'instantané précédent (réutilisable s'il n'a pas changé), ou None.
+# Une exception du builder rend la configuration invalide.
+_builders: Dict[str, Callable[[Dict[str, Any], Any], Any]] = {}
+
+
+def register_snapshot_builder(name: str, builder: Callable[[Dict[str, Any], Any], Any]):
+    _builders[name] = builder
+
+
+class ConfigSnapshot:
+
+    def __init__(self, version: int, data: Dict[str, Any], source: Optional[str] = None,
+                 file_state: Optional[Tuple[int, int]] = None):
+        self.version = version
+        self.data = data
+        self.source = source
+        # (mtime_ns, taille) du fichier lu : détecte une modification sur disque
+        self.file_state = file_state
+        self.created_at = time.time()
+        self._derived: Dict[str, Any] = {}
+
+    # Objet dérivé (construit à la publication ; un builder enregistré plus tard est construit au premier appel)
+    def derived(self, name: str) -> Any:
+        try:
+            return self._derived[name]
+        except KeyError:
+            value = _builders[name](self.data, None)
+            self._derived[name] = value
+            return value
+
+    def build(self, previous: Optional["ConfigSnapshot"]):
+        for name, builder in list(_builders.items()):
+            before = previous._derived.get(name) if previous is not None else None
+            try:
+                self._derived[name] = builder(self.data, before)
+            except ConfigError:
+                raise
+            except Exception as e:
+                raise ConfigError(f"Invalid configuration ({name}): {e}")
+
+
+# Instantané courant (None tant que settings.json n'a pas été lu)
+_snapshot: Optional[ConfigSnapshot] = None
+# Sérialise les publications et toute séquence "lecture-modification-publication" (update_risk_weights,
+# reload_config, surveillance du fichier) : aucune ne publie à partir d'un instantané déjà remplacé.
+# Réentrant : ces séquences appellent publish_config sous le verrou.
+_publish_lock = threading.RLock()
+
+
+# ---------------------------------------------------------------------------------
+#                          VALIDATION
+# ---------------------------------------------------------------------------------
+# Contrôles de structure des sections utilisées à chaque requête (les regex sont vérifiées
+# à la compilation des règles, voir rules_engine.py).
 
+def _is_number(value: Any) -> bool:
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+def validate_config(data: Any):
+    if not isinstance(data, dict):
+        raise ConfigError("Configuration must be a JSON object.")
+
+    risk = data.get("risk_engine")
+    if not isinstance(risk, dict):
+        raise ConfigError("Missing 'risk_engine' section.")
+    weights = risk.get("weights")
+    if not isinstance(weights, dict) or not all(_is_number(w) for w in weights.values()):
+        raise ConfigError("'risk_engine.weights' must map entity types to numbers.")
+    if not _is_number(risk.get("default_weight")):
+        raise ConfigError("'risk_engine.default_weight' must be a number.")
+    thresholds = risk.get("thresholds")
+    if not isinstance(thresholds, dict) or not all(_is_number(thresholds.get(k)) for k in ("MASK", "BLOCK")):
+        raise ConfigError("'risk_engine.thresholds' must define numeric MASK and BLOCK.")
+    if thresholds["MASK"] > thresholds["BLOCK"]:
+        raise ConfigError("'risk_engine.thresholds.MASK' must not exceed BLOCK.")
+
+    rules = data.get("rules_engine")
+    if not isinstance(rules, dict) or not isinstance(rules.get("patterns"), list):
+        raise ConfigError("Missing 'rules_engine.patterns' list.")
+    for i, pattern in enumerate(rules["patterns"]):
+        if not isinstance(pattern, dict) or not isinstance(pattern.get("type"), str) \
+                or not isinstance(pattern.get("regex"), str):
+            raise ConfigError(f"Rule #{i} must define string 'type' and 'regex'.")
+
+
+# ---------------------------------------------------------------------------------
+#                          PUBLICATION D'UNE CONFIGURATION
+# ---------------------------------------------------------------------------------
+# Valide, fige, précalcule puis publie une nouvelle configuration.
+#  Returns:
+#      - Le nouvel instantané (ConfigError si la configuration est refusée).
+
+def publish_config(data: Dict[str, Any], source: Optional[str] = None,
+                   file_state: Optional[Tuple[int, int]] = None) -> ConfigSnapshot:
+    global _snapshot
+    validate_config(data)
+    with _publish_lock:
+        previous = _snapshot
+        snapshot = ConfigSnapshot(
+            version=previous.version + 1 if previous is not None else 1,
+            data=freeze(data),
+            source=source if source is not None else (previous.source if previous else None),
+            file_state=file_state if file_state is not None else (previous.file_state if previous else None),
+        )
+        snapshot.build(previous)
+        # Publication atomique : une seule affectation
+        _snapshot = snapshot
+    return snapshot
+
+
+def _file_state(file_path: str) -> Tuple[int, int]:
+    st = os.stat(file_path)
+    return st.st_mtime_ns, st.st_size
+
+
+def _read_config_file(file_path: str) -> Tuple[Dict[str, Any], Tuple[int, int]]:
+    try:
+        # Tente d'ouvrir le fichier en mode lecture ('r'), avec encodage UTF-8
+        with open(file_path, "r", encoding="utf-8") as f: 
+            state = _file_state(file_path)
+            data = json.load(f)
+    # Erreur si le fichier n'existe pas
+    except FileNotFoundError:
+        raise FileNotFoundError(f"Configuration file not found at {file_path}. Please create one.")
+    # Erreur si le fichier JSON est mal formaté
+    except json.JSONDecodeError as e: 
+        raise ConfigError(f"Error decoding JSON configuration file: {e}")
+    return data, state
 
 
 # ---------------------------------------------------------------------------------
 #                          CHARGEMENT DE LA CONFIGURATION 
 # ---------------------------------------------------------------------------------
 # Fonction pour charge la configuration à partir du fichier JSON.
-# Met en cache la configuration pour éviter des relectures.
+# Met en cache la configuration (instantané) pour éviter des relectures.
 
-def load_config(file_path: str = CONFIG_FILE_PATH) -> Dict[str, Any]:
+_load_lock = threading.Lock()
 
-    global _config 
+
+def load_config(file_path: str = CONFIG_FILE_PATH) -> Dict[str, Any]:
     # Vérifie si la configuration n'a pas encore été chargée 
-    if not _config: 
-        try:
-            # Tente d'ouvrir le fichier en mode lecture ('r'), avec encodage UTF-8
-            with open(file_path, "r", encoding="utf-8") as f: 
-                # Charge le contenu JSON du fichier dans globale _config
-                _config = json.load(f) 
-        # Erreur si le fichier n'existe pas
-        except FileNotFoundError:
-            raise FileNotFoundError(f"Configuration file not found at {file_path}. Please create one.")
-        # Erreur si le fichier JSON est mal formaté
-        except json.JSONDecodeError as e: 
-            # Erreur si le décodage échoue, incluant l'erreur d'origine.
-            raise ValueError(f"Error decoding JSON configuration file: {e}")
+    if _snapshot is None: 
+        with _load_lock:
+            if _snapshot is None:
+                data, state = _read_config_file(file_path)
+                publish_config(data, source=file_path, file_state=state)
+    return _snapshot.data # Retourne le dictionnaire de configuration chargé (lecture seule).
 
-    return _config # Retourne le dictionnaire de configuration chargé.
 
+# Relit settings.json s'il a changé sur disque (ou toujours si force=True) et publie la nouvelle version.
+#  Returns:
+#      - True si une nouvelle version a été publiée (ConfigError / FileNotFoundError si refusée).
 
+def reload_config(file_path: Optional[str] = None, force: bool = False) -> bool:
+    get_snapshot()
+    with _publish_lock:
+        current = _snapshot
+        file_path = file_path or current.source or CONFIG_FILE_PATH
+        if not force and current.source == file_path and current.file_state == _file_state(file_path):
+            return False
+        data, state = _read_config_file(file_path)
+        snapshot = publish_config(data, source=file_path, file_state=state)
+    print(f"[CONFIG] {file_path} reloaded (version {snapshot.version})")
+    return True
 
 
 # ---------------------------------------------------------------------------------
 #                      RECUPERATION DE LA CONFIGURATION 
 # ---------------------------------------------------------------------------------
-# Récupère la configuration chargée
+# Récupère la configuration chargée (lecture seule, sans verrou)
 # Charge la configuration si elle ne l'est pas encore.
 
+def get_snapshot() -> ConfigSnapshot:
+    snapshot = _snapshot
+    if snapshot is None:
+        load_config()
+        snapshot = _snapshot
+    return snapshot
+
+
 def get_config() -> Dict[str, Any]:
-     # Vérifie si la configuration n'est pas encore en cache.
-    if not _config:
-         # Si elle n'est pas en cache, appelle la fonction pour la charger (et la mettra en cache)
-        return load_config()
-    return _config
+    return get_snapshot().data
 
 
 # ---------------------------------------------------------------------------------
@@ -65,13 +259,28 @@ def get_risk_config() -> Dict[str, Any]:
 # ---------------------------------------------------------------------------------
 #                      RECUPERATION DU RISQUE DEPUIS IHM - en cours ATY
 # ---------------------------------------------------------------------------------
-# Met à jour les poids de risque dans la configuration en mémoire.
+# Met à jour les poids de risque : publie une nouvelle version de la configuration en mémoire.
 # Ceci permet au decision_engine d'utiliser les nouvelles valeurs immédiatement.
+# (non écrit dans settings.json : une modification ultérieure du fichier remplace ces poids)
+
+# Lecture et publication sous _publish_lock : ni une autre mise à jour ni un rechargement de settings.json
+# publié entre les deux n'est écrasé.
 
 def update_risk_weights(new_weights: Dict[str, float]):
-    global _config 
-    # Accède à la section 'weights' dans 'risk_engine' et lui assigne le nouveau dictionnaire de poids
-    _config["risk_engine"]["weights"] = new_weights 
+    # Chargement initial hors verrou (load_config prend _load_lock puis _publish_lock)
+    get_snapshot()
+    with _publish_lock:
+        data = thaw(_snapshot.data)
+        # Remplace la section 'weights' dans 'risk_engine' par le nouveau dictionnaire de poids
+        data["risk_engine"]["weights"] = dict(new_weights)
+        # Nouvelle version -> les résultats calculés avec les anciens poids ne sont plus servis par le cache
+        publish_config(data)
+
+
+
+# Retourne la version courante de la configuration en mémoire
+def get_config_version() -> int:
+    return get_snapshot().version
     
 
 # ---------------------------------------------------------------------------------
@@ -89,9 +298,188 @@ def get_rule_patterns() -> List[Dict[str, str]]:
     # Récupère les patterns de la section 'rules_engine'.
     return get_config()["rules_engine"]["patterns"]
 
+
+# Stratégie d'exécution des patterns : "separate" (un parcours par pattern) ou "combined" (une seule regex)
+def get_rules_strategy() -> str:
+    return get_config()["rules_engine"].get("strategy", "separate")
+
 # ---------------------------------------------------------------------------------
 #                      RECUPERATION DE LA CONFIANCE MOTEUR ML
 # ---------------------------------------------------------------------------------
 def get_ml_confidence() -> float:
     # Récupère la valeur de confiance par défaut de la section 'ml_engine'.
-    return get_config()["ml_engine"]["default_confidence"]
\ No newline at end of file
+    return get_config()["ml_engine"]["default_confidence"]
+
+# ---------------------------------------------------------------------------------
+#                      RECUPERATION DE LA CONFIGURATION DU MICRO-BATCHING
+# ---------------------------------------------------------------------------------
+def get_batching_config() -> Dict[str, Any]:
+    # Récupère la section 'batching' (vide si absente -> valeurs par défaut du module batching)
+    return get_config().get("batching", {})
+
+
+# ---------------------------------------------------------------------------------
+#                      RECUPERATION DE LA CONFIGURATION DU NER GENERAL
+# ---------------------------------------------------------------------------------
+def get_ner_general_config() -> Dict[str, Any]:
+    # Récupère la section 'ner_general' (découpage en fenêtres des textes longs, etc.)
+    return get_config().get("ner_general", {})
+
+
+# ---------------------------------------------------------------------------------
+#                      RECUPERATION DE LA CONFIGURATION DU NER MEDICAL
+# ---------------------------------------------------------------------------------
+def get_ner_medical_config() -> Dict[str, Any]:
+    # Récupère la section 'ner_medical' (seuil GLiNER, découpage en fenêtres des textes longs)
+    return get_config().get("ner_medical", {})
+
+
+# ---------------------------------------------------------------------------------
+#                      RECUPERATION DE LA CONFIGURATION DE CONCURRENCE
+# ---------------------------------------------------------------------------------
+def get_concurrency_config() -> Dict[str, Any]:
+    # Récupère la section 'concurrency' (taille du pool des détecteurs, threads torch par modèle)
+    return get_config().get("concurrency", {})
+
+
+# ---------------------------------------------------------------------------------
+#                      RECUPERATION DES PRIORITES DE FUSION
+# ---------------------------------------------------------------------------------
+def get_fusion_priority(snapshot: Optional[ConfigSnapshot] = None) -> List[str]:
+    # Sources de détection de la plus prioritaire à la moins prioritaire (section 'fusion')
+    data = (snapshot or get_snapshot()).data
+    return data.get("fusion", {}).get("priority", ["rules", "general", "medical"])
+
+
+# ---------------------------------------------------------------------------------
+#                      RECUPERATION DE LA CONFIGURATION DU CACHE
+# ---------------------------------------------------------------------------------
+def get_cache_config() -> Dict[str, Any]:
+    # Récupère la section 'cache' (taille, durée de vie, stockage du texte brut)
+    return get_config().get("cache", {})
+
+
+# ---------------------------------------------------------------------------------
+#                      RECUPERATION DE LA CONFIGURATION DE LA CASCADE
+# ---------------------------------------------------------------------------------
+def get_cascade_config(snapshot: Optional[ConfigSnapshot] = None) -> Dict[str, Any]:
+    # Récupère la section 'cascade' (fast_block : pas de ML quand les règles suffisent à bloquer)
+    return (snapshot or get_snapshot()).data.get("cascade", {})
+
+
+# ---------------------------------------------------------------------------------
+#                      RECUPERATION DE LA CONFIGURATION DE L'ADMISSION
+# ---------------------------------------------------------------------------------
+
+def get_admission_config() -> Dict[str, Any]:
+    # Récupère la section 'admission' (requêtes simultanées, file d'attente, échéances, voir admission.py)
+    return get_config().get("admission", {})
+
+
+# ---------------------------------------------------------------------------------
+#                      RECUPERATION DE LA CONFIGURATION DE L'AUDIT
+# ---------------------------------------------------------------------------------
+def get_audit_config() -> Dict[str, Any]:
+    # Récupère la section 'audit' (file d'écriture, fsync, rotation, backpressure)
+    return get_config().get("audit", {})
+
+
+# ---------------------------------------------------------------------------------
+#                      RECUPERATION DE LA CONFIGURATION PDF
+# ---------------------------------------------------------------------------------
+def get_pdf_config() -> Dict[str, Any]:
+    # Récupère la section 'pdf' (mode d'extraction, pool de processus, limites de taille / pages)
+    return get_config().get("pdf", {})
+
+
+# ---------------------------------------------------------------------------------
+#                      RECUPERATION DE LA CONFIGURATION OCR
+# ---------------------------------------------------------------------------------
+def get_ocr_config() -> Dict[str, Any]:
+    # Récupère la section 'ocr' (pool, prétraitement des images, OCR des PDF scannés)
+    return get_config().get("ocr", {})
+
+
+# ---------------------------------------------------------------------------------
+#                      RECUPERATION DE LA CONFIGURATION DE DEMARRAGE
+# ---------------------------------------------------------------------------------
+def get_startup_config() -> Dict[str, Any]:
+    # Récupère la section 'startup' (préchargement et chauffe des modèles)
+    return get_config().get("startup", {})
+
+
+# ---------------------------------------------------------------------------------
+#                      RECUPERATION DE LA CONFIGURATION DE L'INFERENCE
+# ---------------------------------------------------------------------------------
+def get_inference_config() -> Dict[str, Any]:
+    # Récupère la section 'inference' (modèles dans chaque worker ou serveur d'inférence partagé)
+    return get_config().get("inference", {})
+
+
+# ---------------------------------------------------------------------------------
+#                      RECUPERATION DE LA CONFIGURATION DU FICHIER MASQUE
+# ---------------------------------------------------------------------------------
+def get_redaction_config() -> Dict[str, Any]:
+    # Récupère la section 'redaction' (fichier masqué renvoyé par /sanitize-file?output=file)
+    return get_config().get("redaction", {})
+
+
+# ---------------------------------------------------------------------------------
+#                      RECHARGEMENT A CHAUD DE settings.json
+# ---------------------------------------------------------------------------------
+# Un thread vérifie périodiquement la date de modification et la taille du fichier ; s'il a changé,
+# la configuration est relue, validée puis publiée (nouvelle version, caches invalidés).
+# Une configuration invalide est refusée et journalisée : la version courante reste active.
+# Section 'config_reload' : enabled, interval_seconds.
+# Remarque : les sections lues une seule fois au démarrage (pools, modèles, micro-batcher, audit)
+# nécessitent toujours un redémarrage ; règles, poids, seuils, fusion, cascade... sont pris en compte à chaud.
+
+DEFAULT_RELOAD_INTERVAL_SECONDS = 2.0
+
+_watcher_stop: Optional[threading.Event] = None
+
+
+def get_config_reload_config() -> Dict[str, Any]:
+    # Récupère la section 'config_reload' (surveillance de settings.json)
+    return get_config().get("config_reload", {})
+
+
+def _watch_config_file(stop: threading.Event, interval: float):
+    rejected_state = None
+    while not stop.wait(interval):
+        state = None
+        try:
+            snapshot = get_snapshot()
+            path = snapshot.source or CONFIG_FILE_PATH
+            state = _file_state(path)
+            # Fichier inchangé, ou déjà refusé dans cet état : rien à faire
+            if state == snapshot.file_state or state == rejected_state:
+                continue
+            reload_config(path)
+            rejected_state = None
+        except (ConfigError, OSError) as e:
+            rejected_state = state
+            print(f"[CONFIG] reload rejected, keeping version {get_snapshot().version}: {e}")
+
+
+def start_config_watcher() -> Optional[threading.Thread]:
+    global _watcher_stop
+    cfg = get_config_reload_config()
+    if not cfg.get("enabled", False) or _watcher_stop is not None:
+        return None
+    _watcher_stop = threading.Event()
+    thread = threading.Thread(
+        target=_watch_config_file,
+        args=(_watcher_stop, cfg.get("interval_seconds", DEFAULT_RELOAD_INTERVAL_SECONDS)),
+        name="config-watcher",
+        daemon=True,
+    )
+    thread.start()
+    return thread
+
+
+def stop_config_watcher():
+    global _watcher_stop
+    if _watcher_stop is not None:
+        _watcher_stop.set()
+        _watcher_stop = None
@@ -1,18 +1,63 @@
-from typing import List, Tuple
-from app.models import Entity
-from app.config import get_risk_config # Import de la fonction pour obtenir la config à jour
+from typing import Dict, List, Optional, Tuple
+from app.models import Span
+from app.config import ConfigSnapshot, get_snapshot, register_snapshot_builder # Instantané de configuration (toujours à jour)
 
-# NOTE: Les variables globales comme WEIGHTS, MASK_THRESHOLD, etc. sont supprimées 
-# ou commentées car elles doivent être chargées DANS la fonction compute_decision 
-# pour être dynamiques.
+# NOTE: Les poids et seuils ne sont plus relus dans le dictionnaire de configuration à chaque appel :
+# ils sont précalculés dans une table de score (ScoringTable) attachée à chaque instantané de
+# configuration (voir config.py). Une nouvelle configuration (/config/weights, settings.json modifié)
+# publie une nouvelle table : les calculs restent dynamiques, sans verrou.
 
-def compute_decision(entities: List[Entity]) -> Tuple[str, float]:
+
+class ScoringTable:
+    """
+    Poids par type d'entité et seuils de décision d'une configuration (lecture seule).
+    """
+
+    __slots__ = ("weights", "default_weight", "mask_threshold", "block_threshold", "monotonic")
+
+    def __init__(self, risk_config: Dict[str, object]):
+        self.weights: Dict[str, float] = {k: float(v) for k, v in risk_config["weights"].items()}
+        self.default_weight = float(risk_config["default_weight"])
+        self.mask_threshold = float(risk_config["thresholds"]["MASK"])
+        self.block_threshold = float(risk_config["thresholds"]["BLOCK"])
+        # Aucun poids négatif : ajouter des entités ne peut qu'augmenter le score (cascade, voir main.py)
+        self.monotonic = min(list(self.weights.values()) + [self.default_weight]) >= 0
+
+    def score(self, entities: List[Span]) -> float:
+        get_weight = self.weights.get
+        default = self.default_weight
+        score = 0.0
+        for e in entities:
+            # Utilise le poids par défaut si le type n'est pas dans la config
+            score += get_weight(e.type, default)
+        return score
+
+    def decide(self, score: float) -> Tuple[str, float]:
+        risk_score = min(score / 10.0, 1.0)
+        if risk_score < self.mask_threshold:
+            decision = "ALLOW"
+        elif risk_score < self.block_threshold:
+            decision = "MASK"
+        else:
+            decision = "BLOCK"
+        return decision, risk_score
+
+
+register_snapshot_builder("scoring", lambda data, previous: ScoringTable(data["risk_engine"]))
+
+
+# snapshot : instantané de configuration de la requête (courant par défaut), pour toutes les fonctions ci-dessous
+def get_scoring_table(snapshot: Optional[ConfigSnapshot] = None) -> ScoringTable:
+    return (snapshot or get_snapshot()).derived("scoring")
+
+
+def compute_decision(entities: List[Span], snapshot: Optional[ConfigSnapshot] = None) -> Tuple[str, float]:
     """
     Calcule un score de risque global à partir des entités détectées, puis
     applique une politique de décision simple.
 
     Logique :
-        - Lit la configuration de risque la plus récente.
+        - Utilise la table de score de la configuration la plus récente.
         - Somme des poids de chaque entité.
         - Normalisation /10 puis clamp entre 0 et 1.
 
@@ -22,26 +67,23 @@ def compute_decision(entities: List[Entity]) -> Tuple[str, float]:
     Returns:
         Tuple (decision, risk_score).
     """
-    # Chargement dynamique de la configuration à chaque appel
-    RISK_CONFIG = get_risk_config()
-    WEIGHTS = RISK_CONFIG["weights"]
-    DEFAULT_WEIGHT = RISK_CONFIG["default_weight"]
-    MASK_THRESHOLD = RISK_CONFIG["thresholds"]["MASK"]
-    BLOCK_THRESHOLD = RISK_CONFIG["thresholds"]["BLOCK"]
-    
-    score = 0.0
-
-    for e in entities:
-        # Utilise le poids par défaut si le type n'est pas dans la config
-        score += WEIGHTS.get(e.type, DEFAULT_WEIGHT)
-
-    risk_score = min(score / 10.0, 1.0)
-
-    if risk_score < MASK_THRESHOLD:
-        decision = "ALLOW"
-    elif risk_score < BLOCK_THRESHOLD:
-        decision = "MASK"
-    else:
-        decision = "BLOCK"
-
-    return decision, risk_score
\ No newline at end of file
+    table = get_scoring_table(snapshot)
+    return table.decide(table.score(entities))
+
+
+def entities_score(entities: List[Span], snapshot: Optional[ConfigSnapshot] = None) -> float:
+    """
+    Somme brute (non normalisée) des poids des entités.
+    Additive : le score d'un document est la somme des scores de ses pages (streaming page par page).
+    """
+    return get_scoring_table(snapshot).score(entities)
+
+
+def decision_from_score(score: float, snapshot: Optional[ConfigSnapshot] = None) -> Tuple[str, float]:
+    """
+    Normalise une somme de poids (/10, clamp entre 0 et 1) et applique les seuils de décision.
+
+    Returns:
+        Tuple (decision, risk_score).
+    """
+    return get_scoring_table(snapshot).decide(score)
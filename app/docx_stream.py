@@ -0,0 +1,637 @@
+# ------------------------------------------------------------------------------------------------------------------------------------------------------------------
+# MODULE : DOCX STREAM
+# Description : Extraction du texte d'un DOCX en flux : parties OOXML lues directement dans le zip et analysées
+#               par un parseur XML incrémental (expat), sans modèle objet python-docx.
+#
+# Objectif :
+#  - python-docx construisait tout l'arbre du document (lent, mémoire proportionnelle au fichier) et ne lisait
+#    que document.paragraphs : tableaux, en-têtes, pieds de page, notes et zones de texte étaient ignorés,
+#    alors que les numéros de compte s'y trouvent souvent.
+#  - Toutes les parties porteuses de texte sont lues, dans cet ordre : corps du document (tableaux et zones
+#    de texte compris), en-têtes, pieds de page, notes de bas de page, notes de fin, commentaires.
+#  - Chaque partie est décompressée et analysée par morceaux (CHUNK_SIZE) : la mémoire ne dépend que
+#    du texte extrait, pas de la taille du XML.
+#  - Table de correspondance (TextMap) : position dans le texte extrait -> (partie, n° de paragraphe
+#    dans la partie), pour retrouver l'emplacement d'une entité dans le fichier d'origine.
+#  - Réécriture masquée (redact_docx) : copie du DOCX avec le texte des entités remplacé dans les runs,
+#    parties lues et écrites par morceaux (sortie fichier de /sanitize-file). Le texte jamais analysé
+#    (suivi de modifications, codes de champ, propriétés du document, auteurs) est retiré de la copie.
+#
+# Remarque :
+#  - Texte d'un paragraphe : w:t, w:tab -> "\t", w:br / w:cr -> "\n", w:noBreakHyphen -> "-".
+#    Le texte supprimé en suivi de modifications (w:delText) et les codes de champ (w:instrText) ne sont pas
+#    repris, comme dans Word (et python-docx).
+#  - mc:AlternateContent : seule la variante mc:Choice est lue (la variante mc:Fallback répète le même
+#    texte, ex: zone de texte VML).
+#  - Paragraphes numérotés dans l'ordre de leur balise ouvrante ; un paragraphe imbriqué (zone de texte
+#    ancrée dans un paragraphe) est émis avant le paragraphe qui le contient.
+#  - Texte extrait : paragraphes non vides séparés par "\n" (même format qu'avant pour le corps).
+# ------------------------------------------------------------------------------------------------------------------------------------------------------------------
+
+import io
+import re
+import zipfile
+from array import array
+from bisect import bisect_right
+from typing import BinaryIO, Dict, Iterator, List, Optional, Tuple, Union
+from xml.etree import ElementTree
+from xml.parsers import expat
+
+# Taille des morceaux décompressés passés au parseur
+CHUNK_SIZE = 64 * 1024
+
+W_NS = "http://schemas.openxmlformats.org/wordprocessingml/2006/main"
+MC_NS = "http://schemas.openxmlformats.org/markup-compatibility/2006"
+CT_NS = "http://schemas.openxmlformats.org/package/2006/content-types"
+
+# Noms qualifiés tels que produits par expat (namespace_separator = "}")
+_P = W_NS + "}p"
+_T = W_NS + "}t"
+_FALLBACK = MC_NS + "}Fallback"
+# Éléments vides équivalents à un caractère
+_CHAR_ELEMENTS = {
+    W_NS + "}tab": "\t",
+    W_NS + "}ptab": "\t",
+    W_NS + "}br": "\n",
+    W_NS + "}cr": "\n",
+    W_NS + "}noBreakHyphen": "-",
+}
+
+# Parties porteuses de texte, dans l'ordre de lecture : (type de partie, types de contenu OOXML)
+_WML = "application/vnd.openxmlformats-officedocument.wordprocessingml."
+PART_KINDS: List[Tuple[str, Tuple[str, ...]]] = [
+    ("document", (
+        _WML + "document.main+xml",
+        _WML + "template.main+xml",
+        "application/vnd.ms-word.document.macroEnabled.main+xml",
+        "application/vnd.ms-word.template.macroEnabledTemplate.main+xml",
+    )),
+    ("header", (_WML + "header+xml",)),
+    ("footer", (_WML + "footer+xml",)),
+    ("footnotes", (_WML + "footnotes+xml",)),
+    ("endnotes", (_WML + "endnotes+xml",)),
+    ("comments", (_WML + "comments+xml",)),
+]
+_KIND_BY_CONTENT_TYPE = {ct: kind for kind, cts in PART_KINDS for ct in cts}
+_KIND_ORDER = {kind: i for i, (kind, _) in enumerate(PART_KINDS)}
+
+# Partie principale par défaut (paquet sans [Content_Types].xml exploitable)
+DEFAULT_MAIN_PART = "word/document.xml"
+
+
+# ---------------------------------------------------------------------------------
+#                      PARTIES DU DOCUMENT
+# ---------------------------------------------------------------------------------
+# Returns:
+#     - [(nom de la partie dans le zip, type de partie)] dans l'ordre de lecture
+#       (header2 avant header10).
+
+def _natural_key(name: str):
+    return [int(t) if t.isdigit() else t for t in re.split(r"(\d+)", name)]
+
+
+def list_text_parts(zf: zipfile.ZipFile) -> List[Tuple[str, str]]:
+    names = set(zf.namelist())
+    parts: List[Tuple[str, str]] = []
+    if "[Content_Types].xml" in names:
+        # Petit fichier : lu en entier
+        root = ElementTree.fromstring(zf.read("[Content_Types].xml"))
+        for override in root.iter(f"{{{CT_NS}}}Override"):
+            kind = _KIND_BY_CONTENT_TYPE.get(override.get("ContentType", ""))
+            name = override.get("PartName", "").lstrip("/")
+            if kind is not None and name in names:
+                parts.append((name, kind))
+    if not any(kind == "document" for _, kind in parts) and DEFAULT_MAIN_PART in names:
+        parts.append((DEFAULT_MAIN_PART, "document"))
+    parts.sort(key=lambda p: (_KIND_ORDER[p[1]], _natural_key(p[0])))
+    return parts
+
+
+# ---------------------------------------------------------------------------------
+#                      TABLE DE CORRESPONDANCE (POSITION -> PARTIE, PARAGRAPHE)
+# ---------------------------------------------------------------------------------
+# Un segment par paragraphe non vide : [début, fin) dans le texte extrait, partie, n° de paragraphe.
+# Tableaux compacts (quelques octets par paragraphe), recherche par dichotomie.
+
+class TextMap:
+    __slots__ = ("parts", "_starts", "_ends", "_part_ids", "_paragraphs")
+
+    def __init__(self):
+        self.parts: List[str] = []
+        self._starts = array("q")
+        self._ends = array("q")
+        self._part_ids = array("H")
+        self._paragraphs = array("l")
+
+    def add_part(self, name: str) -> int:
+        self.parts.append(name)
+        return len(self.parts) - 1
+
+    def add(self, start: int, end: int, part_id: int, paragraph: int):
+        self._starts.append(start)
+        self._ends.append(end)
+        self._part_ids.append(part_id)
+        self._paragraphs.append(paragraph)
+
+    def __len__(self) -> int:
+        return len(self._starts)
+
+    # Returns:
+    #     - (partie, n° de paragraphe dans la partie) du caractère à cette position,
+    #       None pour un séparateur entre paragraphes ou une position hors du texte.
+    def locate(self, offset: int) -> Optional[Tuple[str, int]]:
+        i = bisect_right(self._starts, offset) - 1
+        if i < 0 or offset >= self._ends[i]:
+            return None
+        return self.parts[self._part_ids[i]], self._paragraphs[i]
+
+    # Segments (début, fin, partie, n° de paragraphe) dans l'ordre du texte
+    def segments(self) -> Iterator[Tuple[int, int, str, int]]:
+        for start, end, part_id, paragraph in zip(self._starts, self._ends, self._part_ids, self._paragraphs):
+            yield start, end, self.parts[part_id], paragraph
+
+
+# ---------------------------------------------------------------------------------
+#                      ANALYSE INCREMENTALE D'UNE PARTIE
+# ---------------------------------------------------------------------------------
+# Gestionnaires expat : une pile de paragraphes ouverts (zones de texte imbriquées),
+# le texte n'est collecté qu'à l'intérieur de w:t.
+
+class _ParagraphCollector:
+
+    def __init__(self):
+        self.ready: List[Tuple[int, str]] = []
+        self.count = 0
+        self._open: List[Tuple[int, List[str]]] = []
+        self._in_text = 0
+        self._skip = 0
+
+    def start(self, name: str, attrs):
+        if self._skip:
+            if name == _FALLBACK:
+                self._skip += 1
+            return
+        if name == _FALLBACK:
+            self._skip = 1
+        elif name == _P:
+            self._open.append((self.count, []))
+            self.count += 1
+        elif self._open:
+            if name == _T:
+                self._in_text += 1
+            else:
+                char = _CHAR_ELEMENTS.get(name)
+                if char is not None:
+                    self._open[-1][1].append(char)
+
+    def end(self, name: str):
+        if self._skip:
+            if name == _FALLBACK:
+                self._skip -= 1
+            return
+        if name == _T:
+            if self._in_text:
+                self._in_text -= 1
+        elif name == _P and self._open:
+            index, pieces = self._open.pop()
+            self.ready.append((index, "".join(pieces)))
+
+    def chars(self, data: str):
+        if self._in_text and not self._skip:
+            self._open[-1][1].append(data)
+
+
+# Paragraphes d'une partie XML, lue par morceaux.
+#  Returns:
+#      - Itérateur de (n° de paragraphe dans la partie, texte), paragraphes vides compris.
+
+def iter_part_paragraphs(stream: BinaryIO, chunk_size: int = CHUNK_SIZE) -> Iterator[Tuple[int, str]]:
+    collector = _ParagraphCollector()
+    parser = expat.ParserCreate(namespace_separator="}")
+    parser.buffer_text = True
+    parser.StartElementHandler = collector.start
+    parser.EndElementHandler = collector.end
+    parser.CharacterDataHandler = collector.chars
+    while True:
+        chunk = stream.read(chunk_size)
+        parser.Parse(chunk, not chunk)
+        if collector.ready:
+            yield from collector.ready
+            collector.ready.clear()
+        if not chunk:
+            return
+
+
+# ---------------------------------------------------------------------------------
+#                      EXTRACTION DU DOCUMENT
+# ---------------------------------------------------------------------------------
+
+class DocxText:
+    __slots__ = ("text", "text_map", "paragraphs", "parts")
+
+    def __init__(self, text: str, text_map: TextMap, paragraphs: int, parts: Dict[str, int]):
+        self.text = text # Paragraphes non vides séparés par "\n"
+        self.text_map = text_map # Position -> (partie, paragraphe)
+        self.paragraphs = paragraphs # Nombre de paragraphes lus (vides compris)
+        self.parts = parts # Nombre de parties lues par type (document, header, footer...)
+
+
+def extract_docx(source: Union[bytes, BinaryIO], chunk_size: int = CHUNK_SIZE) -> DocxText:
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        source = io.BytesIO(source)
+    pieces: List[str] = []
+    text_map = TextMap()
+    offset = 0
+    paragraphs = 0
+    parts: Dict[str, int] = {}
+
+    with zipfile.ZipFile(source) as zf:
+        for name, kind in list_text_parts(zf):
+            part_id = text_map.add_part(name)
+            parts[kind] = parts.get(kind, 0) + 1
+            with zf.open(name) as stream:
+                for index, text in iter_part_paragraphs(stream, chunk_size):
+                    paragraphs += 1
+                    if not text:
+                        continue
+                    if pieces:
+                        pieces.append("\n")
+                        offset += 1
+                    pieces.append(text)
+                    text_map.add(offset, offset + len(text), part_id, index)
+                    offset += len(text)
+
+    return DocxText("".join(pieces), text_map, paragraphs, parts)
+
+
+# ---------------------------------------------------------------------------------
+#                      REECRITURE MASQUEE (SORTIE FICHIER)
+# ---------------------------------------------------------------------------------
+# Copie le DOCX en remplaçant, dans les w:t, le texte des entités par leur jeton <TYPE_MASKED>
+# (premier morceau de texte de l'entité), le reste de l'entité étant supprimé des runs suivants :
+# mise en forme, styles et structure sont conservés.
+#   - Parties XML : octets d'origine recopiés tels quels, seuls les passages modifiés sont réécrits
+#     (positions données par expat, CurrentByteIndex) ; lues et écrites par morceaux, mêmes règles de
+#     parcours que l'extraction. Les autres entrées du zip sont recopiées par morceaux.
+#   - Positions : TextMap de l'extraction (position de chaque paragraphe non vide dans le texte analysé).
+#   - Retirés de toutes les parties (avec leur contenu) : mc:Fallback (copie, pour les anciens lecteurs, d'une
+#     zone de texte déjà masquée dans mc:Choice), texte supprimé en suivi de modifications (w:del, w:delText)
+#     et codes de champ (w:instrText, ex: HYPERLINK "mailto:..."), variables de document (w:docVars) :
+#     non extraits, donc jamais analysés.
+#   - Vidés : texte hors du texte analysé (w:t hors paragraphe ou d'une partie non lue, a:t DrawingML),
+#     auteurs des révisions et commentaires (w:author, w:initials, w15:userId), code des champs simples
+#     (w:instr), cibles externes des relations (liens mailto:, http:...), propriétés du document (docProps :
+#     auteur, dernier modificateur, titre, société...) et données XML personnalisées (customXml/item*.xml,
+#     liées aux contrôles de contenu).
+#   - Objets incorporés (word/embeddings) : non analysables, refusés par app/redaction.py.
+
+CP_NS = "http://schemas.openxmlformats.org/package/2006/metadata/core-properties"
+DCTERMS_NS = "http://purl.org/dc/terms/"
+EP_NS = "http://schemas.openxmlformats.org/officeDocument/2006/extended-properties"
+VT_NS = "http://schemas.openxmlformats.org/officeDocument/2006/docPropsVTypes"
+A_NS = "http://schemas.openxmlformats.org/drawingml/2006/main"
+REL_NS = "http://schemas.openxmlformats.org/package/2006/relationships"
+
+# Éléments retirés avec leur contenu
+_DROPPED = {
+    _FALLBACK,
+    W_NS + "}del",
+    W_NS + "}delText",
+    W_NS + "}instrText",
+    W_NS + "}delInstrText",
+    W_NS + "}docVars",
+}
+# Attributs vidés (nom local, quel que soit le préfixe)
+_CLEARED_ATTRIBUTES = {"author", "initials", "userId", "instr"}
+_A_T = A_NS + "}t"
+_RELATIONSHIP = REL_NS + "}Relationship"
+EXTERNAL_TARGET = "about:blank"
+
+# Propriétés du document : éléments vidés (core.xml : tous sauf les dates et le n° de révision)
+_CORE_KEPT = {DCTERMS_NS + "}created", DCTERMS_NS + "}modified", CP_NS + "}lastPrinted", CP_NS + "}revision"}
+_PROPERTIES_CLEARED = {
+    "docProps/app.xml": {EP_NS + "}Company", EP_NS + "}Manager", EP_NS + "}HyperlinkBase", VT_NS + "}lpstr"},
+    "docProps/custom.xml": {VT_NS + "}lpwstr", VT_NS + "}lpstr", VT_NS + "}bstr"},
+}
+_CUSTOM_XML_ITEM = re.compile(r"customXml/item\d+\.xml", re.IGNORECASE)
+
+# Fin d'une balise : '>' hors valeurs d'attributs
+_TAG_END = re.compile(rb"""(?:[^>"']|"[^"]*"|'[^']*')*>""")
+
+
+def _escape_text(data: str) -> str:
+    return data.replace("&", "&amp;").replace("<", "&lt;").replace(">", "&gt;")
+
+
+def _escape_attribute(data: str) -> str:
+    return _escape_text(data).replace('"', "&quot;")
+
+
+# Partie XML du paquet (réécrite), par son nom dans le zip
+def is_xml_part(name: str) -> bool:
+    return name.lower().endswith((".xml", ".rels"))
+
+
+class _PartRewriter:
+
+    def __init__(self, parser, out: BinaryIO, name: str, paragraph_starts: Dict[int, int],
+                 spans: List[Tuple[int, int, str]]):
+        self._parser = parser
+        self._out = out
+        # Octets lus et pas encore recopiés ; _base = position de _raw[0] dans la partie
+        self._raw = bytearray()
+        self._base = 0
+        self._written = 0
+        # Début du dernier événement expat : au-delà, les octets peuvent appartenir à une balise incomplète
+        self._last = 0
+        # Position à partir de laquelle la copie est suspendue (texte en cours de réécriture, élément retiré)
+        self._hold: Optional[int] = None
+        self._encoding = "utf-8"
+        self._starts = paragraph_starts
+        # Entités (début, fin, jeton) triées, sans chevauchement (voir entity_fusion)
+        self._spans = spans
+        self._span_ends = [end for _, end, _ in spans]
+        self._tokens_written = set()
+        # Règles propres à la partie
+        self._core = name == "docProps/core.xml"
+        self._cleared = _PROPERTIES_CLEARED.get(name, ())
+        self._blank_all = bool(_CUSTOM_XML_ITEM.fullmatch(name))
+        # Résolution des préfixes (parseur sans traitement des espaces de noms : positions d'origine)
+        self._scopes: List[Dict[str, str]] = [{"xml": "http://www.w3.org/XML/1998/namespace"}]
+        self._resolved: Dict[str, str] = {}
+        self._depth = 0
+        # Suivi des paragraphes, mêmes règles que _ParagraphCollector : mc:Fallback imbriqués,
+        # paragraphes ouverts [n° de paragraphe, longueur locale déjà lue], w:t ouverts
+        self._fallback = 0
+        self._open: List[List[int]] = []
+        self._count = 0
+        self._in_text = 0
+        # Élément retiré en cours : profondeur de sa balise ouvrante
+        self._drop: Optional[int] = None
+        # Texte en cours de réécriture : début du contenu, profondeur de l'élément, masqué (w:t d'un
+        # paragraphe analysé) ou vidé, texte de remplacement, modifié ou non
+        self._text_at: Optional[int] = None
+        self._text_depth = 0
+        self._masking = False
+        self._pieces: List[str] = []
+        self._changed = False
+
+    # -- copie -----------------------------------------------------------------------------
+
+    def feed(self, chunk: bytes):
+        self._raw += chunk
+        self._parser.Parse(chunk, not chunk)
+        limit = self._last if chunk else self._base + len(self._raw)
+        self._copy_to(limit if self._hold is None else min(limit, self._hold))
+        del self._raw[:self._written - self._base]
+        self._base = self._written
+
+    def _copy_to(self, position: int):
+        if position > self._written:
+            self._out.write(self._raw[self._written - self._base:position - self._base])
+            self._written = position
+
+    # Position qui suit la fin de la balise commençant (ou se terminant) à `position`
+    def _tag_end(self, position: int) -> int:
+        return _TAG_END.match(self._raw, position - self._base).end() + self._base
+
+    def _resolve(self, name: str) -> str:
+        qname = self._resolved.get(name)
+        if qname is None:
+            prefix, _, local = name.rpartition(":")
+            qname = name
+            for scope in reversed(self._scopes):
+                if prefix in scope:
+                    qname = scope[prefix] + "}" + local
+                    break
+            self._resolved[name] = qname
+        return qname
+
+    # Attributs de la balise ouvrante après nettoyage, None si inchangés
+    def _clean_attributes(self, qname: str, attrs: List[str]) -> Optional[List[str]]:
+        cleaned = None
+        external = qname == _RELATIONSHIP and dict(zip(attrs[::2], attrs[1::2])).get("TargetMode") == "External"
+        for i in range(0, len(attrs), 2):
+            key, value = attrs[i], attrs[i + 1]
+            if key.rpartition(":")[2] in _CLEARED_ATTRIBUTES:
+                value = ""
+            elif external and key == "Target":
+                value = EXTERNAL_TARGET
+            if value != attrs[i + 1]:
+                if cleaned is None:
+                    cleaned = list(attrs)
+                cleaned[i + 1] = value
+        return cleaned
+
+    def _write_start_tag(self, name: str, attrs: List[str]):
+        end = self._tag_end(self._last)
+        closing = "/>" if self._raw[end - self._base - 2] == ord("/") else ">"
+        self._copy_to(self._last)
+        pairs = "".join(f' {attrs[i]}="{_escape_attribute(attrs[i + 1])}"' for i in range(0, len(attrs), 2))
+        self._out.write(f"<{name}{pairs}{closing}".encode(self._encoding))
+        self._written = end
+
+    # Début d'un texte réécrit : contenu de l'élément qui commence à _last
+    def _begin_text(self, depth: int, masking: bool):
+        self._text_at = self._tag_end(self._last)
+        self._hold = self._text_at
+        self._text_depth = depth
+        self._masking = masking
+        self._pieces = []
+        self._changed = False
+
+    # Fin du texte réécrit (avant la balise qui commence à _last)
+    def _end_text(self):
+        if self._changed:
+            self._copy_to(self._text_at)
+            self._out.write(_escape_text("".join(self._pieces)).encode(self._encoding))
+            self._written = self._last
+        self._text_at = None
+        self._hold = None
+
+    # -- gestionnaires expat ---------------------------------------------------------------
+
+    def xml_decl(self, version, encoding, standalone):
+        if encoding:
+            self._encoding = encoding
+
+    def start(self, name: str, attrs: List[str]):
+        self._last = self._parser.CurrentByteIndex
+        scope = None
+        for i in range(0, len(attrs), 2):
+            key = attrs[i]
+            if key == "xmlns" or key.startswith("xmlns:"):
+                if scope is None:
+                    scope = {}
+                scope[key[6:]] = attrs[i + 1]
+        self._scopes.append(scope or {})
+        if scope:
+            self._resolved = {}
+        qname = self._resolve(name)
+        depth = self._depth
+        self._depth += 1
+
+        # Suivi des paragraphes (positions du texte extrait)
+        analysed = False
+        if self._fallback:
+            if qname == _FALLBACK:
+                self._fallback += 1
+        elif qname == _FALLBACK:
+            self._fallback = 1
+        elif qname == _P:
+            self._open.append([self._count, 0])
+            self._count += 1
+        elif self._open:
+            if qname == _T:
+                self._in_text += 1
+                analysed = self._open[-1][0] in self._starts
+            elif qname in _CHAR_ELEMENTS:
+                self._open[-1][1] += 1
+
+        # Sortie
+        if self._drop is not None:
+            return
+        if self._blank_all and self._text_at is not None:
+            self._end_text()
+        elif self._text_at is not None:
+            return
+        if qname in _DROPPED:
+            # Copie jusqu'au début de l'élément, puis suspendue jusqu'à sa fin
+            self._copy_to(self._last)
+            self._hold = self._last
+            self._drop = depth
+            return
+        cleaned = self._clean_attributes(qname, attrs)
+        if cleaned is not None:
+            self._write_start_tag(name, cleaned)
+        if (qname == _T or qname == _A_T or self._blank_all or qname in self._cleared
+                or (self._core and depth == 1 and qname not in _CORE_KEPT)):
+            self._begin_text(depth, analysed)
+
+    def end(self, name: str):
+        self._last = self._parser.CurrentByteIndex
+        qname = self._resolve(name)
+        if self._scopes.pop():
+            self._resolved = {}
+        self._depth -= 1
+        depth = self._depth
+
+        if self._fallback:
+            if qname == _FALLBACK:
+                self._fallback -= 1
+        elif qname == _T:
+            if self._in_text:
+                self._in_text -= 1
+        elif qname == _P and self._open:
+            self._open.pop()
+
+        if self._drop is not None:
+            if depth == self._drop:
+                # Élément omis : la copie reprend après sa balise fermante
+                self._written = self._tag_end(self._last)
+                self._hold = None
+                self._drop = None
+        elif self._text_at is not None and (self._blank_all or depth == self._text_depth):
+            self._end_text()
+            if self._blank_all and depth:
+                # Données XML personnalisées : texte qui suit la balise fermante vidé aussi
+                self._begin_text(depth, False)
+
+    def chars(self, data: str):
+        offset = None
+        if self._in_text and not self._fallback:
+            paragraph = self._open[-1]
+            start = self._starts.get(paragraph[0])
+            if start is not None:
+                offset = start + paragraph[1]
+            paragraph[1] += len(data)
+        if self._text_at is None or self._drop is not None:
+            return
+        if self._masking and offset is not None:
+            masked = self._mask(data, offset)
+        elif self._blank_all and not data.strip():
+            # Indentation des données XML personnalisées conservée
+            masked = data
+        else:
+            masked = ""
+        self._pieces.append(masked)
+        if masked != data:
+            self._changed = True
+
+    # Texte d'un w:t commençant à la position globale `offset`, entités remplacées.
+    def _mask(self, data: str, offset: int) -> str:
+        end = offset + len(data)
+        i = bisect_right(self._span_ends, offset)
+        if i >= len(self._spans) or self._spans[i][0] >= end:
+            return data
+        pieces: List[str] = []
+        cursor = offset
+        while i < len(self._spans) and self._spans[i][0] < end:
+            span_start, span_end, token = self._spans[i]
+            if span_start > cursor:
+                pieces.append(data[cursor - offset:span_start - offset])
+            if i not in self._tokens_written:
+                self._tokens_written.add(i)
+                pieces.append(token)
+            cursor = min(span_end, end)
+            i += 1
+        pieces.append(data[cursor - offset:])
+        return "".join(pieces)
+
+
+def _rewrite_part(source: BinaryIO, out: BinaryIO, name: str, paragraph_starts: Dict[int, int],
+                  spans: List[Tuple[int, int, str]], chunk_size: int = CHUNK_SIZE):
+    parser = expat.ParserCreate()
+    rewriter = _PartRewriter(parser, out, name, paragraph_starts, spans)
+    parser.ordered_attributes = True
+    parser.buffer_text = True
+    parser.XmlDeclHandler = rewriter.xml_decl
+    parser.StartElementHandler = rewriter.start
+    parser.EndElementHandler = rewriter.end
+    parser.CharacterDataHandler = rewriter.chars
+    while True:
+        chunk = source.read(chunk_size)
+        rewriter.feed(chunk)
+        if not chunk:
+            return
+
+
+# Écrit dans `out` le DOCX masqué.
+#  Args:
+#      - source: DOCX d'origine (octets ou fichier).
+#      - text_map: TextMap de l'extraction de ce même fichier (extract_docx).
+#      - spans: entités (positions dans le texte extrait), sans chevauchement.
+#      - out: fichier de sortie (binaire, accès séquentiel suffisant).
+#  Remarque : seules les parties texte (list_text_parts) gardent leur texte ; le texte des autres parties
+#  XML est vidé (voir ci-dessus).
+
+def redact_docx(source: Union[bytes, BinaryIO], text_map: TextMap, spans, out: BinaryIO,
+                chunk_size: int = CHUNK_SIZE):
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        source = io.BytesIO(source)
+    ordered = sorted(((s.start, s.end, f"<{s.type}_MASKED>") for s in spans), key=lambda s: s[0])
+
+    # Position de chaque paragraphe non vide, par partie
+    starts: Dict[str, Dict[int, int]] = {}
+    for start, _, part, paragraph in text_map.segments():
+        starts.setdefault(part, {})[paragraph] = start
+
+    with zipfile.ZipFile(source) as zin, zipfile.ZipFile(out, "w", zipfile.ZIP_DEFLATED) as zout:
+        for item in zin.infolist():
+            with zin.open(item) as src, zout.open(_output_info(item), "w", force_zip64=item.file_size > 2**31) as dst:
+                if is_xml_part(item.filename):
+                    _rewrite_part(src, dst, item.filename, starts.get(item.filename, {}), ordered, chunk_size)
+                else:
+                    while True:
+                        chunk = src.read(chunk_size)
+                        if not chunk:
+                            break
+                        dst.write(chunk)
+
+
+# Entrée du zip de sortie : même nom, date et attributs, toujours compressée (sauf dossiers)
+def _output_info(item: zipfile.ZipInfo) -> zipfile.ZipInfo:
+    info = zipfile.ZipInfo(item.filename, date_time=item.date_time)
+    info.external_attr = item.external_attr
+    info.compress_type = zipfile.ZIP_STORED if item.is_dir() else zipfile.ZIP_DEFLATED
+    return info
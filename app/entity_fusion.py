@@ -1,44 +1,74 @@
 # ------------------------------------------------------------------------------------------------------------------------------------------------------------------
 # MODULE : ENTITY FUSION
-# Description : Fusionne les entités détectées par les règles (rule-based) et par le modèle ML (NER).
+# Description : Fusionne les entités détectées par plusieurs sources (règles, NER général, NER médical...).
 #
 # Remarque :
-#   - Pour le moment on considère que les entités issues des règles sont prioritaires (IBAN, CB, EMAIL, PHONE, etc.).
-#   - Si une entité ML chevauche une entité de rules (même zone de texte),
-#     on ignore l'entité ML pour éviter les doublons ou conflits.
-#   - Sinon, on garde l'entité ML.
+#   - Chaque source a une priorité (settings.json -> fusion.priority). Par défaut les règles
+#     déterministes (IBAN, CB, EMAIL, PHONE, etc.) passent avant les modèles ML.
+#   - Le résultat ne contient aucun chevauchement, y compris entre deux sources ML ou à l'intérieur
+#     d'une même source : en cas de conflit on garde l'entité de la source la plus prioritaire, puis
+#     la plus confiante, puis la plus longue, puis la première dans le texte.
+#   - Les entités acceptées sont indexées par position (bisect) : chaque vérification de chevauchement
+#     coûte O(log n) au lieu de parcourir toutes les entités de règles. L'insertion dans les listes triées
+#     (list.insert) reste O(n) (un memmove) : O(n²) dans le pire cas (entités gardées de droite à gauche),
+#     avec une constante faible (environ 60 ms pour 10 000 entités, 1 s pour 50 000 dans ce pire cas) ;
+#     le tri des candidats et le tri final sont en O(n log n). Un index en Python pur sans insertion
+#     (arbre de Fenwick) évite le pire cas mais triple le temps des cas courants.
+#   - La liste renvoyée est triée par position de début.
 # ------------------------------------------------------------------------------------------------------------------------------------------------------------------
 
-from typing import List
-from app.models import Entity
+from bisect import bisect_left
+from typing import Dict, List, Optional, Sequence
+
+from app.models import Span
+from app.config import get_fusion_priority
 
 # ---------------------------------------------------------------------------------
-#                               FUUUUUUSION 
+#                               FUUUUUUSION
 # ---------------------------------------------------------------------------------
-#  Args: 
-#      - rule_entities: Entités détectées via regex (source="rules").
-#      - ml_entities: Entités détectées via NER (source="ml").
+#  Args:
+#      - sources: entités par source, ex: {"rules": [...], "general": [...], "medical": [...]}.
+#      - priority: noms des sources de la plus prioritaire à la moins prioritaire
+#                  (défaut : settings.json). Les sources absentes de la liste passent après.
 #  Returns:
-#      - Liste fusionnée d'entités sans doublons grossiers.
-  
-def fuse_entities(rule_entities: List[Entity], ml_entities: List[Entity]) -> List[Entity]:
+#      - Liste d'entités sans chevauchement, triée par position.
+
+def fuse_sources(sources: Dict[str, List[Span]], priority: Optional[Sequence[str]] = None) -> List[Span]:
 
-    fused: List[Entity] = []        
+    if priority is None:
+        priority = get_fusion_priority()
+    rank = {name: i for i, name in enumerate(priority)}
 
-    # 1) On ajoute toutes les entités rules (prioritaires)
-    fused.extend(rule_entities)
+    # 1) Candidats triés du plus prioritaire au moins prioritaire
+    candidates = []
+    for order, (name, entities) in enumerate(sources.items()):
+        source_rank = rank.get(name, len(rank) + order)
+        for e in entities:
+            # Une entité vide ne masque rien
+            if e.end > e.start:
+                candidates.append((source_rank, -e.confidence, e.start - e.end, e.start, e))
+    candidates.sort(key=lambda c: c[:4])
 
-    # 2) Pour chaque entité ML, on regarde si elle chevauche une entité rules
-    for ml_ent in ml_entities:
-        overlaps = False
+    # 2) Acceptation gloutonne : une entité est gardée si elle ne chevauche aucune entité déjà gardée.
+    #    starts / ends : intervalles acceptés, sans chevauchement, triés par début.
+    #    kept : entités acceptées, triées une seule fois à la fin.
+    starts: List[int] = []
+    ends: List[int] = []
+    kept: List[Span] = []
+    for _, _, _, _, e in candidates:
+        # Dernier intervalle accepté qui commence avant la fin de e : c'est le seul qui peut la chevaucher
+        idx = bisect_left(starts, e.end)
+        if idx > 0 and ends[idx - 1] > e.start:
+            continue
+        starts.insert(idx, e.start)
+        ends.insert(idx, e.end)
+        kept.append(e)
 
-        for rule_ent in rule_entities:
-            # chevauchement si les intervalles [start, end] se recoupent
-            if not (ml_ent.end <= rule_ent.start or ml_ent.start >= rule_ent.end):
-                overlaps = True
-                break
+    # Sans chevauchement : les débuts sont tous distincts
+    kept.sort(key=lambda e: e.start)
+    return kept
 
-        if not overlaps:
-            fused.append(ml_ent)
 
-    return fused
+# Fusion à deux sources (règles prioritaires sur le ML), conservée pour les appels existants.
+def fuse_entities(rule_entities: List[Span], ml_entities: List[Span]) -> List[Span]:
+    return fuse_sources({"rules": rule_entities, "ml": ml_entities}, priority=("rules", "ml"))
@@ -0,0 +1,141 @@
+# ------------------------------------------------------------------------------------------------------------------------------------------------------------------
+# MODULE : EXECUTOR
+# Description : Pool de threads dédié (et borné) pour exécuter les détecteurs en parallèle.
+#
+# Objectif :
+#  - rules, NER général et NER médical tournent en même temps : la latence d'une requête
+#    devient celle du détecteur le plus lent au lieu de la somme des trois.
+#  - Les threads intra-op de PyTorch sont répartis entre les deux modèles pour ne pas
+#    dépasser le nombre de coeurs quand ils calculent en même temps.
+#
+# Remarque :
+#  - Taille du pool et répartition des threads : section 'concurrency' de settings.json.
+#    torch_threads à 0 -> répartition automatique (moitié des coeurs pour chaque modèle).
+#  - Ne jamais attendre un Future de ce pool depuis un thread du pool (risque d'interblocage).
+# ------------------------------------------------------------------------------------------------------------------------------------------------------------------
+
+import os
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional
+
+from app.config import get_concurrency_config
+from app.metrics import stage_timer
+
+# Taille par défaut du pool : rules + NER général + NER médical + 1 de marge
+DEFAULT_DETECTOR_WORKERS = 4
+
+_executor: Optional[ThreadPoolExecutor] = None
+_executor_lock = threading.Lock()
+
+# Nom de l'étape (métriques) de chaque détecteur
+DETECTOR_STAGES = {"rules": "rules", "general": "ner_general", "medical": "ner_medical"}
+
+# Nombre de threads torch appliqué au thread courant (évite de le redéfinir à chaque appel)
+_thread_state = threading.local()
+
+
+# ---------------------------------------------------------------------------------
+#                      REPARTITION DES THREADS TORCH
+# ---------------------------------------------------------------------------------
+# Retourne le nombre de threads intra-op à utiliser pour un détecteur ('general' / 'medical').
+# None pour les détecteurs qui n'utilisent pas torch (rules).
+
+def get_torch_threads(kind: str) -> Optional[int]:
+    configured: Dict[str, int] = get_concurrency_config().get("torch_threads", {})
+    if kind not in ("general", "medical"):
+        return None
+    if configured.get(kind):
+        return configured[kind]
+    cores = os.cpu_count() or 1
+    general = max(1, cores // 2)
+    return general if kind == "general" else max(1, cores - general)
+
+
+def _set_torch_threads(n: int):
+    if getattr(_thread_state, "torch_threads", None) == n:
+        return
+    import torch
+    torch.set_num_threads(n)
+    _thread_state.torch_threads = n
+
+
+# Applique au thread courant le nombre de threads torch du détecteur.
+def apply_torch_threads(kind: str):
+    n = get_torch_threads(kind)
+    if n:
+        _set_torch_threads(n)
+
+
+def _run_detector(kind: str, fn: Callable, *args) -> Any:
+    apply_torch_threads(kind)
+    # Durée de l'appel du détecteur (un appel = un texte, ou un lot pour le ML)
+    with stage_timer(DETECTOR_STAGES.get(kind, kind)):
+        return fn(*args)
+
+
+# ---------------------------------------------------------------------------------
+#                      POOL DES DETECTEURS
+# ---------------------------------------------------------------------------------
+
+def get_executor() -> ThreadPoolExecutor:
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                workers = get_concurrency_config().get("detector_workers", DEFAULT_DETECTOR_WORKERS)
+                _executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="detector")
+    return _executor
+
+
+# Soumet un détecteur au pool.
+#  Args:
+#      - kind: 'rules', 'general' ou 'medical' (choisit le nombre de threads torch).
+#      - fn, args: fonction de détection et ses arguments.
+#  Returns:
+#      - Future du résultat du détecteur.
+
+def submit_detector(kind: str, fn: Callable, *args) -> Future:
+    return get_executor().submit(_run_detector, kind, fn, *args)
+
+
+# Combine plusieurs Futures en un seul, résolu avec le tuple de leurs résultats
+# (ou avec la première exception rencontrée).
+# Annuler le Future combiné (échéance dépassée, voir admission.py) annule les Futures pas encore démarrés.
+
+def combine_futures(*futures: Future) -> Future:
+    combined: Future = Future()
+    remaining = [len(futures)]
+    lock = threading.Lock()
+
+    def _on_done(_):
+        with lock:
+            remaining[0] -= 1
+            if remaining[0] or combined.done():
+                return
+        if any(f.cancelled() for f in futures):
+            combined.cancel()
+            return
+        for f in futures:
+            if f.exception() is not None:
+                combined.set_exception(f.exception())
+                return
+        combined.set_result(tuple(f.result() for f in futures))
+
+    def _on_combined_done(_):
+        if combined.cancelled():
+            for f in futures:
+                f.cancel()
+
+    for f in futures:
+        f.add_done_callback(_on_done)
+    combined.add_done_callback(_on_combined_done)
+    return combined
+
+
+def shutdown_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is not None:
+            _executor.shutdown(wait=True)
+            _executor = None
@@ -0,0 +1,195 @@
+# ------------------------------------------------------------------------------------------------------------------------------------------------------------------
+# MODULE : INFERENCE CLIENT
+# Description : Côté worker de l'API du serveur d'inférence partagé (voir inference_server.py).
+#
+# Objectif :
+#  - Avec plusieurs workers uvicorn, chaque processus chargeait ses propres poids camembert-ner et GLiNER :
+#    la mémoire du pod croissait avec le nombre de workers. En mode "server" (section 'inference'),
+#    un seul processus local possède les modèles ; les workers lui envoient leurs lots de textes
+#    par un socket Unix (multiprocessing.connection) et ne chargent aucun poids.
+#  - Le micro-batcher et /sanitize-batch passent par detect_entities_ml_batch (batching.py) : en mode
+#    "server", un lot du worker = un aller-retour sur le socket.
+#
+# Remarque :
+#  - Section 'inference' de settings.json :
+#      - mode : "local" (défaut, modèles dans chaque worker) | "server"
+#      - socket_path : non défini -> <répertoire d'exécution privé>/inference.sock, répertoire
+#        $XDG_RUNTIME_DIR/desens (ou <tmp>/desens-<uid>) créé en 0700 et refusé s'il appartient à un autre
+#        utilisateur ou s'il est accessible au groupe / aux autres.
+#      - client_connections (connexions simultanées par worker), request_timeout_seconds
+#      - authkey_env : variable d'environnement portant la clé partagée (handshake multiprocessing),
+#        obligatoire en mode "server" (serveur et workers refusent de démarrer sans elle) : les requêtes
+#        sont des objets picklés, seul un processus qui connaît la clé peut en envoyer.
+#  - Une connexion coupée (serveur redémarré) est rouverte une fois avant de remonter l'erreur.
+#  - Durée des allers-retours : étape "inference" de desens_stage_duration_seconds.
+# ------------------------------------------------------------------------------------------------------------------------------------------------------------------
+
+import os
+import tempfile
+import threading
+from multiprocessing.connection import Client, Connection
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from app.config import get_inference_config
+from app.metrics import stage_timer
+from app.models import Span, span_type
+
+# Valeurs par défaut si la section 'inference' de settings.json est incomplète
+DEFAULT_MODE = "local"
+DEFAULT_SOCKET_NAME = "inference.sock"
+DEFAULT_CLIENT_CONNECTIONS = 4
+DEFAULT_REQUEST_TIMEOUT_SECONDS = 120
+DEFAULT_AUTHKEY_ENV = "DESENS_INFERENCE_AUTHKEY"
+
+# Entité sur le socket : (type, début, fin, confiance, source)
+WireSpan = Tuple[str, int, int, float, str]
+
+
+class InferenceUnavailable(RuntimeError):
+    """Serveur d'inférence injoignable, connexion coupée ou délai de réponse dépassé."""
+
+
+class InferenceError(RuntimeError):
+    """Erreur renvoyée par le serveur d'inférence (exception levée pendant l'inférence)."""
+
+
+def is_remote() -> bool:
+    return get_inference_config().get("mode", DEFAULT_MODE) == "server"
+
+
+# Répertoire d'exécution réservé à l'utilisateur du service (créé au besoin)
+def private_runtime_dir() -> str:
+    base = os.environ.get("XDG_RUNTIME_DIR")
+    directory = os.path.join(base, "desens") if base else os.path.join(tempfile.gettempdir(), f"desens-{os.getuid()}")
+    os.makedirs(directory, mode=0o700, exist_ok=True)
+    st = os.stat(directory)
+    if st.st_uid != os.getuid() or st.st_mode & 0o077:
+        raise RuntimeError(f"{directory} must be owned by the service user and private (mode 0700)")
+    return directory
+
+
+def socket_path(cfg: Optional[Dict[str, Any]] = None) -> str:
+    cfg = get_inference_config() if cfg is None else cfg
+    return cfg.get("socket_path") or os.path.join(private_runtime_dir(), DEFAULT_SOCKET_NAME)
+
+
+def authkey(cfg: Optional[Dict[str, Any]] = None) -> bytes:
+    cfg = get_inference_config() if cfg is None else cfg
+    name = cfg.get("authkey_env", DEFAULT_AUTHKEY_ENV)
+    value = os.environ.get(name)
+    if not value:
+        raise RuntimeError(f"Inference server mode requires a shared key: set the {name} environment variable")
+    return value.encode("utf-8")
+
+
+# ---------------------------------------------------------------------------------
+#                      FORMAT DES ENTITES SUR LE SOCKET
+# ---------------------------------------------------------------------------------
+# Tuples simples (pickle compact), reconstruits en Span à l'arrivée avec les types partagés.
+
+def spans_to_wire(spans: Sequence[Span]) -> List[WireSpan]:
+    return [(s.type, s.start, s.end, s.confidence, s.source) for s in spans]
+
+
+def spans_from_wire(rows: Sequence[WireSpan]) -> List[Span]:
+    return [Span(span_type(t), start, end, confidence, source) for t, start, end, confidence, source in rows]
+
+
+# ---------------------------------------------------------------------------------
+#                      CLIENT (POOL DE CONNEXIONS)
+# ---------------------------------------------------------------------------------
+# Protocole : requête (op, payload) -> réponse ("ok", résultat) | ("error", message)
+#   - ("detect", [textes]) -> [(entités générales, entités médicales), ...] dans l'ordre des textes
+#   - ("states", None)     -> état des modèles du serveur (même format que warmup.get_model_states)
+
+class InferenceClient:
+
+    def __init__(self, address: str, key: bytes,
+                 max_connections: int = DEFAULT_CLIENT_CONNECTIONS,
+                 timeout: float = DEFAULT_REQUEST_TIMEOUT_SECONDS):
+        self.address = address
+        self._authkey = key
+        self.timeout = timeout
+        self._slots = threading.BoundedSemaphore(max(1, max_connections))
+        self._idle: List[Connection] = []
+        self._lock = threading.Lock()
+
+    def _connect(self) -> Connection:
+        try:
+            return Client(self.address, family="AF_UNIX", authkey=self._authkey)
+        except (OSError, EOFError) as e:
+            raise InferenceUnavailable(f"Inference server unreachable at {self.address}: {e}") from e
+
+    def _exchange(self, conn: Connection, op: str, payload: Any) -> Tuple[str, Any]:
+        conn.send((op, payload))
+        if not conn.poll(self.timeout):
+            raise TimeoutError(f"No answer from inference server within {self.timeout}s")
+        return conn.recv()
+
+    def call(self, op: str, payload: Any = None) -> Any:
+        with self._slots:
+            with self._lock:
+                conn = self._idle.pop() if self._idle else None
+            reused = conn is not None
+            if conn is None:
+                conn = self._connect()
+            try:
+                try:
+                    status, result = self._exchange(conn, op, payload)
+                except (EOFError, OSError):
+                    # Connexion inactive coupée (serveur redémarré) : une nouvelle tentative
+                    conn.close()
+                    if not reused:
+                        raise
+                    conn = self._connect()
+                    status, result = self._exchange(conn, op, payload)
+            except (EOFError, OSError, TimeoutError) as e:
+                conn.close()
+                raise InferenceUnavailable(f"Inference request '{op}' failed: {e}") from e
+            with self._lock:
+                self._idle.append(conn)
+        if status != "ok":
+            raise InferenceError(result)
+        return result
+
+    def detect_batch(self, texts: List[str]) -> List[Tuple[List[Span], List[Span]]]:
+        with stage_timer("inference"):
+            rows = self.call("detect", list(texts))
+        return [(spans_from_wire(general), spans_from_wire(medical)) for general, medical in rows]
+
+    def model_states(self) -> Dict[str, Dict[str, Any]]:
+        return self.call("states")
+
+    def close(self):
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for conn in idle:
+            conn.close()
+
+
+# Instance unique par processus (créée au premier usage, lue dans la section 'inference')
+_client: Optional[InferenceClient] = None
+_client_lock = threading.Lock()
+
+
+def get_inference_client() -> InferenceClient:
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                cfg = get_inference_config()
+                _client = InferenceClient(
+                    socket_path(cfg),
+                    authkey(cfg),
+                    max_connections=cfg.get("client_connections", DEFAULT_CLIENT_CONNECTIONS),
+                    timeout=cfg.get("request_timeout_seconds", DEFAULT_REQUEST_TIMEOUT_SECONDS),
+                )
+    return _client
+
+
+def shutdown_inference_client():
+    global _client
+    with _client_lock:
+        if _client is not None:
+            _client.close()
+            _client = None
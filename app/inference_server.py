@@ -0,0 +1,153 @@
+# ------------------------------------------------------------------------------------------------------------------------------------------------------------------
+# MODULE : INFERENCE SERVER
+# Description : Processus d'inférence partagé : charge camembert-ner et GLiNER une seule fois et sert les
+#               workers de l'API par un socket Unix (voir inference_client.py pour le protocole).
+#
+# Utilisation (depuis la racine du projet) :
+#   export DESENS_INFERENCE_AUTHKEY=...                  # clé partagée, obligatoire (inference.authkey_env)
+#   python -m app.inference_server                       # socket de settings.json (inference.socket_path)
+#   python -m app.inference_server --socket /run/desens/inference.sock
+#   puis les workers avec inference.mode = "server" (même clé dans leur environnement) :
+#   uvicorn app.main:app --workers 4
+#
+# Remarque :
+#  - Les modèles sont chargés et chauffés (section 'startup') avant d'ouvrir le socket : un worker qui se
+#    connecte trouve des modèles prêts ; /ready des workers reflète l'état des modèles du serveur.
+#  - Une connexion = un thread ; les lots de plusieurs workers sont traités en parallèle sur le pool
+#    des détecteurs du serveur (section 'concurrency', mêmes réglages qu'en mode local).
+#  - Les métriques des étapes NER (ner_general, ner_medical, porte médicale) restent dans ce processus ;
+#    les workers mesurent l'aller-retour (étape "inference").
+#  - Sécurité : les requêtes sont des objets picklés. Le serveur refuse de démarrer sans clé partagée, et le
+#    socket est créé sous umask 0o077 (réservé au propriétaire dès sa création, sans fenêtre avant un chmod), par défaut
+#    dans un répertoire d'exécution privé (voir inference_client.socket_path).
+# ------------------------------------------------------------------------------------------------------------------------------------------------------------------
+
+import argparse
+import os
+import signal
+import socket
+import threading
+from multiprocessing import AuthenticationError
+from multiprocessing.connection import Connection, Listener
+from typing import Any, Callable, List, Optional
+
+from app.batching import MLResult, detect_entities_ml_batch_local
+from app.inference_client import authkey, socket_path, spans_to_wire
+from app.warmup import get_model_states, preload_models
+
+
+# Supprime un fichier de socket laissé par un serveur arrêté brutalement (refus si un serveur répond encore).
+def _remove_stale_socket(address: str):
+    if not os.path.exists(address):
+        return
+    probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        probe.connect(address)
+    except OSError:
+        os.unlink(address)
+        return
+    finally:
+        probe.close()
+    raise RuntimeError(f"Another inference server is already listening on {address}")
+
+
+class InferenceServer:
+
+    def __init__(self, address: str, key: bytes,
+                 detect: Callable[[List[str]], List[MLResult]] = detect_entities_ml_batch_local):
+        if not key:
+            raise ValueError("The inference server requires a shared authkey")
+        self.address = address
+        self._authkey = key
+        self._detect = detect
+        self._listener: Optional[Listener] = None
+        self._closed = threading.Event()
+
+    def _dispatch(self, op: str, payload: Any) -> Any:
+        if op == "detect":
+            return [(spans_to_wire(general), spans_to_wire(medical)) for general, medical in self._detect(payload)]
+        if op == "states":
+            return get_model_states()
+        raise ValueError(f"Unknown inference operation '{op}'")
+
+    def _handle(self, conn: Connection):
+        try:
+            while True:
+                try:
+                    op, payload = conn.recv()
+                except (EOFError, OSError):
+                    return
+                try:
+                    reply = ("ok", self._dispatch(op, payload))
+                except Exception as e:
+                    # Erreur d'inférence : renvoyée au worker, la connexion reste ouverte
+                    reply = ("error", f"{type(e).__name__}: {e}")
+                conn.send(reply)
+        finally:
+            conn.close()
+
+    def listen(self):
+        _remove_stale_socket(self.address)
+        # Socket réservé à l'utilisateur du service dès sa création (umask du processus, rétabli aussitôt)
+        previous = os.umask(0o077)
+        try:
+            self._listener = Listener(self.address, family="AF_UNIX", authkey=self._authkey)
+        finally:
+            os.umask(previous)
+        print(f"[INFERENCE] Listening on {self.address}")
+
+    def serve_forever(self):
+        if self._listener is None:
+            self.listen()
+        while not self._closed.is_set():
+            try:
+                conn = self._listener.accept()
+            except AuthenticationError:
+                print("[INFERENCE] Connection refused: authentication failed")
+                continue
+            except OSError:
+                # Listener fermé par close()
+                if self._closed.is_set():
+                    return
+                raise
+            threading.Thread(target=self._handle, args=(conn,), name="inference-conn", daemon=True).start()
+
+    # Démarre le serveur dans un thread (socket ouvert au retour).
+    def start(self) -> threading.Thread:
+        self.listen()
+        thread = threading.Thread(target=self.serve_forever, name="inference-server", daemon=True)
+        thread.start()
+        return thread
+
+    def close(self):
+        self._closed.set()
+        if self._listener is not None:
+            # Supprime aussi le fichier du socket
+            self._listener.close()
+            self._listener = None
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serveur d'inférence partagé (camembert-ner + GLiNER).")
+    parser.add_argument("--socket", default=None, help="chemin du socket Unix (défaut : inference.socket_path)")
+    args = parser.parse_args(argv)
+
+    # Clé et socket vérifiés avant le chargement des modèles (échec immédiat), modèles prêts avant l'ouverture
+    server = InferenceServer(args.socket or socket_path(), authkey())
+    preload_models()
+
+    def _stop(signum, frame):
+        raise KeyboardInterrupt
+
+    signal.signal(signal.SIGTERM, _stop)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.close()
+        print("[INFERENCE] Stopped")
+
+
+if __name__ == "__main__":
+    main()
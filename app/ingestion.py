@@ -11,13 +11,24 @@
 # ------------------------------------------------------------------------------------------------------------------------------------------------------------------
 
 from dataclasses import dataclass 
-from typing import Dict, Optional 
+from concurrent.futures import ProcessPoolExecutor 
+from typing import Any, BinaryIO, Dict, Iterator, List, Optional, Tuple 
 import io 
+import multiprocessing
 import os 
+import threading 
+import time 
 import pdfplumber
-import docx 
-from PIL import Image 
-import pytesseract 
+from pdfminer.converter import TextConverter 
+from pdfminer.layout import LAParams 
+from pdfminer.pdfdocument import PDFDocument 
+from pdfminer.pdfinterp import PDFPageInterpreter, PDFResourceManager 
+from pdfminer.pdfpage import PDFPage 
+from pdfminer.pdfparser import PDFParser 
+
+from app.config import get_pdf_config, get_ocr_config 
+from app.docx_stream import extract_docx 
+from app.ocr import ocr_image_bytes, ocr_pdf_pages, ocr_pdf_page, needs_ocr 
 
 
 # Classe pour stocker le résultat de l'ingestion.
@@ -29,6 +40,8 @@ class IngestResult:
     source_type: str 
     # Dictionnaire contenant les métadonnées de la source (taille, pages, etc.).
     metadata: Dict[str, object] 
+    # Position dans raw_text -> emplacement dans le fichier d'origine (DOCX : TextMap, voir docx_stream.py)
+    text_map: Optional[Any] = None 
 
 
 # ---------------------------------------------------------------------------------
@@ -135,16 +148,23 @@ def _guess_source_type(filename: Optional[str], content_type: Optional[str]) ->
 # ---------------------------------------------------------------------------------
 
 def _ingest_pdf(content: bytes, filename: str) -> IngestResult: 
-    # Initialise une liste pour stocker le texte de chaque page
-    text_parts = []
-    # Ouvre le contenu binaire du PDF avec pdfplumber
-    with pdfplumber.open(io.BytesIO(content)) as pdf: 
-        # Itère sur toutes les pages du PDF
-        for page in pdf.pages: 
-            # Extraction du texte de la page ou " "  si échec
-            page_text = page.extract_text() or "" 
-            # Ajoute le texte de la page à la liste
-            text_parts.append(page_text) 
+    cfg = get_pdf_config()
+    mode = cfg.get("mode", "layout")
+
+    # Limites : taille puis nombre de pages (avant toute extraction)
+    check_pdf_size(len(content), cfg)
+    page_count = check_pdf_pages(io.BytesIO(content), cfg)
+
+    # Extraction du texte de chaque page (en parallèle sur plusieurs processus pour les gros PDF)
+    pages, workers = _extract_pdf_pages(content, page_count, mode, cfg)
+    text_parts = [page_text for page_text, _ in pages]
+
+    # Pages sans couche texte (PDF scanné) -> OCR en parallèle
+    ocr_cfg = get_ocr_config()
+    scanned = [i for i, page_text in enumerate(text_parts) if needs_ocr(page_text, ocr_cfg)]
+    ocr_results = ocr_pdf_pages(content, scanned)
+    for i, (page_text, _) in ocr_results.items():
+        text_parts[i] = page_text
 
     # full_text = Les textes de la page avec un saut de ligne
     full_text = "\n".join(text_parts) 
@@ -158,33 +178,211 @@ def _ingest_pdf(content: bytes, filename: str) -> IngestResult:
             "pages": len(text_parts), # n pages
             "size": len(content), # taille en octets 
             "lang": "fr", # Langue -> fr
+            "extraction_mode": mode, # 'layout' (pdfplumber) ou 'fast' (pdfminer, mise en page réduite)
+            "extraction_workers": workers, # n processus utilisés (1 = séquentiel)
+            "page_timings_ms": [round(seconds * 1000, 2) for _, seconds in pages], # temps d'extraction par page
+            "ocr_pages": [i + 1 for i in scanned], # pages OCRisées (numéros à partir de 1)
+            "ocr_timings_ms": [round(ocr_results[i][1] * 1000, 2) for i in scanned], # temps d'OCR par page OCRisée
         }, 
     ) 
 
+# Itère sur les pages d'un PDF sans garder les pages précédentes en mémoire (streaming).
+#  Args:
+#      - source: fichier binaire ouvert (BytesIO, fichier temporaire de l'upload...), doit être "seekable".
+#      - mode: 'layout' ou 'fast' (défaut : settings.json -> pdf.mode).
+#  Returns:
+#      - Itérateur de (numéro de page à partir de 1, texte de la page).
+
+def iter_pdf_pages(source: BinaryIO, mode: Optional[str] = None) -> Iterator[Tuple[int, str]]: 
+    mode = mode or get_pdf_config().get("mode", "layout")
+    ocr_cfg = get_ocr_config()
+    for number, page_text in _iter_pdf_text(source, mode): 
+        # Page sans couche texte (scannée) -> OCR de cette seule page
+        if needs_ocr(page_text, ocr_cfg): 
+            page_text, _ = ocr_pdf_page(source, number - 1) 
+        yield number, page_text 
+
+
+def _iter_pdf_text(source: BinaryIO, mode: str) -> Iterator[Tuple[int, str]]: 
+    if mode == "fast":
+        source.seek(0)
+        for number, (page_text, _) in enumerate(_iter_pages_fast(source, None), start=1):
+            yield number, page_text
+        return
+
+    # Ouvre le PDF avec pdfplumber
+    with pdfplumber.open(source) as pdf: 
+        # Itère sur toutes les pages du PDF
+        for number, page in enumerate(pdf.pages, start=1): 
+            # Extraction du texte de la page ou " "  si échec
+            page_text = page.extract_text() or "" 
+            # Libère les objets analysés de la page (mémoire constante par page)
+            page.close() 
+            yield number, page_text 
+
+
+# ---------------------------------------------------------------------------------
+#                                LIMITES PDF 
+# ---------------------------------------------------------------------------------
+# Fichier trop gros ou trop de pages -> IngestionLimitError (HTTP 413 dans main.py)
+
+class IngestionLimitError(ValueError): 
+    pass
+
+
+def check_pdf_size(size: Optional[int], cfg: Optional[Dict[str, object]] = None): 
+    cfg = cfg if cfg is not None else get_pdf_config()
+    max_size = cfg.get("max_size_bytes", 0)
+    if max_size and size and size > max_size:
+        raise IngestionLimitError(f"PDF trop volumineux : {size} octets (max {max_size}).")
+
+
+# Vérifie le nombre de pages (lu dans l'arbre des pages, sans analyser leur contenu) et le retourne.
+def check_pdf_pages(source: BinaryIO, cfg: Optional[Dict[str, object]] = None) -> int: 
+    cfg = cfg if cfg is not None else get_pdf_config()
+    page_count = count_pdf_pages(source)
+    max_pages = cfg.get("max_pages", 0)
+    if max_pages and page_count > max_pages:
+        raise IngestionLimitError(f"PDF trop long : {page_count} pages (max {max_pages}).")
+    return page_count
+
+
+# Pages comptées en parcourant l'arbre des pages (mêmes pages que l'extraction) : le champ /Count est
+# déclaré par le fichier lui-même et peut être faux (un /Count trop petit ferait ignorer les pages suivantes).
+def count_pdf_pages(source: BinaryIO) -> int: 
+    source.seek(0)
+    document = PDFDocument(PDFParser(source))
+    count = sum(1 for _ in PDFPage.create_pages(document))
+    source.seek(0)
+    return count
+
+
+# ---------------------------------------------------------------------------------
+#                                EXTRACTION PDF 
+# ---------------------------------------------------------------------------------
+# Deux modes d'extraction :
+#   - 'layout' : pdfplumber.extract_text (analyse de mise en page complète, comportement historique)
+#   - 'fast'   : pdfminer directement, sans réordonnancement des blocs (boxes_flow=None) -> beaucoup
+#                plus rapide, l'ordre du texte peut différer sur les mises en page complexes
+# Les gros PDF sont découpés en plages de pages réparties sur un pool de processus
+# (le parsing PDF est du Python pur : des threads ne l'accéléreraient pas).
+
+PDF_MODES = ("layout", "fast")
+
+# Analyse de mise en page réduite du mode 'fast'
+FAST_LAPARAMS = dict(boxes_flow=None, detect_vertical=False, all_texts=False)
+
+# workers = 0 : moitié des coeurs, au plus DEFAULT_MAX_PDF_WORKERS (chaque worker uvicorn a son propre pool)
+DEFAULT_MAX_PDF_WORKERS = 4
+
+_pdf_pool: Optional[ProcessPoolExecutor] = None
+_pdf_pool_lock = threading.Lock()
+
+
+def _pdf_workers(cfg: Dict[str, object]) -> int:
+    return cfg.get("workers") or min(DEFAULT_MAX_PDF_WORKERS, max(1, (os.cpu_count() or 1) // 2))
+
+
+# Processus démarrés par "spawn" : un fork du worker (threads des détecteurs, du micro-batcher et de l'audit,
+# modèles torch chargés) pourrait hériter de verrous tenus et d'une copie de la mémoire des modèles.
+def get_pdf_pool(cfg: Dict[str, object]) -> ProcessPoolExecutor:
+    global _pdf_pool
+    if _pdf_pool is None:
+        with _pdf_pool_lock:
+            if _pdf_pool is None:
+                _pdf_pool = ProcessPoolExecutor(
+                    max_workers=_pdf_workers(cfg), mp_context=multiprocessing.get_context("spawn"),
+                )
+    return _pdf_pool
+
+
+def shutdown_pdf_pool():
+    global _pdf_pool
+    with _pdf_pool_lock:
+        if _pdf_pool is not None:
+            _pdf_pool.shutdown(wait=True)
+            _pdf_pool = None
+
+
+# Retourne ([(texte, secondes)] par page dans l'ordre, nombre de processus utilisés).
+def _extract_pdf_pages(content: bytes, page_count: int, mode: str, cfg: Dict[str, object]) -> Tuple[List[Tuple[str, float]], int]:
+    if mode not in PDF_MODES:
+        raise ValueError(f"Unknown PDF extraction mode '{mode}'. Expected one of {PDF_MODES}.")
+
+    workers = min(_pdf_workers(cfg), page_count)
+    # Petits PDF : le démarrage des tâches coûterait plus que l'extraction
+    if workers <= 1 or page_count < cfg.get("parallel_min_pages", 8):
+        return extract_pdf_page_range(content, 0, page_count, mode), 1
+
+    # Plages de pages contiguës, une par processus
+    per_task = -(-page_count // workers)
+    ranges = [(start, min(start + per_task, page_count)) for start in range(0, page_count, per_task)]
+    pool = get_pdf_pool(cfg)
+    futures = [pool.submit(extract_pdf_page_range, content, start, end, mode) for start, end in ranges]
+
+    pages: List[Tuple[str, float]] = []
+    for future in futures:
+        pages.extend(future.result())
+    return pages, len(ranges)
+
+
+# Extrait les pages [start, end[ (index à partir de 0). Exécutée dans un processus du pool.
+def extract_pdf_page_range(content: bytes, start: int, end: int, mode: str) -> List[Tuple[str, float]]:
+    source = io.BytesIO(content)
+    if mode == "fast":
+        return list(_iter_pages_fast(source, set(range(start, end))))
+
+    pages: List[Tuple[str, float]] = []
+    with pdfplumber.open(source, pages=list(range(start + 1, end + 1))) as pdf:
+        for page in pdf.pages:
+            t0 = time.perf_counter()
+            page_text = page.extract_text() or ""
+            page.close()
+            pages.append((page_text, time.perf_counter() - t0))
+    return pages
+
+
+# Mode 'fast' : interpréteur pdfminer + TextConverter, un tampon vidé après chaque page.
+def _iter_pages_fast(source: BinaryIO, page_numbers: Optional[set]) -> Iterator[Tuple[str, float]]:
+    resources = PDFResourceManager(caching=True)
+    buffer = io.StringIO()
+    device = TextConverter(resources, buffer, laparams=LAParams(**FAST_LAPARAMS))
+    interpreter = PDFPageInterpreter(resources, device)
+    try:
+        for page in PDFPage.get_pages(source, pagenos=page_numbers):
+            t0 = time.perf_counter()
+            interpreter.process_page(page)
+            # TextConverter termine chaque page par un saut de page (\f)
+            page_text = buffer.getvalue().rstrip("\f").rstrip("\n")
+            buffer.seek(0)
+            buffer.truncate(0)
+            yield page_text, time.perf_counter() - t0
+    finally:
+        device.close()
+
+
 # ---------------------------------------------------------------------------------
 #                                INGESTION DOCX 
 # ---------------------------------------------------------------------------------
+# Lecture en flux des parties XML du zip (corps, tableaux, zones de texte, en-têtes, pieds de page,
+# notes, commentaires) -> voir docx_stream.py
 
 def _ingest_docx(content: bytes, filename: str) -> IngestResult: 
-    # Tampon en mémoire à partir du contenu binaire
-    file_like = io.BytesIO(content) 
-    # Ouvre le docx à partir du tampon en mémoire
-    document = docx.Document(file_like) 
-    # Recupere txt de chaque paragraphe dans une liste
-    text_parts = [p.text for p in document.paragraphs] 
-    # Joint les txt des paragraphes avec un saut de ligne + ignore  paragraphes vides
-    full_text = "\n".join(t for t in text_parts if t) 
+    # Paragraphes non vides de toutes les parties, séparés par un saut de ligne
+    extracted = extract_docx(content) 
 
     # Retourne résultat de l'ingestion
     return IngestResult( 
-        raw_text=full_text, # Txt extrait 
+        raw_text=extracted.text, # Txt extrait 
         source_type="docx", # source -> 'docx'.
         metadata={ 
             "filename": filename, # nom du fichier.
-            "paragraphs": len(text_parts), # n paragraphes.
+            "paragraphs": extracted.paragraphs, # n paragraphes (toutes parties).
+            "parts": extracted.parts, # n parties lues par type (document, header, footer...).
             "size": len(content), # taille en octets 
             "lang": "fr", # Langue -> fr
         }, 
+        text_map=extracted.text_map, # position -> (partie, paragraphe)
     ) 
 
 
@@ -197,10 +395,10 @@ def _ingest_docx(content: bytes, filename: str) -> IngestResult:
 
 def _ingest_image_ocr(content: bytes, filename: str) -> IngestResult: 
     
-    # Ouvre l'image avec PIL/Pillow.
-    image = Image.open(io.BytesIO(content)) 
-    # ext l'OCR sur img pr extraire le txt en forçant le fr
-    text = pytesseract.image_to_string(image, lang="fra") 
+    # OCR de chaque page de l'image (TIFF multi-pages), après prétraitement -> voir ocr.py
+    pages, image = ocr_image_bytes(content) 
+    # Texte des pages avec un saut de ligne
+    text = "\n".join(page_text for page_text, _ in pages) 
 
     # Retourne résultat de l'ingestion
     return IngestResult( 
@@ -212,6 +410,8 @@ def _ingest_image_ocr(content: bytes, filename: str) -> IngestResult:
             "width": image.width, # largeur de l'image en px
             "height": image.height, # hauteur de l'image en px
             "mode": image.mode, # mode de couleur de l'image (ex: RGB, L)
+            "pages": len(pages), # n pages (TIFF multi-pages)
+            "ocr_timings_ms": [round(seconds * 1000, 2) for _, seconds in pages], # temps d'OCR par page
             "lang": "fr", #Langue -> fr
         }, 
     ) 
@@ -1,7 +1,14 @@
+import asyncio
+import json
+import os
+from contextlib import AsyncExitStack, asynccontextmanager
+from typing import Dict, Literal, Optional
 # Import FastAPI -> API, requêtes HTTP, téléchargements de fichiers...
-from fastapi import FastAPI, Request, UploadFile, File 
-# Import pour renvoyer des réponses HTML
-from fastapi.responses import HTMLResponse 
+from fastapi import FastAPI, Request, UploadFile, File, HTTPException, Depends, Query 
+# Import pour exécuter le code bloquant (ingestion, fin du pipeline) hors de la boucle asynchrone
+from starlette.concurrency import run_in_threadpool 
+# Import pour renvoyer des réponses HTML ou en flux (NDJSON)
+from fastapi.responses import HTMLResponse, JSONResponse, StreamingResponse, Response 
 # Import Templates Jinja2 pour l'UI
 from fastapi.templating import Jinja2Templates 
 # Import pr fichiers statiques (CSS, JS, images)
@@ -9,41 +16,113 @@ from fastapi.staticfiles import StaticFiles
 
 # Import Pydantic pour les schémas de données (modèles de requête) -> voir models.py
 # from pydantic import BaseModel 
-from app.models import SanitizeRequest, WeightsUpdate, SanitizeResponse, Entity 
+from app.models import SanitizeRequest, WeightsUpdate, SanitizeBatchRequest, SanitizeView, SanitizeBatchView 
+# Import du résultat interne du pipeline et de la réponse réduite à la vue demandée
+from app.projection import FULL_VIEW, PipelineResult, ResponseView, EntityView, project_entities, render_result, render_results
 
 # Import des fonctions de ingestion.py pr ingérer le texte, pdf, images...
-from app.ingestion import ingest_text, ingest_file 
+from app.ingestion import ingest_text, ingest_file, iter_pdf_pages, _guess_source_type 
+from app.ingestion import IngestionLimitError, check_pdf_size, check_pdf_pages, shutdown_pdf_pool 
+from app.ocr import shutdown_ocr_pool 
 # Import la fonction pr détecter les entités nommées (NER) via ML (spaCy)
 #from app.ner_engine import detect_entities_ml 
-# Import la fonction pr détecter les entités medicals (Camembert bio)
-from app.ner_medical import detect_entities_medical
+# Import les fonctions pr détecter les entités ML (camembert-ner + Camembert bio), unitaires ou par lot
+from app.batching import submit_entities_ml, detect_entities_ml_batch
+# Import le pool dédié aux détecteurs (exécution en parallèle)
+from app.executor import submit_detector, shutdown_executor
+# Import du client du serveur d'inférence partagé (mode "server", voir inference_server.py)
+from app.inference_client import InferenceUnavailable, shutdown_inference_client
 # Import la fonction pr détecter les entités via des règles customiser 
 from app.rules_engine import detect_entities 
-# Import la fonction de fusion des deux moteurs -> spaCy ET rules_engine
-from app.entity_fusion import fuse_entities
+# Import la fonction de fusion des sources de détection -> rules_engine, NER général, NER médical
+from app.entity_fusion import fuse_sources
 # Import la fonction pr calculer le score de risque et prendre une décision (ALLOW/MASK/BLOCK).
-from app.decision_engine import compute_decision 
+from app.decision_engine import compute_decision, entities_score, decision_from_score, get_scoring_table 
 # Import la fonction pour appliquer le masquage ou le blocage au texte.
-from app.masking_engine import apply_masking 
+from app.masking_engine import apply_masking, BLOCK_MESSAGE 
 # Import pour journaliser les resultat de la requête dans un fichier d'audit.
-from app.audit import log_audit 
+from app.audit import log_audit, log_audit_counts, shutdown_audit, get_audit_writer 
 # Importe la fonction pour màj dela pondération (pour la configuration dynamique depuis IHM)
-from app.config import update_risk_weights 
-
-from app.ner_general_hf import detect_entities_general
+from app.config import update_risk_weights, get_batching_config, get_cache_config 
+from app.config import (
+    ConfigError,
+    ConfigSnapshot,
+    get_admission_config,
+    get_cascade_config,
+    get_fusion_priority,
+    get_snapshot,
+    reload_config,
+    start_config_watcher,
+    stop_config_watcher,
+)
+# Import du cache des résultats (adressé par le contenu, requêtes identiques regroupées)
+from app.result_cache import get_result_cache, entry_from_result, result_from_entry
 
 from app.llm_guard import run_llm_guard
+# Import des métriques (/metrics)
+from app.metrics import stage_timer, record_result, record_skipped, register_callback, render_metrics, MetricsMiddleware, CONTENT_TYPE
+# Import du contrôle d'admission (requêtes simultanées, file d'attente bornée, échéances)
+from app.admission import AdmissionRejected, Deadline, DeadlineExceeded, NO_DEADLINE, admitted, deadline_from_headers, wait_future
+# Import du préchargement des modèles et de leur état (/ready)
+from app.warmup import start_preload, get_model_states, is_ready
+# Import de la sortie fichier (DOCX / PDF masqués)
+from app.redaction import MEDIA_TYPES, RedactionRefused, redact_file, iter_file
 
 
 # ---------------------------------------------------------------------------------
 #                               INITIALISATION APP
 # ---------------------------------------------------------------------------------
 
-app = FastAPI() 
+# Cycle de vie :
+#   - au démarrage, chargement + chauffe des modèles (en arrière-plan ou bloquant, voir warmup.py)
+#     et surveillance de settings.json (rechargement à chaud, voir config.py)
+#   - à l'arrêt, on attend la fin des détecteurs puis on vide le journal d'audit
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    await run_in_threadpool(start_preload)
+    start_config_watcher()
+    yield
+    stop_config_watcher()
+    await run_in_threadpool(shutdown_executor)
+    shutdown_inference_client()
+    await run_in_threadpool(shutdown_pdf_pool)
+    await run_in_threadpool(shutdown_ocr_pool)
+    await run_in_threadpool(shutdown_audit)
+
+
+app = FastAPI(lifespan=lifespan) 
+# Requêtes en cours et durée par endpoint -> /metrics
+app.add_middleware(MetricsMiddleware)
 app.mount("/static", StaticFiles(directory="static"), name="static") 
 templates = Jinja2Templates(directory="templates") 
 
 
+# Fichier au-delà des limites configurées (taille, nombre de pages) -> 413
+@app.exception_handler(IngestionLimitError)
+async def ingestion_limit_handler(request: Request, exc: IngestionLimitError):
+    return JSONResponse(status_code=413, content={"detail": str(exc)})
+
+
+# Surcharge (file d'attente pleine -> 429, attente trop longue ou échéance dépassée -> 503), voir admission.py
+@app.exception_handler(AdmissionRejected)
+async def admission_rejected_handler(request: Request, exc: AdmissionRejected):
+    return JSONResponse(
+        status_code=exc.status_code,
+        content={"detail": str(exc), "reason": exc.reason},
+        headers={"Retry-After": str(exc.retry_after)},
+    )
+
+
+# Serveur d'inférence partagé injoignable (mode "server") -> 503
+@app.exception_handler(InferenceUnavailable)
+async def inference_unavailable_handler(request: Request, exc: InferenceUnavailable):
+    return JSONResponse(
+        status_code=503,
+        content={"detail": str(exc), "reason": "inference_unavailable"},
+        headers={"Retry-After": str(get_admission_config().get("retry_after_seconds", 1))},
+    )
+
+
 # ---------------------------------------------------------------------------------
 #                   PIPELINE UNIQUE UTILISÉ PAR LES 2 ENDPOINTS
 # ---------------------------------------------------------------------------------
@@ -56,54 +135,448 @@ templates = Jinja2Templates(directory="templates")
 #   - audit : Étape de journalisation.
 
 #   texte : string  source_type        extra_metadata
-
-def run_sanitization_pipeline(text: str, source_type: str, extra_metadata=None): 
+#   snapshot : instantané de configuration lu une seule fois par requête (règles, priorité de fusion, cascade,
+#   poids et seuils, clé du cache) : une requête ne mélange jamais deux versions de la configuration.
+
+def run_sanitization_pipeline(text: str, source_type: str, extra_metadata=None,
+                              snapshot: Optional[ConfigSnapshot] = None):
+    snapshot = snapshot or get_snapshot()
+
+    # Mode cascade : règles d'abord, ML seulement si elles ne suffisent pas à bloquer
+    if _fast_block_enabled(snapshot):
+        rule_entities = submit_detector("rules", detect_entities, text, snapshot).result()
+        if _rules_block(rule_entities, snapshot):
+            return _finalize_pipeline(text, source_type, rule_entities, [], [], extra_metadata, ML_STAGES, snapshot)
+        general_entities, medical_entities = submit_entities_ml(text).result()
+        return _finalize_pipeline(
+            text, source_type, rule_entities, general_entities, medical_entities, extra_metadata, [], snapshot
+        )
+
+    # 1) 2) 3) Les détecteurs tournent en parallèle sur le pool dédié
+    rules_future, ml_future = _submit_detectors(text, snapshot)
 
     # 1) Module RULE-BASED -> Détecte les données sensibles via les regex qu'on a mis en place
-    rule_entities = detect_entities(text) 
+    rule_entities = rules_future.result()
+
+    # 2) ML model camembert + 3) ML médical -> regroupés par le micro-batcher avec les requêtes concurrentes
+    general_entities, medical_entities = ml_future.result()
+
+    return _finalize_pipeline(
+        text, source_type, rule_entities, general_entities, medical_entities, extra_metadata, snapshot=snapshot
+    )
+
+
+# Variante asynchrone utilisée par les endpoints : la requête n'occupe aucun thread pendant
+# que les détecteurs calculent, et la latence est celle du détecteur le plus lent.
+# deadline : échéance de la requête ; dépassée -> DeadlineExceeded, les étapes suivantes ne sont pas lancées
+# et le travail des détecteurs encore en file est annulé (voir admission.py).
+
+async def run_sanitization_pipeline_async(text: str, source_type: str, extra_metadata=None,
+                                          deadline: Deadline = NO_DEADLINE, snapshot: Optional[ConfigSnapshot] = None):
+    snapshot = snapshot or get_snapshot()
+
+    if _fast_block_enabled(snapshot):
+        deadline.check("rules")
+        rule_entities = await wait_future(submit_detector("rules", detect_entities, text, snapshot), deadline, "rules")
+        skipped = ML_STAGES if await run_in_threadpool(_rules_block, rule_entities, snapshot) else []
+        general_entities, medical_entities = [], []
+        if not skipped:
+            deadline.check("ner")
+            general_entities, medical_entities = await wait_future(submit_entities_ml(text), deadline, "ner")
+        deadline.check("fusion")
+        return await run_in_threadpool(
+            _finalize_pipeline, text, source_type, rule_entities, general_entities, medical_entities, extra_metadata,
+            skipped, snapshot,
+        )
+
+    deadline.check("rules")
+    rule_entities, (general_entities, medical_entities) = await _detect_all(text, snapshot, deadline)
+
+    deadline.check("fusion")
+    return await run_in_threadpool(
+        _finalize_pipeline, text, source_type, rule_entities, general_entities, medical_entities, extra_metadata,
+        None, snapshot,
+    )
+
+
+# Lance les détecteurs : rules d'un côté, les deux modèles ML de l'autre (micro-batcher ou pool)
+
+def _submit_detectors(text: str, snapshot: ConfigSnapshot):
+    return submit_detector("rules", detect_entities, text, snapshot), submit_entities_ml(text)
+
+
+# Attend les deux détecteurs sans dépasser l'échéance (celui qui reste est annulé si l'autre échoue).
+
+async def _detect_all(text: str, snapshot: ConfigSnapshot, deadline: Deadline = NO_DEADLINE):
+    rules_future, ml_future = _submit_detectors(text, snapshot)
+    try:
+        return await asyncio.gather(
+            wait_future(rules_future, deadline, "rules"),
+            wait_future(ml_future, deadline, "ner"),
+        )
+    except BaseException:
+        rules_future.cancel()
+        ml_future.cancel()
+        raise
+
+
+# ---------------------------------------------------------------------------------
+#                   CASCADE (FAST-BLOCK)
+# ---------------------------------------------------------------------------------
+# Quand la décision est BLOCK, la réponse est un message fixe : si les règles suffisent déjà à franchir
+# le seuil BLOCK, les deux modèles ML ne changent rien et ne sont pas lancés (section 'cascade').
+# Exact seulement si les règles sont la source prioritaire de la fusion (les entités ML ne peuvent pas
+# évincer une entité de règle) et si aucun poids n'est négatif (le score ne peut qu'augmenter).
+# La réponse indique les étapes évitées dans metadata.skipped_stages.
+
+ML_STAGES = ["ner_general", "ner_medical"]
 
-    # 2) ML model camembert-> Détecte les données sensibles via le modèle ML.
-    #ml_entities = detect_entities_ml(text) 
-    general_entities = detect_entities_general(text)
+_fast_block_warned = False
 
-     # 3) ML médical -> via modele bio machin 
-    medical_entities = detect_entities_medical(text)
 
-    # 3) FUSION -> Fusionne les résultat en donnant la priorité à nos régles
-    entities = fuse_entities(rule_entities, general_entities + medical_entities)
+def _fast_block_enabled(snapshot: ConfigSnapshot) -> bool:
+    global _fast_block_warned
+    if not get_cascade_config(snapshot).get("fast_block", False):
+        return False
+    if get_fusion_priority(snapshot)[:1] == ["rules"] and get_scoring_table(snapshot).monotonic:
+        return True
+    if not _fast_block_warned:
+        _fast_block_warned = True
+        print("[CASCADE] fast_block ignored: requires 'rules' first in fusion.priority and non-negative weights")
+    return False
+
+
+# True si les entités des règles suffisent à bloquer (score_offset : score déjà cumulé, ex: pages précédentes).
+def _rules_block(rule_entities, snapshot: ConfigSnapshot, score_offset: float = 0.0) -> bool:
+    with stage_timer("cascade"):
+        entities = fuse_sources({"rules": rule_entities}, get_fusion_priority(snapshot))
+        score = score_offset + entities_score(entities, snapshot)
+        return decision_from_score(score, snapshot)[0] == "BLOCK"
+
+
+# Variante par lot : mêmes étapes, mais les deux modèles ML traitent tous les textes en une passe par groupe.
+# Le résultat de chaque texte est identique à run_sanitization_pipeline.
+# deadline : vérifiée entre les étapes (une passe ML déjà lancée va jusqu'au bout).
+
+def run_sanitization_pipeline_batch(texts, source_type: str, extra_metadata_list=None, deadline: Deadline = NO_DEADLINE,
+                                    snapshot: Optional[ConfigSnapshot] = None):
+    snapshot = snapshot or get_snapshot()
+
+    if _fast_block_enabled(snapshot):
+        return _run_batch_fast_block(texts, source_type, snapshot, extra_metadata_list, deadline)
+
+    # 2) + 3) ML général et médical sur tout le lot
+    deadline.check("ner")
+    ml_results = detect_entities_ml_batch(texts)
+
+    deadline.check("fusion")
+    results = []
+    for i, text in enumerate(texts):
+        # 1) Module RULE-BASED, texte par texte
+        with stage_timer("rules"):
+            rule_entities = detect_entities(text, snapshot)
+        general_entities, medical_entities = ml_results[i]
+        extra_metadata = extra_metadata_list[i] if extra_metadata_list else None
+        results.append(_finalize_pipeline(
+            text, source_type, rule_entities, general_entities, medical_entities, extra_metadata, snapshot=snapshot
+        ))
+    return results
+
+
+# Variante cascade du lot : règles sur chaque texte, puis ML en une passe sur les seuls textes non bloqués.
+
+def _run_batch_fast_block(texts, source_type: str, snapshot: ConfigSnapshot, extra_metadata_list=None,
+                          deadline: Deadline = NO_DEADLINE):
+    rule_results = []
+    for text in texts:
+        with stage_timer("rules"):
+            rule_results.append(detect_entities(text, snapshot))
+    blocked = [_rules_block(rule_entities, snapshot) for rule_entities in rule_results]
+
+    todo = [i for i, b in enumerate(blocked) if not b]
+    ml_results = [([], [])] * len(texts)
+    if todo:
+        deadline.check("ner")
+        for i, result in zip(todo, detect_entities_ml_batch([texts[i] for i in todo])):
+            ml_results[i] = result
+
+    deadline.check("fusion")
+    results = []
+    for i, text in enumerate(texts):
+        general_entities, medical_entities = ml_results[i]
+        extra_metadata = extra_metadata_list[i] if extra_metadata_list else None
+        results.append(_finalize_pipeline(
+            text, source_type, rule_results[i], general_entities, medical_entities, extra_metadata,
+            ML_STAGES if blocked[i] else [], snapshot,
+        ))
+    return results
+
+
+# Extraction de la page suivante (streaming), chronométrée pour /metrics.
+
+def _timed_next_page(pages):
+    with stage_timer("ingestion"):
+        return next(pages, None)
+
+
+# Ingestion d'un fichier (PDF, DOCX, image...), chronométrée pour /metrics.
+
+def _timed_ingest_file(content, filename, content_type):
+    with stage_timer("ingestion"):
+        return ingest_file(content=content, filename=filename, content_type=content_type)
+
+
+# Étapes communes après la détection : fusion, décision, audit (masquage différé).
+
+# skipped_stages : étapes évitées par la cascade (None hors mode cascade -> absent des métadonnées).
+
+def _finalize_pipeline(text, source_type, rule_entities, general_entities, medical_entities, extra_metadata=None,
+                       skipped_stages=None, snapshot: Optional[ConfigSnapshot] = None):
+    snapshot = snapshot or get_snapshot()
+
+    # 3) FUSION -> Fusionne les résultats sans chevauchement, selon la priorité des sources (nos règles d'abord)
+    with stage_timer("fusion"):
+        entities = fuse_sources(
+            {"rules": rule_entities, "general": general_entities, "medical": medical_entities},
+            get_fusion_priority(snapshot),
+        )
     
     # 4) DECISION -> Calcule le score de risque global et détermine la décision de sécurité -> ALLOW / MASK / BLOCK
-    decision, risk_score = compute_decision(entities) 
+    with stage_timer("scoring"):
+        decision, risk_score = compute_decision(entities, snapshot) 
 
-    # 5) MASKING -> Applique le masquage ou le blocage du texte selon la décision
-    sanitized_text = apply_masking(text, entities, decision) 
+    # 5) MASKING -> différé : appliqué à la première lecture de PipelineResult.sanitized_text
+    #    (jamais si la vue demandée ne contient pas le texte, voir projection.py)
 
     # 6) AUDIT -> Journalise la requête, la décision et les statistiques sans le texte brut
-    log_audit(text, entities, decision, risk_score) 
+    with stage_timer("audit"):
+        log_audit(text, entities, decision, risk_score) 
 
     # Initialise les métadonnées de la réponse avec le type de source (texte/fichier)
     metadata = {"source_type": source_type} 
 
     # 8) LLM GUARD -> Analyse parallèle du texte brut pour pouvoir comparer avec notre pipeline à nous -> en cours ATY
-    llm_guard_result = run_llm_guard(text)
+    with stage_timer("llm_guard"):
+        llm_guard_result = run_llm_guard(text)
     
     # Si métadonnées supplémentaires (ex: taille, pages) 
     if extra_metadata: 
         # Les ajoute 
         metadata.update(extra_metadata) 
 
-    # Retourne le dictionnaire de résultats 
-    return SanitizeResponse( 
-        sanitized_text = sanitized_text, 
+    if skipped_stages is not None:
+        metadata["skipped_stages"] = list(skipped_stages)
+        record_skipped(skipped_stages)
+
+    # Métriques : type de source, décision, taille de l'entrée, nombre d'entités
+    record_result(source_type, decision, metadata.get("size"), len(entities))
+
+    # Retourne le résultat interne ; la réponse JSON est construite par l'endpoint selon la vue demandée
+    return PipelineResult( 
+        text = text, 
         decision = decision,
         risk_score = risk_score,
-        entities = entities,
+        spans = entities,
         metadata = {
             **metadata,
             "llm_guard": llm_guard_result
         }
     )
 
+# ---------------------------------------------------------------------------------
+#                   PIPELINE PAGE PAR PAGE (STREAMING)
+# ---------------------------------------------------------------------------------
+# Traite un document page par page et produit une ligne JSON (NDJSON) par page, puis un résumé.
+#   - Chaque page est détectée et masquée seule (offsets relatifs à la page).
+#     La décision du document n'est connue qu'à la fin : toutes les entités de la page sont masquées.
+#   - Le score du document est la somme des scores des pages (score additif) : on ne garde en mémoire
+#     que la somme et le nombre d'entités par type -> mémoire constante par page.
+#   - Dès que le score cumulé atteint BLOCK, le texte des pages suivantes n'est plus renvoyé.
+#   - Chaque ligne de page suit la vue demandée (view : entités, texte ; voir projection.py).
+#   - Dernière ligne : {"type": "summary", ...} avec la décision et le risk_score du document.
+#     Un client qui reçoit decision = BLOCK doit ignorer les pages déjà reçues.
+#   - Échéance dépassée en cours de route (deadline) : dernière ligne {"type": "error", "reason": "deadline", ...}
+#     à la place du résumé ; le document doit être considéré comme non traité.
+
+# Post-détection d'une page (fusion, score de la page, masquage, projection des entités, ligne NDJSON).
+# Travail CPU exécuté dans un thread (run_in_threadpool), comme _finalize_pipeline pour /sanitize :
+# un gros DOCX ou une image (traités comme une seule page) ne bloque pas les autres requêtes du worker.
+#  Args:
+#      - total_score / blocked : état du document avant cette page ; types_count est complété.
+#  Returns:
+#      - (ligne NDJSON, score de la page, document bloqué après cette page)
+
+def _finalize_page(number: int, text: str, rule_entities, general_entities, medical_entities,
+                   total_score: float, blocked: bool, types_count: Dict[str, int], view: ResponseView,
+                   snapshot: ConfigSnapshot):
+    with stage_timer("fusion"):
+        entities = fuse_sources(
+            {"rules": rule_entities, "general": general_entities, "medical": medical_entities},
+            get_fusion_priority(snapshot),
+        )
+
+    # Score de la page + score cumulé du document
+    with stage_timer("scoring"):
+        page_score = entities_score(entities, snapshot)
+    page_decision, page_risk = decision_from_score(page_score, snapshot)
+    total_score += page_score
+    for e in entities:
+        types_count[e.type] = types_count.get(e.type, 0) + 1
+    blocked = blocked or decision_from_score(total_score, snapshot)[0] == "BLOCK"
+
+    record = {
+        "type": "page",
+        "page": number,
+        "decision": page_decision,
+        "risk_score": page_risk,
+        "blocked": blocked,
+    }
+    if blocked:
+        # Document déjà trop sensible : plus aucun contenu renvoyé
+        if view.include_text:
+            record["sanitized_text"] = BLOCK_MESSAGE
+        if view.entities in ("full", "positions"):
+            record["entities"] = []
+        record["entities_count"] = len(entities)
+    else:
+        if view.include_text:
+            with stage_timer("masking"):
+                record["sanitized_text"] = apply_masking(text, entities, "MASK")
+        record.update(project_entities(text, entities, view))
+    return json.dumps(record, ensure_ascii=False) + "\n", page_score, blocked
+
+
+async def stream_sanitization_pages(pages, source_type: str, extra_metadata=None, view: ResponseView = FULL_VIEW,
+                                    deadline: Deadline = NO_DEADLINE, snapshot: Optional[ConfigSnapshot] = None):
+
+    # Une seule version de la configuration pour toutes les pages du document
+    snapshot = snapshot or get_snapshot()
+    total_score = 0.0
+    types_count = {}
+    page_count = 0
+    blocked = False
+    fast_block = _fast_block_enabled(snapshot)
+    skipped_pages = 0
+
+    try:
+        while True:
+            # Extraction de la page suivante (bloquante -> hors de la boucle asynchrone)
+            item = await run_in_threadpool(_timed_next_page, pages)
+            if item is None:
+                break
+            number, text = item
+            page_count += 1
+            deadline.check("rules")
+
+            if fast_block:
+                # Cascade : pas de ML dès que le score cumulé des règles atteint BLOCK
+                rule_entities = await wait_future(
+                    submit_detector("rules", detect_entities, text, snapshot), deadline, "rules"
+                )
+                general_entities, medical_entities = [], []
+                if await run_in_threadpool(_rules_block, rule_entities, snapshot, total_score):
+                    skipped_pages += 1
+                    record_skipped(ML_STAGES)
+                else:
+                    general_entities, medical_entities = await wait_future(submit_entities_ml(text), deadline, "ner")
+            else:
+                # 1) 2) 3) Détecteurs en parallèle, comme pour /sanitize
+                rule_entities, (general_entities, medical_entities) = await _detect_all(text, snapshot, deadline)
+
+            # 4) 5) Fusion, score, masquage et sérialisation de la page : hors de la boucle asynchrone
+            line, page_score, blocked = await run_in_threadpool(
+                _finalize_page, number, text, rule_entities, general_entities, medical_entities,
+                total_score, blocked, types_count, view, snapshot,
+            )
+            total_score += page_score
+            yield line
+    except DeadlineExceeded as e:
+        # Statut 200 déjà envoyé : l'échec est signalé par la dernière ligne
+        yield json.dumps({"type": "error", "reason": e.reason, "detail": str(e), "pages": page_count}, ensure_ascii=False) + "\n"
+        return
+    finally:
+        close = getattr(pages, "close", None)
+        if close is not None:
+            await run_in_threadpool(close)
+
+    decision, risk_score = decision_from_score(total_score, snapshot)
+
+    # 6) AUDIT -> une entrée pour le document entier (peut attendre une place dans la file : hors de la boucle)
+    await run_in_threadpool(log_audit_counts, types_count, decision, risk_score)
+
+    metadata = {"source_type": source_type, "pages": page_count}
+    if extra_metadata:
+        metadata.update(extra_metadata)
+    if fast_block:
+        # Pages pour lesquelles les modèles ML n'ont pas tourné
+        metadata["skipped_stages"] = ML_STAGES if skipped_pages else []
+        metadata["skipped_pages"] = skipped_pages
+    record_result(source_type, decision, metadata.get("size"), sum(types_count.values()))
+    summary = {
+        "type": "summary",
+        "decision": decision,
+        "risk_score": risk_score,
+        "entities_count": sum(types_count.values()),
+        "types_count": types_count,
+        "metadata": metadata,
+    }
+    yield json.dumps(summary, ensure_ascii=False) + "\n"
+
+
+# ---------------------------------------------------------------------------------
+#                   CACHE DES RESULTATS
+# ---------------------------------------------------------------------------------
+# Le cache est désactivable dans settings.json (cache.enabled).
+
+def _get_cache():
+    cfg = get_cache_config()
+    if not cfg.get("enabled", True):
+        return None
+    return get_result_cache(cfg)
+
+
+# Sert une requête depuis le cache, ou la calcule une seule fois pour toutes les requêtes identiques.
+#   - compute : coroutine -> (PipelineResult, texte analysé)
+#   - load_text : coroutine (entrée) -> texte analysé, pour reconstruire la réponse d'une entrée en cache
+
+#   - deadline : échéance de la requête ; celle du calcul partagé n'est pas imposée aux autres requêtes
+
+async def _serve_cached(cache, key, compute, load_text, deadline: Deadline = NO_DEADLINE):
+
+    entry, future, leader = cache.begin(key)
+
+    if leader:
+        try:
+            result, raw_text = await compute()
+        except (asyncio.CancelledError, DeadlineExceeded):
+            # Requête annulée (client déconnecté, échéance dépassée) : une requête en attente reprend le calcul
+            cache.abandon(key)
+            raise
+        except Exception as e:
+            cache.fail(key, e)
+            raise
+        cache.complete(key, entry_from_result(result, raw_text, cache.store_raw_text))
+        return result
+
+    if entry is None:
+        # Même calcul déjà en cours : on attend son résultat
+        entry = await wait_future(future, deadline, "cache", cancel=False)
+        if entry is None:
+            return await _serve_cached(cache, key, compute, load_text, deadline)
+
+    text = await load_text(entry)
+    return await run_in_threadpool(_replay_cached, entry, text)
+
+
+# Reconstruit le résultat d'une entrée en cache ; la requête est journalisée comme une requête calculée.
+
+def _replay_cached(entry, text):
+    result = result_from_entry(entry, text)
+    log_audit(text, result.spans, result.decision, result.risk_score)
+    record_result(result.metadata.get("source_type"), result.decision, result.metadata.get("size"), len(result.spans))
+    return result
+
+
 # ---------------------------------------------------------------------------------
 #                               PAGE HTML (IHM)
 # ---------------------------------------------------------------------------------
@@ -115,59 +588,312 @@ def index(request: Request):
     return templates.TemplateResponse("index.html", {"request": request}) 
 
 
+# ---------------------------------------------------------------------------------
+#                          VUE DE LA REPONSE (PROJECTION)
+# ---------------------------------------------------------------------------------
+# Paramètres de requête communs aux endpoints d'analyse (voir projection.py).
+# Décision seule : ?entities=none&include_text=false
+
+def _response_view(
+    entities: EntityView = Query("full", description="full | positions (sans valeurs) | counts (nombre par type) | none"),
+    include_text: bool = Query(True, description="false : pas de sanitized_text"),
+) -> ResponseView:
+    return ResponseView(entities, include_text)
+
+
+# Format de la réponse de /sanitize-file : JSON (texte masqué) ou fichier masqué (DOCX / PDF)
+FileOutput = Literal["json", "file"]
+
+# Description OpenAPI des réponses JSON : les réponses sont construites par projection.py (FastJSONResponse),
+# le schéma est donc déclaré par responses= (response_model ne serait jamais appliqué).
+_VIEW_DOC = ("Champs selon la vue : entities=full -> entities avec valeurs ; positions -> sans valeurs ; "
+             "counts -> entities_count + types_count ; none -> aucun. include_text=false -> pas de sanitized_text.")
+
+
+# ---------------------------------------------------------------------------------
+#                          ECHEANCE DE LA REQUETE (ADMISSION)
+# ---------------------------------------------------------------------------------
+# Budget en millisecondes porté par l'en-tête configuré (X-Request-Timeout-Ms par défaut), compté
+# à partir de la lecture de la requête. Valeur invalide -> 400.
+
+def _request_deadline(request: Request) -> Deadline:
+    try:
+        return deadline_from_headers(request.headers)
+    except ValueError:
+        header = get_admission_config().get("deadline_header", "X-Request-Timeout-Ms")
+        raise HTTPException(status_code=400, detail=f"En-tête {header} invalide : nombre de millisecondes attendu.")
+
+
+# Réponse en flux qui rend sa place dans le pipeline une fois terminée (ou interrompue, client déconnecté).
+
+class AdmittedStreamingResponse(StreamingResponse):
+
+    def __init__(self, content, slot: AsyncExitStack, **kwargs):
+        super().__init__(content, **kwargs)
+        self._slot = slot
+
+    async def __call__(self, scope, receive, send):
+        try:
+            await super().__call__(scope, receive, send)
+        finally:
+            await self._slot.aclose()
+
+
 # ---------------------------------------------------------------------------------
 #                                 API TEXTE BRUT
 # ---------------------------------------------------------------------------------
 # Décorateur FastAPI pour définir un endpoint POST à l'URL '/sanitize'.
-@app.post("/sanitize") 
+@app.post("/sanitize", responses={200: {"model": SanitizeView, "description": _VIEW_DOC}}) 
 # La requête POST attend le modèle SanitizeRequest ( voir models.py ou documentation partie modeles )
-def sanitize(req: SanitizeRequest): 
+async def sanitize(req: SanitizeRequest, view: ResponseView = Depends(_response_view),
+                   deadline: Deadline = Depends(_request_deadline)): 
 
     # Traite le texte brut pour obtenir le texte et les métadonnées avec fonction ingest_text() du module ingestion qui retourne raw_text, source_type, metadata
-    ingest_res = ingest_text(req.text) 
+    with stage_timer("ingestion"):
+        ingest_res = ingest_text(req.text) 
+    # Configuration de la requête : la même pour la clé du cache et tout le pipeline
+    snapshot = get_snapshot()
 
     # Exécute le pipeline de désensibilisation 
-    return run_sanitization_pipeline( 
-        # Passage du texte brut
-        text=ingest_res.raw_text, 
-        # Passage du type de source ('text')
-        source_type=ingest_res.source_type, 
-        # Passage des métadonnées (taille, langue, etc.)
-        extra_metadata=ingest_res.metadata, 
-    ) 
+    async def compute():
+        result = await run_sanitization_pipeline_async( 
+            # Passage du texte brut
+            text=ingest_res.raw_text, 
+            # Passage du type de source ('text')
+            source_type=ingest_res.source_type, 
+            # Passage des métadonnées (taille, langue, etc.)
+            extra_metadata=ingest_res.metadata, 
+            # Échéance de la requête (étapes suivantes abandonnées une fois dépassée)
+            deadline=deadline,
+            snapshot=snapshot,
+        ) 
+        return result, ingest_res.raw_text
+
+    async def load_text(entry):
+        return ingest_res.raw_text
+
+    # Place dans le pipeline (file d'attente bornée, 429 / 503 en cas de surcharge, voir admission.py)
+    async with admitted(deadline):
+        cache = _get_cache()
+        if cache is None:
+            result = (await compute())[0]
+        else:
+            # Clé = empreinte du texte + version de la configuration (la vue demandée n'en fait pas partie)
+            key = cache.make_key("text", ingest_res.raw_text.encode("utf-8", errors="surrogatepass"), snapshot.version)
+            result = await _serve_cached(cache, key, compute, load_text, deadline)
+        # Réponse réduite à la vue demandée (masquage et sérialisation hors de la boucle asynchrone)
+        return await run_in_threadpool(render_result, result, view)
+
+
+# ---------------------------------------------------------------------------------
+#                                 API LOT DE TEXTES
+# ---------------------------------------------------------------------------------
+# Décorateur FastAPI pour définir un endpoint POST à l'URL '/sanitize-batch'.
+@app.post("/sanitize-batch", responses={200: {"model": SanitizeBatchView, "description": _VIEW_DOC}}) 
+# La requête POST attend le modèle SanitizeBatchRequest (liste de textes)
+async def sanitize_batch(req: SanitizeBatchRequest, view: ResponseView = Depends(_response_view),
+                         deadline: Deadline = Depends(_request_deadline)): 
+
+    # Refuse les lots trop gros (taille configurable dans settings.json)
+    max_texts = get_batching_config().get("max_request_texts", 256)
+    if len(req.texts) > max_texts:
+        raise HTTPException(status_code=413, detail=f"Lot trop volumineux : {len(req.texts)} textes (max {max_texts}).")
+
+    # Ingestion de chaque texte (métadonnées propres à chaque texte)
+    with stage_timer("ingestion"):
+        ingest_results = [ingest_text(t) for t in req.texts]
+    snapshot = get_snapshot()
+
+    # Le lot occupe une seule place dans le pipeline (voir admission.py)
+    async with admitted(deadline):
+        # Textes déjà en cache : réponse reconstruite, seuls les autres passent par le pipeline
+        cache = _get_cache()
+        results = [None] * len(ingest_results)
+        keys = [None] * len(ingest_results)
+        if cache is not None:
+            for i, r in enumerate(ingest_results):
+                keys[i] = cache.make_key("text", r.raw_text.encode("utf-8", errors="surrogatepass"), snapshot.version)
+                entry = cache.get(keys[i])
+                if entry is not None:
+                    results[i] = await run_in_threadpool(_replay_cached, entry, r.raw_text)
+        todo = [i for i, res in enumerate(results) if res is None]
+
+        # Exécute le pipeline sur le reste du lot (bloquant -> hors de la boucle asynchrone)
+        if todo:
+            computed = await run_in_threadpool(
+                run_sanitization_pipeline_batch,
+                texts=[ingest_results[i].raw_text for i in todo],
+                source_type="text",
+                extra_metadata_list=[ingest_results[i].metadata for i in todo],
+                deadline=deadline,
+                snapshot=snapshot,
+            )
+            for i, result in zip(todo, computed):
+                results[i] = result
+                if cache is not None:
+                    cache.put(keys[i], entry_from_result(result, ingest_results[i].raw_text, cache.store_raw_text))
+        return await run_in_threadpool(render_results, results, view)
 
 
 # ---------------------------------------------------------------------------------
 #                       API FICHIER (PDF, DOCX, IMAGE, OCR)
 # ---------------------------------------------------------------------------------
 # Décorateur FastAPI pour définir un endpoint POST à l'URL '/sanitize-file'
-@app.post("/sanitize-file") 
+@app.post("/sanitize-file", responses={
+    200: {
+        "model": SanitizeView,
+        "description": _VIEW_DOC + " output=file : fichier (DOCX / PDF) d'origine si ALLOW, masqué si MASK.",
+        "content": {media_type: {} for media_type in MEDIA_TYPES.values()},
+    },
+    415: {"description": "output=file pour un type autre que DOCX / PDF."},
+    422: {"description": "Requête invalide, ou output=file et décision BLOCK (ou masquage impossible à garantir) : aucun fichier renvoyé."},
+}) 
 
 # La requête attend un fichier téléchargé (asynchrone)
-async def sanitize_file(file: UploadFile = File(...)): 
+async def sanitize_file(file: UploadFile = File(...), view: ResponseView = Depends(_response_view),
+                        deadline: Deadline = Depends(_request_deadline),
+                        output: FileOutput = Query("json", description="json | file (DOCX / PDF masqué)")): 
+    # Sortie fichier : DOCX et PDF seulement (refus avant tout traitement)
+    source_type = _guess_source_type(file.filename, file.content_type)
+    if output == "file" and source_type not in MEDIA_TYPES:
+        raise HTTPException(status_code=415, detail="Sortie fichier disponible pour les DOCX et les PDF uniquement.")
+
     # Recupere contenu binaire du fichier téléchargé.
     content = await file.read()
+    snapshot = get_snapshot()
 
     # Traite le contenu binaire pour extraire le texte avec la fonction ingest_file() du module Ingestion
-    ingest_res = ingest_file(
-        # Passage du contenu binaire
-        content=content, 
-        # Passage du nom de fichier pour deviner le type de source
-        filename=file.filename, 
-        # Passage du type MIME pour deviner le type de source
-        content_type=file.content_type, 
-    ) 
+    # (PDF / OCR bloquants -> exécutés hors de la boucle asynchrone)
+    async def ingest():
+        return await run_in_threadpool(
+            _timed_ingest_file,
+            # Passage du contenu binaire
+            content=content, 
+            # Passage du nom de fichier pour deviner le type de source
+            filename=file.filename, 
+            # Passage du type MIME pour deviner le type de source
+            content_type=file.content_type, 
+        ) 
 
     # Exécute le pipeline de désensibilisation sur le texte extrait du fichier.
-    return run_sanitization_pipeline( 
-        # Passage du texte extrait
-        text=ingest_res.raw_text, 
-        # Passage du type de source ('pdf', 'docx', 'image')
-        source_type=ingest_res.source_type, 
-        # Passage des métadonnées du fichier (pages, taille, dimensions image, etc.).
-        extra_metadata=ingest_res.metadata, 
+    async def compute():
+        ingest_res = await ingest()
+        result = await run_sanitization_pipeline_async( 
+            # Passage du texte extrait
+            text=ingest_res.raw_text, 
+            # Passage du type de source ('pdf', 'docx', 'image')
+            source_type=ingest_res.source_type, 
+            # Passage des métadonnées du fichier (pages, taille, dimensions image, etc.).
+            extra_metadata=ingest_res.metadata, 
+            deadline=deadline,
+            snapshot=snapshot,
+        )
+        return result, ingest_res.raw_text
+
+    # Entrée en cache sans texte (store_raw_text = false) : le texte est ré-extrait, sans relancer les modèles
+    async def load_text(entry):
+        if entry.raw_text is not None:
+            return entry.raw_text
+        return (await ingest()).raw_text
+
+    # L'extraction (PDF, OCR) fait partie du travail admis
+    async with admitted(deadline):
+        cache = _get_cache()
+        if cache is None:
+            result = (await compute())[0]
+        else:
+            # Clé = empreinte du fichier + nom + type MIME (ils déterminent le type de source) + version de la configuration
+            key = cache.make_key("file", content, snapshot.version, file.filename, file.content_type)
+            result = await _serve_cached(cache, key, compute, load_text, deadline)
+        if output == "file":
+            return await _file_response(content, file.filename, source_type, result, deadline)
+        return await run_in_threadpool(render_result, result, view)
+
+
+# ---------------------------------------------------------------------------------
+#                       SORTIE FICHIER (/sanitize-file?output=file)
+# ---------------------------------------------------------------------------------
+# ALLOW -> fichier d'origine ; MASK -> fichier masqué (voir app/redaction.py) ; BLOCK -> 422 (rien n'est renvoyé).
+# Masquage impossible à garantir (RedactionRefused) : 422 et X-Decision: BLOCK, comme pour BLOCK.
+# Décision, score et nombre d'entités dans les en-têtes X-Decision, X-Risk-Score, X-Entities-Count.
+
+async def _file_response(content: bytes, filename: Optional[str], source_type: str, result: PipelineResult,
+                         deadline: Deadline):
+    headers = {
+        "X-Decision": result.decision,
+        "X-Risk-Score": str(result.risk_score),
+        "X-Entities-Count": str(len(result.spans)),
+    }
+    if result.decision == "BLOCK":
+        return JSONResponse(
+            status_code=422,
+            content={"detail": BLOCK_MESSAGE, "decision": result.decision, "risk_score": result.risk_score},
+            headers=headers,
+        )
+
+    # Nom de fichier de l'en-tête Content-Disposition : ASCII sans guillemets
+    stem = os.path.splitext(os.path.basename(filename or ""))[0]
+    stem = stem.encode("ascii", "ignore").decode().replace('"', "") or "document"
+    if result.decision == "ALLOW":
+        body, name = iter([content]), f"{stem}.{source_type}"
+    else:
+        deadline.check("redaction")
+        try:
+            with stage_timer("redaction"):
+                redacted = await run_in_threadpool(redact_file, content, source_type, result)
+        except RedactionRefused as exc:
+            headers["X-Decision"] = "BLOCK"
+            return JSONResponse(
+                status_code=422,
+                content={"detail": f"Fichier masqué non renvoyé : {exc}", "decision": "BLOCK",
+                         "risk_score": result.risk_score},
+                headers=headers,
+            )
+        body, name = iter_file(redacted), f"{stem}.masked.{source_type}"
+    headers["Content-Disposition"] = f'attachment; filename="{name}"'
+    return StreamingResponse(body, media_type=MEDIA_TYPES[source_type], headers=headers)
+
+
+# ---------------------------------------------------------------------------------
+#                       API FICHIER EN STREAMING (PAGE PAR PAGE)
+# ---------------------------------------------------------------------------------
+# Réponse NDJSON (une ligne par page puis un résumé), renvoyée au fil de l'eau.
+# Le PDF est lu depuis le fichier temporaire de l'upload : il n'est jamais chargé en entier en mémoire.
+# Les autres types de fichiers sont traités comme une seule page.
+@app.post("/sanitize-file-stream") 
+
+async def sanitize_file_stream(file: UploadFile = File(...), view: ResponseView = Depends(_response_view),
+                               deadline: Deadline = Depends(_request_deadline)): 
+    source_type = _guess_source_type(file.filename, file.content_type)
+
+    # Place prise avant de commencer la réponse (429 / 503 encore possibles), rendue à la fin du flux
+    slot = AsyncExitStack()
+    await slot.enter_async_context(admitted(deadline))
+    try:
+        if source_type == "pdf":
+            # Limites vérifiées avant de commencer la réponse (sinon le statut 200 serait déjà envoyé)
+            check_pdf_size(file.size)
+            await run_in_threadpool(check_pdf_pages, file.file)
+            pages = iter_pdf_pages(file.file)
+            extra_metadata = {"filename": file.filename or "document.pdf", "size": file.size, "lang": "fr"}
+        else:
+            content = await file.read()
+            ingest_res = await run_in_threadpool(
+                _timed_ingest_file, content=content, filename=file.filename, content_type=file.content_type
+            )
+            pages = iter([(1, ingest_res.raw_text)])
+            source_type, extra_metadata = ingest_res.source_type, ingest_res.metadata
+    except BaseException:
+        await slot.aclose()
+        raise
+
+    return AdmittedStreamingResponse(
+        stream_sanitization_pages(pages, source_type, extra_metadata, view, deadline, get_snapshot()),
+        slot,
+        media_type="application/x-ndjson",
     )
 
+
 # ---------------------------------------------------------------------------------
 #                        UPDATE CONFIG ( EN COURS - ATY )
 # ---------------------------------------------------------------------------------
@@ -187,10 +913,78 @@ def update_weights(req: WeightsUpdate):
         return {"status": "error", "message": f"Erreur lors de la mise à jour : {str(e)}"} # Retourne un statut d'erreur avec le message de l'exception.
 
 
+# ---------------------------------------------------------------------------------
+#                          RECHARGEMENT DE LA CONFIGURATION
+# ---------------------------------------------------------------------------------
+# Relit settings.json immédiatement (sans attendre le thread de surveillance).
+# Configuration invalide -> 400, la version courante reste active.
+@app.post("/config/reload")
+def reload_settings():
+    try:
+        reload_config(force=True)
+    except (ConfigError, OSError) as e:
+        raise HTTPException(status_code=400, detail=f"Configuration refusée : {e}")
+    return {"status": "success", "version": get_snapshot().version}
+
+
+# ---------------------------------------------------------------------------------
+#                                  STATISTIQUES DU CACHE
+# ---------------------------------------------------------------------------------
+@app.get("/cache/stats") 
+def cache_stats():
+    # Compteurs du cache des résultats (hits, misses, requêtes regroupées, évictions...)
+    cache = _get_cache()
+    if cache is None:
+        return {"enabled": False}
+    return {"enabled": True, **cache.stats()}
+
+
+# ---------------------------------------------------------------------------------
+#                                  METRIQUES
+# ---------------------------------------------------------------------------------
+# Format texte Prometheus (latence par étape, résultats par type de source / décision, modèles...)
+@app.get("/metrics") 
+def metrics():
+    return Response(content=render_metrics(), media_type=CONTENT_TYPE)
+
+
+# Compteurs du cache et de la file d'audit, lus à chaque appel de /metrics
+def _cache_metrics():
+    cache = _get_cache()
+    if cache is None:
+        return
+    stats = cache.stats()
+    for key in ("entries", "bytes", "hits", "misses", "coalesced", "evictions"):
+        yield (key,), stats[key]
+
+
+def _audit_metrics():
+    stats = get_audit_writer().stats()
+    for key in ("queued", "written", "dropped", "sync_writes"):
+        yield (key,), stats[key]
+
+
+register_callback("desens_result_cache", "Compteurs du cache des résultats.", ("stat",), _cache_metrics)
+register_callback("desens_audit_writer", "Compteurs de l'écriture du journal d'audit.", ("stat",), _audit_metrics)
+
+
 # ---------------------------------------------------------------------------------
 #                                  HEALTHCHECK
 # ---------------------------------------------------------------------------------
 @app.get("/health") 
 def health():
     # Renvoie un statut simple pour indiquer que le service est opérationnel.
-    return {"status": "OK", "service": "desensitization-ms"} 
\ No newline at end of file
+    return {"status": "OK", "service": "desensitization-ms"} 
+
+
+# ---------------------------------------------------------------------------------
+#                                  READINESS
+# ---------------------------------------------------------------------------------
+# 200 quand les modèles sont chargés et chauffés, 503 sinon (à utiliser comme readiness probe).
+@app.get("/ready") 
+def ready():
+    ok = is_ready()
+    return JSONResponse(
+        status_code=200 if ok else 503,
+        content={"ready": ok, "service": "desensitization-ms", "models": get_model_states()},
+    )
\ No newline at end of file
@@ -1,8 +1,11 @@
-from typing import List
-from app.models import Entity
+from typing import Iterator, List
+from app.models import Span
 
+# Message renvoyé à la place du texte en cas de BLOCK
+BLOCK_MESSAGE = "Texte trop sensible pour être envoyé tel quel."
 
-def apply_masking(text: str, entities: List[Entity], decision: str) -> str:
+
+def apply_masking(text: str, entities: List[Span], decision: str) -> str:
     """
     Stratégie actuelle :
         - ALLOW : renvoie le texte tel quel.
@@ -11,7 +14,7 @@ def apply_masking(text: str, entities: List[Entity], decision: str) -> str:
 
     Args:
         text: Texte d'origine.
-        entities: Entités détectées dans le texte.
+        entities: Entités détectées dans le texte (sans chevauchement, voir entity_fusion).
         decision: 'ALLOW', 'MASK' ou 'BLOCK'.
 
     Returns:
@@ -20,24 +23,29 @@ def apply_masking(text: str, entities: List[Entity], decision: str) -> str:
 
     # Si la décision est "ALLOW", retourne le texte original sans modification
     if decision == "ALLOW":
-        return text 
+        return text
 
     # Si la décision est "BLOCK", retourne un message générique (texte bloqué)
     if decision == "BLOCK":
-        return "Texte trop sensible pour être envoyé tel quel." 
-    # Initialise la variable de texte désensibilisé avec le texte original
-    sanitized = text 
-
-    # Important : on remplace en partant de la fin.
-    # Trie la liste des entités par leur position de départ ('start') de manière décroissante (reverse=True)
-    for e in sorted(entities, key=lambda x: x.start, reverse=True): 
-        # Crée le jeton de masquage au format <TYPE_MASKED>
-        token = f"<{e.type}_MASKED>" 
-        
-        # Effectue le remplacement : 
-        # 1. Prend la partie du texte avant l'entité (jusqu'à e.start).
-        # 2. Ajoute le token de masquage.
-        # 3. Ajoute la partie du texte après l'entité (à partir de e.end).
-        sanitized = sanitized[:e.start] + token + sanitized[e.end:] 
-
-    return sanitized
\ No newline at end of file
+        return BLOCK_MESSAGE
+
+    # Un seul parcours du texte : les morceaux sont assemblés une seule fois à la fin
+    return "".join(_masked_pieces(text, entities))
+
+
+def _masked_pieces(text: str, entities: List[Span]) -> Iterator[str]:
+    # Parcourt les entités par position croissante : texte entre deux entités, puis token de masquage.
+    cursor = 0
+    for e in sorted(entities, key=lambda x: x.start):
+        # Entité chevauchant la précédente : déjà couverte par un token (la fusion l'évite)
+        if e.start < cursor:
+            continue
+        # Texte non sensible avant l'entité
+        if e.start > cursor:
+            yield text[cursor:e.start]
+        # Jeton de masquage au format <TYPE_MASKED>
+        yield f"<{e.type}_MASKED>"
+        cursor = e.end
+    # Fin du texte après la dernière entité
+    if cursor < len(text):
+        yield text[cursor:]
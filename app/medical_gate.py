@@ -0,0 +1,200 @@
+# ------------------------------------------------------------------------------------------------------------------------------------------------------------------
+# MODULE : MEDICAL GATE
+# Description : Porte d'entrée du NER médical : GLiNER ne tourne que sur les textes (ou fenêtres de texte)
+#               qui contiennent au moins un terme du lexique médical français.
+#
+# Objectif :
+#  - La majorité du trafic est bancaire : sans signal médical (médicament, maladie, examen, acte...),
+#    la passe camembert-bio GLiNER est évitée.
+#  - Mode "shadow" : le modèle tourne quand même sur les fenêtres que la porte aurait écartées, ce qui
+#    mesure le rappel de la porte (entités médicales manquées) sans changer les résultats.
+#
+# Remarque :
+#  - Recherche de tous les termes en un seul parcours : le texte est découpé en mots, puis chaque mot
+#    distinct est cherché par préfixe dans un ensemble (mêmes garanties qu'un Aho-Corasick pour ce besoin,
+#    sans dépendance ; ~10 Mo/s sur un coeur, voir benchmarks/bench_medical_gate.py).
+#  - Lexique : un terme ou radical par ligne (data/medical_lexicon_fr.txt), cherché en début de mot,
+#    sans casse ni accents ; les sigles en majuscules (IRM, AVC...) sont cherchés tels quels, en mot entier.
+#  - Section 'ner_medical.gate' de settings.json : enabled, mode ("enforce" / "shadow"), lexicon_path.
+#  - Mode livré et par défaut : "shadow" ; "enforce" (fenêtres écartées réellement sautées) une fois le rappel validé.
+#  - Compteurs exposés dans /metrics (desens_medical_gate), remis à zéro quand la section 'gate' change.
+# ------------------------------------------------------------------------------------------------------------------------------------------------------------------
+
+import re
+import threading
+import unicodedata
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from app.config import get_ner_medical_config
+from app.metrics import register_callback
+
+# Valeurs par défaut si la section 'ner_medical.gate' de settings.json est incomplète
+DEFAULT_LEXICON_PATH = "data/medical_lexicon_fr.txt"
+DEFAULT_MODE = "shadow"
+GATE_MODES = ("enforce", "shadow")
+
+# Mots du texte (les traits d'union et barres restent dans le mot : anti-inflammatoire, mg/j)
+WORD_RE = re.compile(r"\w+(?:[-/]\w+)*")
+
+
+# ---------------------------------------------------------------------------------
+#                      CHARGEMENT DU LEXIQUE
+# ---------------------------------------------------------------------------------
+# Retourne les termes du fichier (lignes vides et commentaires # ignorés).
+
+def load_lexicon(path: str) -> List[str]:
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            lines = [line.strip() for line in f]
+    except FileNotFoundError:
+        raise FileNotFoundError(f"Medical lexicon not found at {path}.")
+    return [line for line in lines if line and not line.startswith("#")]
+
+
+def _strip_accents(term: str) -> str:
+    decomposed = unicodedata.normalize("NFD", term)
+    return unicodedata.normalize("NFC", "".join(c for c in decomposed if not unicodedata.combining(c)))
+
+
+# ---------------------------------------------------------------------------------
+#                      PORTE
+# ---------------------------------------------------------------------------------
+
+class MedicalGate:
+
+    def __init__(self, terms: Sequence[str], mode: str = DEFAULT_MODE):
+        if mode not in GATE_MODES:
+            raise ValueError(f"Unknown medical gate mode '{mode}' (expected one of {GATE_MODES}).")
+        self.mode = mode
+        self.shadow = mode == "shadow"
+
+        # Sigles (tout en majuscules) : casse exacte, mot entier ; autres termes : début de mot, sans casse ni accents
+        self._acronyms = frozenset(t for t in terms if t.isupper())
+        stems = {t.lower() for t in terms if not t.isupper()}
+        stems |= {_strip_accents(t) for t in stems}
+        self.size = len(self._acronyms) + len(stems)
+
+        # Termes d'un mot : radicaux cherchés par préfixe des mots du texte (longueurs triées)
+        self._stems = frozenset(t for t in stems if " " not in t)
+        self._stem_lengths = sorted({len(t) for t in self._stems})
+        # Termes de plusieurs mots : vérifiés seulement si tous leurs mots sont présents dans le texte
+        self._phrases: Dict[str, List[Tuple[Tuple[str, ...], "re.Pattern"]]] = {}
+        for term in stems - self._stems:
+            words = tuple(term.split())
+            pattern = re.compile(r"\b" + r"\s+".join(map(re.escape, words)), re.IGNORECASE)
+            self._phrases.setdefault(words[0], []).append((words, pattern))
+
+        self._lock = threading.Lock()
+        self._stats = {
+            "texts": 0,
+            "texts_skipped": 0,
+            "windows": 0,
+            "windows_skipped": 0,
+            "shadow_entities": 0,
+            "shadow_missed_windows": 0,
+            "shadow_missed_entities": 0,
+        }
+
+    # True si text[start:end] contient un terme du lexique.
+    # Un seul parcours du texte (découpage en mots, en C), puis recherche des mots distincts dans les
+    # ensembles du lexique : le coût ne dépend presque pas de la taille du lexique.
+    def has_signal(self, text: str, start: int = 0, end: Optional[int] = None) -> bool:
+        end = len(text) if end is None else end
+        words = set(WORD_RE.findall(text, start, end))
+        if not self._acronyms.isdisjoint(words):
+            return True
+
+        lowered = {w.lower() for w in words}
+        stems, lengths = self._stems, self._stem_lengths
+        for word in lowered:
+            for length in lengths:
+                if length > len(word):
+                    break
+                if word[:length] in stems:
+                    return True
+            for phrase, pattern in self._phrases.get(word, ()):
+                if lowered.issuperset(phrase[1:]) and pattern.search(text, start, end):
+                    return True
+        return False
+
+    # Comptabilise un lot.
+    #  Args:
+    #      - text_windows: nombre de fenêtres de chaque texte (dans l'ordre de `passed`).
+    #      - passed: pour chaque fenêtre, True si la porte l'a laissée passer.
+    #      - window_entities: entités trouvées par fenêtre (mode shadow : aussi pour les fenêtres écartées).
+    def record(self, text_windows: Sequence[int], passed: Sequence[bool], window_entities: Sequence[list]):
+        texts_skipped = 0
+        cursor = 0
+        for count in text_windows:
+            if not any(passed[cursor:cursor + count]):
+                texts_skipped += 1
+            cursor += count
+
+        shadow_entities = missed_windows = missed_entities = 0
+        if self.shadow:
+            for ok, entities in zip(passed, window_entities):
+                shadow_entities += len(entities)
+                if not ok and entities:
+                    missed_windows += 1
+                    missed_entities += len(entities)
+
+        with self._lock:
+            self._stats["texts"] += len(text_windows)
+            self._stats["texts_skipped"] += texts_skipped
+            self._stats["windows"] += len(passed)
+            self._stats["windows_skipped"] += sum(1 for ok in passed if not ok)
+            self._stats["shadow_entities"] += shadow_entities
+            self._stats["shadow_missed_windows"] += missed_windows
+            self._stats["shadow_missed_entities"] += missed_entities
+
+    def stats(self) -> Dict[str, object]:
+        with self._lock:
+            stats: Dict[str, object] = dict(self._stats)
+        stats["mode"] = self.mode
+        stats["lexicon_size"] = self.size
+        stats["skip_rate"] = round(stats["windows_skipped"] / stats["windows"], 4) if stats["windows"] else None
+        # Rappel estimé (mode shadow) : part des entités du modèle situées dans une fenêtre non écartée
+        total = stats["shadow_entities"]
+        stats["shadow_recall"] = round(1 - stats["shadow_missed_entities"] / total, 4) if total else None
+        return stats
+
+
+# ---------------------------------------------------------------------------------
+#                      INSTANCE DE LA CONFIGURATION COURANTE
+# ---------------------------------------------------------------------------------
+# Recréée seulement si la section 'ner_medical.gate' change. None si la porte est désactivée.
+
+_gate: Optional[MedicalGate] = None
+_gate_key: Optional[Tuple[str, str]] = None
+_gate_lock = threading.Lock()
+
+
+def get_medical_gate() -> Optional[MedicalGate]:
+    global _gate, _gate_key
+    cfg = get_ner_medical_config().get("gate", {})
+    if not cfg.get("enabled", False):
+        return None
+    key = (cfg.get("lexicon_path", DEFAULT_LEXICON_PATH), cfg.get("mode", DEFAULT_MODE))
+    if _gate is not None and _gate_key == key:
+        return _gate
+    with _gate_lock:
+        if _gate is None or _gate_key != key:
+            path, mode = key
+            _gate = MedicalGate(load_lexicon(path), mode)
+            _gate_key = key
+            print(f"[MEDICAL-GATE] {_gate.size} terms loaded from {path} (mode={mode})")
+        return _gate
+
+
+# Compteurs exposés dans /metrics
+def _gate_metrics():
+    gate = _gate
+    if gate is None:
+        return
+    stats = gate.stats()
+    for key in ("texts", "texts_skipped", "windows", "windows_skipped",
+                "shadow_entities", "shadow_missed_windows", "shadow_missed_entities"):
+        yield (key,), stats[key]
+
+
+register_callback("desens_medical_gate", "Compteurs de la porte lexicale du NER médical.", ("stat",), _gate_metrics)
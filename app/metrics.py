@@ -0,0 +1,268 @@
+# ------------------------------------------------------------------------------------------------------------------------------------------------------------------
+# MODULE : METRICS
+# Description : Métriques du service au format texte Prometheus (endpoint /metrics).
+#
+# Objectif :
+#  - Savoir où passe le temps dans le pipeline : histogramme de latence par étape
+#    (ingestion, rules, ner_general, ner_medical, fusion, scoring, masking, audit, llm_guard).
+#  - Compteurs par type de source (text / pdf / docx / image...) et par décision, distributions
+#    de la taille des entrées et du nombre d'entités, état des modèles, requêtes en cours.
+#
+# Remarque :
+#  - Implémentation interne et minimale (compteurs, jauges, histogrammes) : pas de dépendance.
+#  - Coût sur le chemin chaud : un perf_counter + un bisect + quelques additions sous verrou
+#    par observation (de l'ordre de la microseconde).
+#  - Les jauges "callback" (état des modèles, cache, file d'audit) sont calculées à la lecture de /metrics.
+# ------------------------------------------------------------------------------------------------------------------------------------------------------------------
+
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+# Bornes des histogrammes
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+SIZE_BUCKETS = tuple(float(256 * 4 ** i) for i in range(10))  # 256 o -> 64 Mo
+ENTITY_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 5000)
+
+LabelValues = Tuple[str, ...]
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    parts = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+# ---------------------------------------------------------------------------------
+#                      TYPES DE METRIQUES
+# ---------------------------------------------------------------------------------
+
+class Counter:
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values: Dict[LabelValues, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *labels: str, amount: float = 1.0):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0.0) + amount
+
+    def samples(self) -> Iterable[str]:
+        with self._lock:
+            items = list(self._values.items())
+        for labels, value in items:
+            yield f"{self.name}{_format_labels(self.labelnames, labels)} {_format_value(value)}"
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def set(self, *labels: str, value: float):
+        with self._lock:
+            self._values[labels] = value
+
+    def dec(self, *labels: str, amount: float = 1.0):
+        self.inc(*labels, amount=-amount)
+
+
+class CallbackGauge:
+    kind = "gauge"
+
+    # callback() -> [(valeurs des labels, valeur)]
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str],
+                 callback: Callable[[], Iterable[Tuple[LabelValues, float]]]):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.callback = callback
+
+    def samples(self) -> Iterable[str]:
+        try:
+            items = list(self.callback())
+        except Exception:
+            return
+        for labels, value in items:
+            if value is None:
+                continue
+            yield f"{self.name}{_format_labels(self.labelnames, labels)} {_format_value(value)}"
+
+
+class Histogram:
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = LATENCY_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # Par jeu de labels : [compteurs par borne (non cumulés) + +Inf, somme]
+        self._values: Dict[LabelValues, List] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *labels: str):
+        idx = bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(labels)
+            if state is None:
+                state = self._values[labels] = [[0] * (len(self.buckets) + 1), 0.0]
+            state[0][idx] += 1
+            state[1] += value
+
+    def samples(self) -> Iterable[str]:
+        with self._lock:
+            items = [(labels, list(counts), total) for labels, (counts, total) in self._values.items()]
+        for labels, counts, total in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                le = 'le="' + _format_value(bound) + '"'
+                yield f"{self.name}_bucket{_format_labels(self.labelnames, labels, le)} {cumulative}"
+            yield f"{self.name}_sum{_format_labels(self.labelnames, labels)} {_format_value(total)}"
+            yield f"{self.name}_count{_format_labels(self.labelnames, labels)} {cumulative}"
+
+
+# ---------------------------------------------------------------------------------
+#                      REGISTRE
+# ---------------------------------------------------------------------------------
+
+class Registry:
+
+    def __init__(self):
+        self._metrics: List = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        lines: List[str] = []
+        for metric in self._metrics:
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(metric.samples())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+# Type de contenu de l'exposition texte Prometheus
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+STAGE_LATENCY = REGISTRY.register(Histogram(
+    "desens_stage_duration_seconds", "Durée de chaque étape du pipeline.", ("stage",)))
+REQUEST_LATENCY = REGISTRY.register(Histogram(
+    "desens_http_request_duration_seconds", "Durée des requêtes HTTP (jusqu'à la fin de la réponse).", ("endpoint", "status")))
+INFLIGHT = REGISTRY.register(Gauge(
+    "desens_http_requests_in_flight", "Requêtes HTTP en cours de traitement."))
+RESULTS = REGISTRY.register(Counter(
+    "desens_results_total", "Résultats produits par type de source et décision.", ("source_type", "decision")))
+INPUT_SIZE = REGISTRY.register(Histogram(
+    "desens_input_size_bytes", "Taille des entrées (octets).", ("source_type",), SIZE_BUCKETS))
+ENTITY_COUNT = REGISTRY.register(Histogram(
+    "desens_entities_per_result", "Nombre d'entités détectées par résultat.", ("source_type",), ENTITY_BUCKETS))
+SKIPPED_STAGES = REGISTRY.register(Counter(
+    "desens_skipped_stages_total", "Étapes évitées par la cascade (règles déjà suffisantes pour bloquer).", ("stage",)))
+ADMISSION_REJECTED = REGISTRY.register(Counter(
+    "desens_admission_rejected_total", "Requêtes refusées par le contrôle d'admission, par motif.", ("reason",)))
+DEADLINE_EXCEEDED = REGISTRY.register(Counter(
+    "desens_deadline_exceeded_total", "Requêtes abandonnées à échéance, par étape.", ("stage",)))
+
+
+# Chronomètre une étape du pipeline.
+@contextmanager
+def stage_timer(stage: str):
+    t0 = time.perf_counter()
+    try:
+        yield
+    finally:
+        STAGE_LATENCY.observe(time.perf_counter() - t0, stage)
+
+
+def observe_stage(stage: str, seconds: float):
+    STAGE_LATENCY.observe(seconds, stage)
+
+
+# Enregistre un résultat (réponse calculée ou servie par le cache).
+def record_result(source_type: str, decision: str, size: Optional[int], entities: int):
+    source_type = source_type or "unknown"
+    RESULTS.inc(source_type, decision)
+    if size is not None:
+        INPUT_SIZE.observe(size, source_type)
+    ENTITY_COUNT.observe(entities, source_type)
+
+
+# Étapes évitées pour un résultat (mode cascade).
+def record_skipped(stages: Iterable[str]):
+    for stage in stages:
+        SKIPPED_STAGES.inc(stage)
+
+
+# Requête refusée (file pleine, attente trop longue) ou abandonnée à échéance.
+def record_rejected(reason: str):
+    ADMISSION_REJECTED.inc(reason)
+
+
+def record_deadline_exceeded(stage: str):
+    DEADLINE_EXCEEDED.inc(stage)
+    ADMISSION_REJECTED.inc("deadline")
+
+
+def register_callback(name: str, documentation: str, labelnames: Sequence[str],
+                      callback: Callable[[], Iterable[Tuple[LabelValues, float]]]):
+    return REGISTRY.register(CallbackGauge(name, documentation, labelnames, callback))
+
+
+def render_metrics() -> str:
+    return REGISTRY.render()
+
+
+# ---------------------------------------------------------------------------------
+#                      MIDDLEWARE ASGI
+# ---------------------------------------------------------------------------------
+# Requêtes en cours et durée par endpoint (route FastAPI, pas le chemin brut : cardinalité bornée).
+# Les réponses en streaming sont comptées jusqu'au dernier morceau envoyé.
+
+class MetricsMiddleware:
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status = ["500"]
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status[0] = str(message["status"])
+            await send(message)
+
+        t0 = time.perf_counter()
+        INFLIGHT.inc()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            INFLIGHT.dec()
+            route = scope.get("route")
+            label = getattr(route, "path", None) or "unmatched"
+            REQUEST_LATENCY.observe(time.perf_counter() - t0, label, status[0])
@@ -4,9 +4,10 @@
 #
 # ------------------------------------------------------------------------------------------------------------------------------------------------------------------
 
-from typing import List, Dict, Literal 
+import sys
+from typing import Any, Dict, List, Literal, Optional, Sequence, Union 
 # Import Pydantic pour définir les modèles de données avec validation
-from pydantic import BaseModel 
+from pydantic import BaseModel, TypeAdapter 
 
 # ---------------------------------------------------------------------------------
 #                        Entity - ELEMENT SENSIBLE DETECTE
@@ -22,6 +23,67 @@ class Entity(BaseModel):
 
 
 
+# ---------------------------------------------------------------------------------
+#                        Span - ENTITE INTERNE (COMPACTE)
+# ---------------------------------------------------------------------------------
+# Représentation d'une entité à l'intérieur du pipeline (détection, fusion, score, masquage, audit).
+# Objet à __slots__ : ni validation Pydantic, ni dictionnaire par objet, ni copie de la valeur
+# (la valeur est relue dans le texte, text[start:end], seulement pour la réponse).
+# Le type est une chaîne partagée (sys.intern) : toutes les entités d'un même type pointent vers
+# la même chaîne. Conversion en Entity uniquement à la sortie (to_entities) : les entités écartées
+# par la fusion ou seulement comptées (audit, streaming) ne deviennent jamais des objets Pydantic.
+
+class Span:
+    __slots__ = ("type", "start", "end", "confidence", "source")
+
+    def __init__(self, type: str, start: int, end: int, confidence: float, source: str = "rules"):
+        self.type = type # Type logique, chaîne partagée (voir span_type)
+        self.start = start # Index de début dans le texte d'origine
+        self.end = end # Index de fin (exclu)
+        self.confidence = confidence # Score de confiance entre 0 et 1
+        self.source = source # 'rules' ou 'ml'
+
+    def __repr__(self) -> str:
+        return f"Span({self.type!r}, {self.start}, {self.end}, {self.confidence}, {self.source!r})"
+
+    def __eq__(self, other: object) -> bool:
+        if not isinstance(other, Span):
+            return NotImplemented
+        return (self.type, self.start, self.end, self.confidence, self.source) == \
+            (other.type, other.start, other.end, other.confidence, other.source)
+
+    # Même contenu que Entity.model_dump() (lignes JSON du streaming)
+    def to_dict(self, text: str) -> Dict[str, Any]:
+        return {
+            "type": self.type,
+            "value": text[self.start:self.end],
+            "start": self.start,
+            "end": self.end,
+            "confidence": self.confidence,
+            "source": self.source,
+        }
+
+
+# Type partagé : les libellés construits à la volée (ex: "MED_" + label) ne sont pas dupliqués par entité
+def span_type(name: str) -> str:
+    return sys.intern(name)
+
+
+# Conversion à la sortie du pipeline : validation par tranches (pydantic-core), plus rapide qu'une
+# Entity construite une par une (y compris model_construct, en Python pur) ; les dictionnaires
+# intermédiaires d'une seule tranche existent à la fois.
+_ENTITY_LIST = TypeAdapter(List[Entity])
+_CONVERT_SLICE = 1024
+
+
+def to_entities(text: str, spans: Sequence[Span]) -> List[Entity]:
+    entities: List[Entity] = []
+    for i in range(0, len(spans), _CONVERT_SLICE):
+        entities.extend(_ENTITY_LIST.validate_python([span.to_dict(text) for span in spans[i:i + _CONVERT_SLICE]]))
+    return entities
+
+
+
 
 
 # ---------------------------------------------------------------------------------
@@ -47,6 +109,49 @@ class SanitizeResponse(BaseModel):
 
 
 
+# ---------------------------------------------------------------------------------
+#                 SanitizeBatchRequest - LOT DE TEXTES A ANALYSER
+# ---------------------------------------------------------------------------------
+# Modèle Pydantic du corps de la requête POST /sanitize-batch.
+
+class SanitizeBatchRequest(BaseModel):
+    texts: List[str] # ( LIST[STRING] ) Textes bruts à analyser, traités indépendamment
+
+
+
+# ---------------------------------------------------------------------------------
+#                 SanitizeView - RESPONSE SELON LA VUE DEMANDEE
+# ---------------------------------------------------------------------------------
+# Schéma (documentation OpenAPI) des réponses de /sanitize, /sanitize-batch et /sanitize-file,
+# construites par projection.py selon les paramètres entities / include_text :
+#   - entities=full : entities = [Entity] (vue par défaut, même contenu que SanitizeResponse)
+#   - entities=positions : entities = [EntityPosition] (sans les valeurs)
+#   - entities=counts : entities_count + types_count, pas de liste
+#   - entities=none : aucun champ d'entités
+#   - include_text=false : pas de sanitized_text
+
+class EntityPosition(BaseModel):
+    type: str # Type logique de l'entité
+    start: int # Index de début dans le texte d'origine
+    end: int # Index de fin (exclu)
+    confidence: float # Score de confiance entre 0 et 1
+    source: Literal["rules", "ml"] = "rules" # Origine de la détection
+
+
+class SanitizeView(BaseModel):
+    sanitized_text: Optional[str] = None # Absent si include_text=false
+    decision: Literal["ALLOW", "MASK", "BLOCK"] # Décision globale
+    risk_score: float # Score de risque global entre 0 et 1
+    entities: Optional[List[Union[Entity, EntityPosition]]] = None # Vues full / positions
+    entities_count: Optional[int] = None # Vue counts
+    types_count: Optional[Dict[str, int]] = None # Vue counts
+    metadata: Dict[str, object] = {} # Métadonnées techniques
+
+
+class SanitizeBatchView(BaseModel):
+    results: List[SanitizeView] # Résultat de chaque texte (même index que la requête)
+
+
 
 # ---------------------------------------------------------------------------------
 #                      SanitizeResponse - RESPONSE ( en cours )
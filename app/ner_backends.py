@@ -0,0 +1,123 @@
+# ------------------------------------------------------------------------------------------------------------------------------------------------------------------
+# MODULE : NER BACKENDS
+# Description : Moteurs d'inférence interchangeables pour le modèle NER général (camembert-ner).
+#
+# Objectif :
+#  - "torch"      : modèle PyTorch fp32, exécuté en torch.inference_mode (pas de suivi autograd).
+#  - "onnx"       : même modèle exporté en ONNX, exécuté par ONNX Runtime (fp32).
+#  - "onnx-int8"  : modèle ONNX quantifié dynamiquement en int8 (poids int8, activations fp32).
+#  - Le choix se fait dans settings.json (section 'ner_general', clé 'backend').
+#
+# Remarque :
+#  - Les modèles ONNX sont produits par : python -m app.ner_export --int8 --check
+#    et écrits dans le cache local 'onnx_cache_dir' (par défaut models/onnx).
+#  - Tous les moteurs prennent les entrées du tokenizer au format numpy et renvoient les logits
+#    au format numpy : le décodage des entités est commun.
+# ------------------------------------------------------------------------------------------------------------------------------------------------------------------
+
+import os
+from typing import Dict, Optional
+
+import numpy as np
+
+# Noms des moteurs acceptés dans settings.json
+BACKENDS = ("torch", "onnx", "onnx-int8")
+
+# Fichiers produits dans le cache par l'export (un dossier par modèle)
+ONNX_FILES = {
+    "onnx": "model.onnx",
+    "onnx-int8": "model.int8.onnx",
+}
+
+
+# ---------------------------------------------------------------------------------
+#                      CHEMIN DU CACHE ONNX
+# ---------------------------------------------------------------------------------
+# Retourne le chemin du fichier ONNX d'un modèle pour un moteur donné.
+# ex: models/onnx/Jean-Baptiste__camembert-ner/model.int8.onnx
+
+def onnx_model_path(cache_dir: str, model_name: str, backend: str) -> str:
+    return os.path.join(cache_dir, model_name.replace("/", "__"), ONNX_FILES[backend])
+
+
+# ---------------------------------------------------------------------------------
+#                      MOTEUR PYTORCH
+# ---------------------------------------------------------------------------------
+
+class TorchBackend:
+
+    name = "torch"
+
+    def __init__(self, model_name: str, num_threads: int = 0):
+        import torch
+        from transformers import AutoModelForTokenClassification
+
+        self._torch = torch
+        # Charge le modèle de classification de jetons pré-entraîné, en mode évaluation
+        self.model = AutoModelForTokenClassification.from_pretrained(model_name)
+        self.model.eval()
+        self.id2label = self.model.config.id2label
+        if num_threads:
+            torch.set_num_threads(num_threads)
+
+    def logits(self, inputs: Dict[str, np.ndarray]) -> np.ndarray:
+        torch = self._torch
+        # inference_mode : pas de graphe autograd ni de compteurs de version sur les tenseurs
+        with torch.inference_mode():
+            outputs = self.model(
+                input_ids=torch.from_numpy(inputs["input_ids"]),
+                attention_mask=torch.from_numpy(inputs["attention_mask"]),
+            )
+        return outputs.logits.numpy()
+
+
+# ---------------------------------------------------------------------------------
+#                      MOTEUR ONNX RUNTIME (FP32 OU INT8)
+# ---------------------------------------------------------------------------------
+
+class OnnxBackend:
+
+    def __init__(self, model_name: str, backend: str, cache_dir: str, num_threads: int = 0):
+        import onnxruntime as ort
+        from transformers import AutoConfig
+
+        self.name = backend
+        path = onnx_model_path(cache_dir, model_name, backend)
+        if not os.path.exists(path):
+            raise FileNotFoundError(
+                f"ONNX model not found at {path}. Run: python -m app.ner_export"
+                + (" --int8" if backend == "onnx-int8" else "")
+            )
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if num_threads:
+            options.intra_op_num_threads = num_threads
+        self.session = ort.InferenceSession(path, sess_options=options, providers=["CPUExecutionProvider"])
+        # Les labels ne sont pas dans le fichier ONNX : on les lit dans la config du modèle
+        self.id2label = AutoConfig.from_pretrained(model_name).id2label
+
+    def logits(self, inputs: Dict[str, np.ndarray]) -> np.ndarray:
+        feed = {
+            "input_ids": inputs["input_ids"].astype(np.int64),
+            "attention_mask": inputs["attention_mask"].astype(np.int64),
+        }
+        return self.session.run(["logits"], feed)[0]
+
+
+# ---------------------------------------------------------------------------------
+#                      CREATION DU MOTEUR
+# ---------------------------------------------------------------------------------
+# Crée le moteur demandé.
+#  Args:
+#      - backend: "torch", "onnx" ou "onnx-int8".
+#      - model_name: modèle du Hub Hugging Face.
+#      - cache_dir: dossier des modèles ONNX exportés.
+#      - num_threads: threads intra-op (0 = valeur par défaut de la librairie).
+
+def load_backend(backend: str, model_name: str, cache_dir: str, num_threads: Optional[int] = 0):
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown NER backend '{backend}'. Expected one of {BACKENDS}.")
+    if backend == "torch":
+        return TorchBackend(model_name, num_threads or 0)
+    return OnnxBackend(model_name, backend, cache_dir, num_threads or 0)
@@ -16,7 +16,7 @@
 # ------------------------------------------------------------------------------------------------------------------------------------------------------------------
 
 from typing import List 
-from app.models import Entity 
+from app.models import Span 
 import spacy 
 
 # Variable globale pour stocker le modèle chargé une seule fois
@@ -55,16 +55,16 @@ LABEL_MAP = {
 #  Args: 
 #   - text: Texte brut en français. 
 #  Returns: 
-#   - Liste d'Entity détectées par le modèle ML. 
+#   - Liste de Span détectés par le modèle ML. 
 
-def detect_entities_ml(text: str) -> List[Entity]: 
+def detect_entities_ml(text: str) -> List[Span]: 
 
     # Récupère l'objet modèle spaCy chargé 
     nlp = _get_nlp() 
     # Traite le texte avec le modèle spaCy avec 'doc' = les entités.
     doc = nlp(text) 
     # Liste qui contiendra les entités au format standard.
-    entities: List[Entity] = [] 
+    entities: List[Span] = [] 
 
     # Boucle sur les entités dans 'doc'.
     for ent in doc.ents: 
@@ -74,21 +74,19 @@ def detect_entities_ml(text: str) -> List[Entity]:
         confidence = 0.85 
         # Ajoute une nouvelle entité à la liste des résultats.
         entities.append( 
-            # Crée un nouvel objet Entity.
-            Entity( 
+            # Crée un nouvel objet Span.
+            Span( 
                 # Le type de l'entité PERSON, ORGANIZATION, ...
-                type=ent_type, 
-                # Le texte exact de l'entité telle que trouvée par spaCy.
-                value=ent.text, 
+                ent_type, 
                 # L'index de début de l'entité dans la chaîne originale.
-                start=ent.start_char, 
+                ent.start_char, 
                 # L'index de fin (exclu) de l'entité dans la chaîne originale.
-                end=ent.end_char, 
+                ent.end_char, 
                 # Le score de confiance fixe pour le moment à 0.85
-                confidence=confidence, 
+                confidence, 
                 # Indique que l'entité provient du moteur Machine Learning pour la fusion
-                source="ml", 
+                "ml", 
             ) 
         ) 
-    # Retourne la liste finale des entités au format standard Entity.
+    # Retourne la liste finale des entités au format interne Span.
     return entities 
\ No newline at end of file
@@ -0,0 +1,149 @@
+# ------------------------------------------------------------------------------------------------------------------------------------------------------------------
+# MODULE : NER EXPORT
+# Description : Export ONNX (fp32) et quantification dynamique int8 du modèle NER général,
+#               avec contrôle de parité des entités par rapport au modèle PyTorch.
+#
+# Utilisation :
+#   python -m app.ner_export                  -> écrit models/onnx/<modèle>/model.onnx
+#   python -m app.ner_export --int8           -> + model.int8.onnx (quantification dynamique)
+#   python -m app.ner_export --int8 --check   -> + compare les entités torch / onnx / onnx-int8
+#
+# Remarque :
+#  - Le dossier de sortie est 'onnx_cache_dir' de settings.json (section 'ner_general').
+#  - Le contrôle de parité utilise app/test.json et un texte long (découpé en fenêtres),
+#    et sort en erreur (code 1) si une entité diffère.
+# ------------------------------------------------------------------------------------------------------------------------------------------------------------------
+
+import argparse
+import json
+import os
+import sys
+from typing import Dict, List, Tuple
+
+from app.config import get_ner_general_config
+from app.ner_backends import onnx_model_path
+from app import ner_general_hf
+
+# Opset ONNX utilisé pour l'export (supporté par onnxruntime 1.19)
+OPSET = 14
+
+# Fichier d'exemples utilisé pour la parité
+PARITY_SAMPLES_PATH = os.path.join(os.path.dirname(__file__), "test.json")
+
+
+# ---------------------------------------------------------------------------------
+#                      EXPORT ONNX FP32
+# ---------------------------------------------------------------------------------
+
+def export_onnx(cache_dir: str) -> str:
+    import torch
+    from transformers import AutoTokenizer, AutoModelForTokenClassification
+
+    path = onnx_model_path(cache_dir, ner_general_hf.MODEL_NAME, "onnx")
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+
+    tokenizer = AutoTokenizer.from_pretrained(ner_general_hf.MODEL_NAME)
+    model = AutoModelForTokenClassification.from_pretrained(ner_general_hf.MODEL_NAME)
+    model.eval()
+
+    # Enveloppe qui ne renvoie que les logits (sortie nommée "logits" dans le graphe ONNX)
+    class _LogitsOnly(torch.nn.Module):
+        def __init__(self, inner):
+            super().__init__()
+            self.inner = inner
+
+        def forward(self, input_ids, attention_mask):
+            return self.inner(input_ids=input_ids, attention_mask=attention_mask).logits
+
+    dummy = tokenizer(["Bonjour Jean Dupont, je travaille à Paris."], return_tensors="pt")
+    dynamic = {0: "batch", 1: "sequence"}
+    # no_grad (et non inference_mode) : le traçage de l'export doit pouvoir manipuler les tenseurs
+    with torch.no_grad():
+        torch.onnx.export(
+            _LogitsOnly(model),
+            (dummy["input_ids"], dummy["attention_mask"]),
+            path,
+            input_names=["input_ids", "attention_mask"],
+            output_names=["logits"],
+            dynamic_axes={"input_ids": dynamic, "attention_mask": dynamic, "logits": dynamic},
+            opset_version=OPSET,
+        )
+    print(f"[NER-EXPORT] ONNX fp32 -> {path}")
+    return path
+
+
+# ---------------------------------------------------------------------------------
+#                      QUANTIFICATION DYNAMIQUE INT8
+# ---------------------------------------------------------------------------------
+
+def quantize_int8(cache_dir: str) -> str:
+    from onnxruntime.quantization import QuantType, quantize_dynamic
+
+    source = onnx_model_path(cache_dir, ner_general_hf.MODEL_NAME, "onnx")
+    target = onnx_model_path(cache_dir, ner_general_hf.MODEL_NAME, "onnx-int8")
+    quantize_dynamic(source, target, weight_type=QuantType.QInt8)
+    print(f"[NER-EXPORT] ONNX int8 -> {target}")
+    return target
+
+
+# ---------------------------------------------------------------------------------
+#                      CONTROLE DE PARITE
+# ---------------------------------------------------------------------------------
+# Compare les entités (début, fin, type) de chaque moteur à celles du moteur PyTorch.
+# Retourne, pour chaque moteur, le nombre de textes dont les entités diffèrent.
+
+def _parity_texts() -> List[str]:
+    with open(PARITY_SAMPLES_PATH, "r", encoding="utf-8") as f:
+        texts = [sample["text"] for sample in json.load(f)]
+    # Texte long : vérifie aussi le découpage en fenêtres
+    texts.append(" ".join(texts * 60))
+    return texts
+
+
+def _spans(texts: List[str]) -> List[List[Tuple[int, int, str]]]:
+    return [[(e.start, e.end, e.type) for e in entities] for entities in ner_general_hf.detect_entities_general_batch(texts)]
+
+
+def check_parity(backends: List[str], cache_dir: str) -> Dict[str, int]:
+    texts = _parity_texts()
+
+    ner_general_hf.use_backend("torch")
+    reference = _spans(texts)
+
+    mismatches: Dict[str, int] = {}
+    for backend in backends:
+        ner_general_hf.use_backend(backend, cache_dir)
+        spans = _spans(texts)
+        mismatches[backend] = 0
+        for i, (expected, got) in enumerate(zip(reference, spans)):
+            if expected != got:
+                mismatches[backend] += 1
+                print(f"[NER-EXPORT] {backend} differs on text #{i}: torch={expected} {backend}={got}")
+        print(f"[NER-EXPORT] parity {backend}: {len(texts) - mismatches[backend]}/{len(texts)} identical")
+    return mismatches
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Export ONNX / int8 du modèle NER général.")
+    parser.add_argument("--int8", action="store_true", help="quantifie aussi le modèle en int8 (dynamique)")
+    parser.add_argument("--check", action="store_true", help="contrôle de parité des entités avec PyTorch")
+    parser.add_argument("--cache-dir", default=None, help="dossier de sortie (défaut : onnx_cache_dir de settings.json)")
+    args = parser.parse_args(argv)
+
+    cache_dir = args.cache_dir or get_ner_general_config().get("onnx_cache_dir", ner_general_hf.DEFAULT_ONNX_CACHE_DIR)
+
+    export_onnx(cache_dir)
+    backends = ["onnx"]
+    if args.int8:
+        quantize_int8(cache_dir)
+        backends.append("onnx-int8")
+
+    if args.check:
+        mismatches = check_parity(backends, cache_dir)
+        if any(mismatches.values()):
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
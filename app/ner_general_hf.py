@@ -1,51 +1,176 @@
-# Importe les classes nécessaires de Hugging Face pour charger un tokenizer et un modèle de classification de jetons 
-from transformers import AutoTokenizer, AutoModelForTokenClassification 
-# Importe la librairie PyTorch, utilisée par le modèle en arrière-plan
-import torch 
-# Importe la classe Entity -> Pydantic Model pour structurer le résultat final.
-from app.models import Entity 
+# Importe la classe nécessaire de Hugging Face pour charger le tokenizer
+from transformers import AutoTokenizer 
+import numpy as np
+import threading
+from typing import List, Optional, Tuple
+# Importe la classe Span -> représentation interne compacte des entités détectées.
+from app.models import Span 
+# Importe la configuration (section 'ner_general') et le découpage en fenêtres
+from app.config import get_ner_general_config
+from app.chunking import plan_windows, merge_window_entities
+# Importe les moteurs d'inférence (PyTorch, ONNX Runtime fp32 / int8)
+from app.ner_backends import load_backend
+from app.executor import get_torch_threads
 
  # Modèle pré-entraîné à charger depuis le Hub de Hugging Face.
 MODEL_NAME = "Jean-Baptiste/camembert-ner"
 
 # Variable globale privée pour mettre en cache le tokenizer
 _tokenizer = None 
- # Variable globale privée pour mettre en cache le modèle
+ # Variable globale privée pour mettre en cache le moteur d'inférence (voir ner_backends.py)
 _model = None
+_load_lock = threading.Lock()
+
+# Valeurs par défaut du découpage en fenêtres (512 jetons max pour CamemBERT, jetons spéciaux compris)
+DEFAULT_WINDOW_TOKENS = 400
+DEFAULT_STRIDE_TOKENS = 64
+DEFAULT_CHUNK_BATCH_SIZE = 16
+
+# Valeurs par défaut du moteur d'inférence
+DEFAULT_BACKEND = "torch"
+DEFAULT_ONNX_CACHE_DIR = "models/onnx"
 
 
 def _load_model():
     global _tokenizer, _model 
     # Vérifie si le tokenizer n'a pas encore été chargé (mécanisme de cache/singleton)
     if _tokenizer is None: 
-        print("[NER-GENERAL] Loading model...")
-        # Charge le tokenizer 
-        _tokenizer = AutoTokenizer.from_pretrained(MODEL_NAME) 
-        # Charge le modèle de classification de jetons pré-entraîné.
-        _model = AutoModelForTokenClassification.from_pretrained(MODEL_NAME) 
-        # Retourne les objets tokenizer et model.
+        # Verrou : une requête arrivant pendant le préchargement (warmup.py) attend au lieu de recharger
+        with _load_lock:
+            if _tokenizer is None:
+                cfg = get_ner_general_config()
+                backend = cfg.get("backend", DEFAULT_BACKEND)
+                print(f"[NER-GENERAL] Loading model ({backend})...")
+                # Charge le moteur d'inférence choisi dans settings.json
+                _model = load_backend(
+                    backend,
+                    MODEL_NAME,
+                    cfg.get("onnx_cache_dir", DEFAULT_ONNX_CACHE_DIR),
+                    _intra_op_threads(cfg),
+                )
+                # Charge le tokenizer (en dernier : _tokenizer non nul = modèle prêt)
+                _tokenizer = AutoTokenizer.from_pretrained(MODEL_NAME) 
+        # Retourne les objets tokenizer et moteur.
     return _tokenizer, _model 
 
 
+# Remplace le moteur courant (utilisé par le contrôle de parité de ner_export).
+def use_backend(backend: str, cache_dir: Optional[str] = None):
+    global _model
+    _load_model()
+    cfg = get_ner_general_config()
+    _model = load_backend(
+        backend,
+        MODEL_NAME,
+        cache_dir or cfg.get("onnx_cache_dir", DEFAULT_ONNX_CACHE_DIR),
+        _intra_op_threads(cfg),
+    )
+
+
+# Threads intra-op du moteur : valeur explicite de settings.json, sinon la part du NER général
+# dans la répartition des coeurs entre les deux modèles (voir executor.py).
+def _intra_op_threads(cfg) -> int:
+    return cfg.get("intra_op_threads") or get_torch_threads("general")
+
+
+# ---------------------------------------------------------------------------------
+#                      LONGUEUR EN JETONS (REGROUPEMENT DES LOTS)
+# ---------------------------------------------------------------------------------
+# Retourne le nombre de jetons (jetons spéciaux inclus) de chaque texte.
+# Utilisé par le micro-batcher pour regrouper les textes de longueur proche et limiter le padding.
+
+def count_tokens(texts: List[str]) -> List[int]:
+    tokenizer, _ = _load_model()
+    # Tokenisation sans padding : on ne veut que les longueurs
+    encoded = tokenizer(texts)
+    return [len(ids) for ids in encoded["input_ids"]]
+
+
+# ---------------------------------------------------------------------------------
+#                      DETECTION SUR UN LOT DE TEXTES
+# ---------------------------------------------------------------------------------
+# Les textes qui dépassent window_tokens sont découpés en fenêtres glissantes alignées sur
+# les phrases (voir chunking.py). Toutes les fenêtres du lot passent dans le modèle par
+# paquets de batch_size, puis les entités sont ramenées en positions globales.
+# Un texte qui tient dans une fenêtre est traité tel quel (résultat inchangé).
+
+def detect_entities_general_batch(texts: List[str]) -> List[List[Span]]:
+    if not texts:
+        return []
+
+    chunking = get_ner_general_config().get("chunking", {})
+    if not chunking.get("enabled", False):
+        # Mode historique : une seule passe sur les textes entiers
+        return _predict([(text, 0, len(text)) for text in texts])
+
+    window = chunking.get("window_tokens", DEFAULT_WINDOW_TOKENS)
+    stride = chunking.get("stride_tokens", DEFAULT_STRIDE_TOKENS)
+    batch_size = chunking.get("batch_size", DEFAULT_CHUNK_BATCH_SIZE)
+
+    tokenizer, _ = _load_model()
+    # Positions (début, fin) en caractères de chaque jeton, sans les jetons spéciaux
+    offsets = tokenizer(texts, add_special_tokens=False, return_offsets_mapping=True)["offset_mapping"]
+
+    # Fenêtres de chaque texte, puis liste à plat (texte, début, fin) pour les passer en lots
+    windows = [plan_windows(text, text_offsets, window, stride) for text, text_offsets in zip(texts, offsets)]
+    pieces = [(text, start, end) for text, text_windows in zip(texts, windows) for start, end in text_windows]
+
+    piece_entities: List[List[Span]] = []
+    for i in range(0, len(pieces), batch_size):
+        piece_entities.extend(_predict(pieces[i:i + batch_size]))
+
+    # Regroupe les entités par texte et fusionne les recouvrements
+    results = []
+    cursor = 0
+    for text_windows in windows:
+        results.append(merge_window_entities(text_windows, piece_entities[cursor:cursor + len(text_windows)]))
+        cursor += len(text_windows)
+    return results
+
+
 def detect_entities_general(text: str):
+    # Un texte seul = un lot de taille 1
+    return detect_entities_general_batch([text])[0]
+
+
+# ---------------------------------------------------------------------------------
+#                      PASSE DU MODELE SUR UN LOT DE MORCEAUX
+# ---------------------------------------------------------------------------------
+# Une seule passe du modèle pour tout le lot (padding à la longueur du plus long morceau).
+# Chaque morceau est (texte complet, début, fin) : les entités sont renvoyées en positions
+# du texte complet. Les jetons de padding n'ont pas d'intervalle de caractères et sont
+# ignorés comme les jetons spéciaux.
+
+def _predict(pieces: List[Tuple[str, int, int]]) -> List[List[Span]]:
+
     # S'assure que le modèle est chargé et récupère le tokenizer et le modèle.
     tokenizer, model = _load_model() 
 
-    # Tokenise le texte d'entrée. return_tensors="pt" demande le format PyTorch
-    inputs = tokenizer(text, return_tensors="pt") 
+    # Tokenise le lot. padding=True aligne les séquences, return_tensors="np" : format commun à tous les moteurs
+    inputs = tokenizer([text[start:end] for text, start, end in pieces], return_tensors="np", padding=True) 
     
-    # Passe les entrées tokenisées au modèle pour obtenir les sorties
-    outputs = model(**inputs) 
+    # Passe les entrées tokenisées au moteur pour obtenir les logits
+    logits = model.logits(inputs) 
 
-    # Applique la fonction softmax sur les logits pour obtenir des scores de probabilité par classe
-    scores = torch.softmax(outputs.logits, dim=-1) 
-    
-    # Choisit la classe (label) avec la probabilité la plus élevée pour chaque jeton. .squeeze() supprime les dimensions unitaires, .tolist() convertit en liste Python
-    predictions = torch.argmax(scores, dim=-1).squeeze().tolist() 
-    # Récupère la liste des jetons (inclut les jetons spéciaux comme [CLS], [SEP], etc.).
-    tokens = inputs.tokens() 
+    # Choisit la classe (label) au logit le plus élevé pour chaque jeton -> une liste de prédictions par morceau
+    # (même résultat que l'argmax après softmax, sans calculer le softmax)
+    predictions = np.argmax(logits, axis=-1).tolist() 
+
+    return [
+        _decode_entities(text, inputs, batch_index, predictions[batch_index], model.id2label, offset=start)
+        for batch_index, (text, start, _) in enumerate(pieces)
+    ]
+
+
+# ---------------------------------------------------------------------------------
+#                      RECONSTRUCTION DES ENTITES D'UN TEXTE
+# ---------------------------------------------------------------------------------
+# Regroupe les jetons consécutifs non "O" en entités, avec leurs positions dans le texte d'origine.
+# offset = position du morceau tokenisé dans le texte d'origine (0 si le texte est entier).
+
+def _decode_entities(text: str, inputs, batch_index: int, predictions: List[int], id2label, offset: int = 0) -> List[Span]:
 
-    # Initialise la liste pour stocker les objets Entity détectés
+    # Initialise la liste pour stocker les Span détectés
     entities = [] 
     # Variable temporaire pour stocker l'entité en cours de construction (pour gérer les entités sur plusieurs jetons)
     current = None 
@@ -53,12 +178,12 @@ def detect_entities_general(text: str):
     # Itère sur les prédictions (un index par jeton).
     for idx, pred in enumerate(predictions): 
         # Convertit l'identifiant de la prédiction (ID) en son label de chaîne de caractères (ex: 0 -> 'O', 1 -> 'PER').
-        label = model.config.id2label[pred] 
+        label = id2label[pred] 
 
         # Récupère l'intervalle de caractères (position de début et de fin) dans le texte original correspondant au jeton actuel
-        char_span = inputs.token_to_chars(idx) 
+        char_span = inputs.token_to_chars(batch_index, idx) 
         if char_span is None:
-             # Ignore les jetons spéciaux qui n'ont pas d'intervalle de caractères dans le texte original
+             # Ignore les jetons spéciaux et de padding qui n'ont pas d'intervalle de caractères dans le texte original
             continue  
 
         # Si le jeton est une entité nommée 
@@ -68,42 +193,36 @@ def detect_entities_general(text: str):
                 # Initialise la nouvelle entité avec le label et les positions de début et de fin du jeton actuel
                 current = { 
                     "label": label,
-                    "start": char_span.start,
-                    "end": char_span.end,
+                    "start": offset + char_span.start,
+                    "end": offset + char_span.end,
                 }
             else:
                 # Si une entité est déjà en cours, étend sa fin jusqu'à la fin du jeton actuel
-                current["end"] = char_span.end 
+                current["end"] = offset + char_span.end 
 
         # Si le jeton est "O" (Outside) - marque la fin d'une entité.
         else: 
              # Si une entité était en cours de construction avant ce jeton "O"
             if current:
-                # Extrait le texte de l'entité dans la chaîne d'origine.
-                span_text = text[current["start"]:current["end"]] 
-                # Crée un objet Entity final et l'ajoute à la liste
-                entities.append(Entity(
-                    type=current["label"],
-                    value=span_text,
-                    start=current["start"],
-                    end=current["end"],
-                    confidence=1.0, # Confidence fixée à 1.0 par simplification 
-                    source="ml" # Indique que l'entité provient d'un modèle 
+                # Crée un Span final (positions dans la chaîne d'origine) et l'ajoute à la liste
+                entities.append(Span(
+                    current["label"],
+                    current["start"],
+                    current["end"],
+                    1.0, # Confidence fixée à 1.0 par simplification 
+                    "ml" # Indique que l'entité provient d'un modèle 
                 ))
                 current = None # Réinitialise 'current' pour commencer à chercher la prochaine entité
 
     # Si le texte se termine par une entité nommée (la boucle se termine avant d'atteindre un "O")
     if current: 
-        # Extrait le texte de l'entité.
-        span_text = text[current["start"]:current["end"]] 
-        # Crée et ajoute l'objet Entity final
-        entities.append(Entity(
-            type=current["label"],
-            value=span_text,
-            start=current["start"],
-            end=current["end"],
-            confidence=1.0,
-            source="ml"
+        # Crée et ajoute le Span final
+        entities.append(Span(
+            current["label"],
+            current["start"],
+            current["end"],
+            1.0,
+            "ml"
         ))
 
     return entities 
\ No newline at end of file
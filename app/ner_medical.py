@@ -1,11 +1,27 @@
-from typing import List, Optional
+import re
+import threading
+from typing import List, Optional, Tuple
 from gliner import GLiNER
 
-from app.models import Entity
+from app.models import Span, span_type
+from app.config import get_ner_medical_config
+from app.chunking import plan_windows, merge_window_entities
+from app.medical_gate import get_medical_gate
 
 MODEL_NAME = "almanach/camembert-bio-gliner-v0.1"
 
 _medical_model: Optional[GLiNER] = None
+_load_lock = threading.Lock()
+
+# Découpage en mots de GLiNER (WhitespaceTokenSplitter) : sa longueur maximale est exprimée en mots
+WORD_RE = re.compile(r"\w+(?:[-_]\w+)*|\S")
+
+# Valeurs par défaut si la section 'ner_medical' de settings.json est incomplète
+# (384 mots max pour GLiNER : la fenêtre laisse de la marge pour les labels et les sous-mots)
+DEFAULT_THRESHOLD = 0.5
+DEFAULT_WINDOW_WORDS = 256
+DEFAULT_STRIDE_WORDS = 32
+DEFAULT_CHUNK_BATCH_SIZE = 8
 
 BIOMED_LABELS = [
     "Patient",
@@ -22,56 +38,110 @@ BIOMED_LABELS = [
 def _load_medical_model() -> GLiNER:
     global _medical_model
     if _medical_model is None:
-        print("[NER-MEDICAL] Loading GLiNER medical model...")
-        _medical_model = GLiNER.from_pretrained(MODEL_NAME)
+        # Verrou : une requête arrivant pendant le préchargement (warmup.py) attend au lieu de recharger
+        with _load_lock:
+            if _medical_model is None:
+                print("[NER-MEDICAL] Loading GLiNER medical model...")
+                _medical_model = GLiNER.from_pretrained(MODEL_NAME)
     return _medical_model
 
 
-def detect_entities_medical(text: str) -> List[Entity]:
-    if not text or not text.strip():
-        return []
+def detect_entities_medical(text: str) -> List[Span]:
+    return detect_entities_medical_batch([text])[0]
+
+
+# ---------------------------------------------------------------------------------
+#                      DETECTION SUR UN LOT DE TEXTES
+# ---------------------------------------------------------------------------------
+# GLiNER tronque silencieusement les textes au-delà de sa longueur maximale (en mots) : les textes
+# longs sont découpés en fenêtres glissantes alignées sur les phrases (voir chunking.py), toutes
+# les fenêtres du lot passent dans batch_predict_entities par paquets de batch_size, puis les
+# entités sont ramenées en positions globales avec les offsets start/end renvoyés par GLiNER.
+# Un texte qui tient dans une fenêtre est traité tel quel.
+# Si la porte lexicale est active (medical_gate.py), seules les fenêtres avec un terme médical passent.
+
+def detect_entities_medical_batch(texts: List[str]) -> List[List[Span]]:
+    results: List[List[Span]] = [[] for _ in texts]
+
+    # Les textes vides ne passent pas par le modèle
+    indices = [i for i, text in enumerate(texts) if text and text.strip()]
+    if not indices:
+        return results
+
+    cfg = get_ner_medical_config()
+    chunking = cfg.get("chunking", {})
+    threshold = cfg.get("threshold", DEFAULT_THRESHOLD)
+    batch_size = chunking.get("batch_size", DEFAULT_CHUNK_BATCH_SIZE)
+
+    # Fenêtres de chaque texte, puis liste à plat (texte, début, fin) pour les passer en lots
+    windows = {i: _plan_text_windows(texts[i], chunking) for i in indices}
+    pieces = [(texts[i], start, end) for i in indices for start, end in windows[i]]
+
+    # Porte lexicale : les fenêtres sans terme médical ne passent pas par le modèle (sauf en mode shadow)
+    gate = get_medical_gate()
+    passed = [gate is None or gate.has_signal(text, start, end) for text, start, end in pieces]
+    selected = [k for k, ok in enumerate(passed) if ok or gate.shadow]
+
+    piece_entities: List[List[Span]] = [[] for _ in pieces]
+    if selected:
+        model = _load_medical_model()
+    for k in range(0, len(selected), batch_size):
+        batch = selected[k:k + batch_size]
+        raw_batches = model.batch_predict_entities(
+            [text[start:end] for text, start, end in (pieces[j] for j in batch)],
+            BIOMED_LABELS,
+            threshold=threshold,
+            flat_ner=True,
+        )
+        for j, raw_entities in zip(batch, raw_batches):
+            text, start, _ = pieces[j]
+            piece_entities[j] = _to_entities(text, raw_entities, offset=start)
 
-    model = _load_medical_model()
+    if gate is not None:
+        gate.record([len(windows[i]) for i in indices], passed, piece_entities)
 
-    raw_entities = model.predict_entities(
-        text,
-        BIOMED_LABELS,
-        threshold=0.5,
-        flat_ner=True,
-    )
+    # Regroupe les entités par texte et fusionne les recouvrements
+    cursor = 0
+    for i in indices:
+        count = len(windows[i])
+        results[i] = merge_window_entities(windows[i], piece_entities[cursor:cursor + count])
+        cursor += count
 
-    entities: List[Entity] = []
-    lower_text = text.lower()
-    used_pos = 0
+    return results
 
-    for ent in raw_entities:
-        span = ent.get("text", "").strip()
-        label = ent.get("label", "Medical")
-        if not span:
-            continue
 
-        span_lower = span.lower()
+# Fenêtres (début, fin) en caractères d'un texte, planifiées sur les mots tels que GLiNER les découpe.
+def _plan_text_windows(text: str, chunking: dict) -> List[Tuple[int, int]]:
+    if not chunking.get("enabled", False):
+        return [(0, len(text))]
+    offsets = [m.span() for m in WORD_RE.finditer(text)]
+    return plan_windows(
+        text,
+        offsets,
+        chunking.get("window_words", DEFAULT_WINDOW_WORDS),
+        chunking.get("stride_words", DEFAULT_STRIDE_WORDS),
+    )
 
-        start = lower_text.find(span_lower, used_pos)
-        if start == -1:
-            start = lower_text.find(span_lower)
-            if start == -1:
-                continue
 
-        end = start + len(span)
-        used_pos = end
+# Convertit les prédictions GLiNER d'un morceau en entités, en positions du texte complet.
+# offset = position du morceau dans le texte complet.
+def _to_entities(text: str, raw_entities: List[dict], offset: int = 0) -> List[Span]:
+    entities: List[Span] = []
 
-        ent_type = f"MED_{label.upper()}"
-        confidence = float(ent.get("score", 0.9))
+    for ent in raw_entities:
+        start = offset + ent["start"]
+        end = offset + ent["end"]
+        if end <= start:
+            continue
+        label = ent.get("label", "Medical")
 
         entities.append(
-            Entity(
-                type=ent_type,
-                value=text[start:end],
-                start=start,
-                end=end,
-                confidence=confidence,
-                source="ml", 
+            Span(
+                span_type(f"MED_{label.upper()}"),
+                start,
+                end,
+                float(ent.get("score", 0.9)),
+                "ml",
             )
         )
 
@@ -0,0 +1,250 @@
+# ------------------------------------------------------------------------------------------------------------------------------------------------------------------
+# MODULE : OCR
+# Description : OCR (Tesseract) des images et des pages PDF scannées, sur un pool borné.
+#
+# Objectif :
+#  - Plus d'OCR sur l'image pleine résolution dans le thread de la requête : les pages sont
+#    prétraitées (réduction à une résolution cible, niveaux de gris, binarisation) puis envoyées
+#    à tesseract en parallèle, sans dépasser le nombre de workers configuré.
+#  - TIFF multi-pages : chaque page est OCRisée.
+#  - PDF scannés : les pages sans couche texte sont rendues en image puis OCRisées.
+#
+# Remarque :
+#  - pytesseract lance un processus tesseract par page : un pool de threads suffit (le GIL est
+#    relâché pendant l'attente du processus). OMP_THREAD_LIMIT=1 évite que chaque tesseract
+#    lance lui-même plusieurs threads quand plusieurs pages sont traitées en parallèle.
+#  - PDFium n'est pas thread-safe : le rendu des pages PDF est sérialisé, seul l'OCR est parallèle.
+#  - Configuration : section 'ocr' de settings.json.
+# ------------------------------------------------------------------------------------------------------------------------------------------------------------------
+
+import io
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import BinaryIO, Dict, List, Optional, Sequence, Tuple, Union
+
+import pytesseract
+import pypdfium2 as pdfium
+from PIL import Image, ImageSequence
+
+from app.config import get_ocr_config
+
+# Valeurs par défaut si la section 'ocr' de settings.json est incomplète
+DEFAULT_LANG = "fra"
+DEFAULT_TARGET_DPI = 300
+DEFAULT_MAX_PIXELS = 25_000_000
+# workers = 0 : moitié des coeurs, au plus max_workers (chaque worker uvicorn a son propre pool,
+# et chaque thread lance un processus tesseract)
+DEFAULT_MAX_OCR_WORKERS = 4
+
+# Résultat de l'OCR d'une page : (texte, secondes)
+PageOCR = Tuple[str, float]
+
+_pool: Optional[ThreadPoolExecutor] = None
+_pool_lock = threading.Lock()
+_pdfium_lock = threading.Lock()
+
+
+# ---------------------------------------------------------------------------------
+#                      POOL OCR
+# ---------------------------------------------------------------------------------
+
+def _ocr_workers(cfg: Dict[str, object]) -> int:
+    max_workers = cfg.get("max_workers") or DEFAULT_MAX_OCR_WORKERS
+    return cfg.get("workers") or min(max_workers, max(1, (os.cpu_count() or 1) // 2))
+
+
+def get_ocr_pool() -> ThreadPoolExecutor:
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                cfg = get_ocr_config()
+                workers = _ocr_workers(cfg)
+                if workers > 1:
+                    os.environ.setdefault("OMP_THREAD_LIMIT", "1")
+                _pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="ocr")
+    return _pool
+
+
+def shutdown_ocr_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=True)
+            _pool = None
+
+
+# ---------------------------------------------------------------------------------
+#                      PRETRAITEMENT
+# ---------------------------------------------------------------------------------
+# Réduit l'image à la résolution cible, passe en niveaux de gris puis binarise (seuil d'Otsu
+# ou seuil fixe). Tesseract est plus rapide et souvent plus fiable sur une image propre en N&B.
+
+def preprocess_image(image: Image.Image, cfg: Optional[Dict[str, object]] = None) -> Image.Image:
+    cfg = cfg if cfg is not None else get_ocr_config()
+
+    # 1) Résolution : on ne garde pas plus de target_dpi (ni plus de max_pixels au total)
+    target_dpi = cfg.get("target_dpi", DEFAULT_TARGET_DPI)
+    dpi = image.info.get("dpi", (0, 0))[0] or 0
+    scale = 1.0
+    if target_dpi and dpi > target_dpi:
+        scale = target_dpi / float(dpi)
+    max_pixels = cfg.get("max_pixels", DEFAULT_MAX_PIXELS)
+    if max_pixels and image.width * image.height * scale * scale > max_pixels:
+        scale = (max_pixels / float(image.width * image.height)) ** 0.5
+    if scale < 1.0:
+        size = (max(1, int(image.width * scale)), max(1, int(image.height * scale)))
+        image = image.resize(size, Image.LANCZOS)
+
+    # 2) Niveaux de gris
+    if cfg.get("grayscale", True) and image.mode != "L":
+        image = image.convert("L")
+
+    # 3) Binarisation (seuil 0 -> seuil d'Otsu calculé sur l'histogramme)
+    if cfg.get("binarize", True) and image.mode == "L":
+        threshold = cfg.get("threshold", 0) or _otsu_threshold(image.histogram())
+        image = image.point(lambda v: 255 if v > threshold else 0, mode="1")
+
+    return image
+
+
+def _otsu_threshold(histogram: Sequence[int]) -> int:
+    total = sum(histogram)
+    if not total:
+        return 127
+    sum_all = sum(i * h for i, h in enumerate(histogram))
+    sum_bg = 0.0
+    weight_bg = 0
+    best, best_var = 127, -1.0
+    for i, h in enumerate(histogram):
+        weight_bg += h
+        if weight_bg == 0:
+            continue
+        weight_fg = total - weight_bg
+        if weight_fg == 0:
+            break
+        sum_bg += i * h
+        mean_bg = sum_bg / weight_bg
+        mean_fg = (sum_all - sum_bg) / weight_fg
+        var = weight_bg * weight_fg * (mean_bg - mean_fg) ** 2
+        if var > best_var:
+            best, best_var = i, var
+    return best
+
+
+# ---------------------------------------------------------------------------------
+#                      OCR D'UNE PAGE
+# ---------------------------------------------------------------------------------
+
+def _ocr_page(image: Image.Image, cfg: Dict[str, object]) -> PageOCR:
+    t0 = time.perf_counter()
+    prepared = preprocess_image(image, cfg)
+    text = pytesseract.image_to_string(
+        prepared,
+        lang=cfg.get("lang", DEFAULT_LANG),
+        config=cfg.get("tesseract_config", ""),
+    )
+    return text, time.perf_counter() - t0
+
+
+def _ocr_pdf_page(source: Union[bytes, BinaryIO], index: int, cfg: Dict[str, object]) -> PageOCR:
+    t0 = time.perf_counter()
+    image = render_pdf_page(source, index, cfg.get("pdf_render_dpi", DEFAULT_TARGET_DPI))
+    text, _ = _ocr_page(image, cfg)
+    return text, time.perf_counter() - t0
+
+
+# Rend une page PDF (index à partir de 0) en image, à la résolution demandée.
+# source : octets du PDF ou fichier ouvert (sa position courante est restaurée après le rendu).
+def render_pdf_page(source: Union[bytes, BinaryIO], index: int, dpi: int) -> Image.Image:
+    position = None if isinstance(source, (bytes, bytearray)) else source.tell()
+    with _pdfium_lock:
+        document = pdfium.PdfDocument(source if position is None else _ReadIntoStream(source))
+        try:
+            page = document[index]
+            image = page.render(scale=dpi / 72.0, grayscale=True).to_pil()
+            page.close()
+        finally:
+            document.close()
+            if position is not None:
+                source.seek(position)
+    return image
+
+
+# PDFium lit les fichiers via readinto(), absent de SpooledTemporaryFile (upload FastAPI) avant Python 3.11.
+class _ReadIntoStream:
+
+    def __init__(self, source: BinaryIO):
+        self._source = source
+
+    def seek(self, offset: int, whence: int = 0) -> int:
+        return self._source.seek(offset, whence)
+
+    def tell(self) -> int:
+        return self._source.tell()
+
+    def read(self, size: int = -1) -> bytes:
+        return self._source.read(size)
+
+    def readinto(self, buffer) -> int:
+        data = self._source.read(len(buffer))
+        buffer[:len(data)] = data
+        return len(data)
+
+
+# OCR d'une seule page PDF (streaming page par page), dans le thread appelant.
+def ocr_pdf_page(source: Union[bytes, BinaryIO], index: int) -> PageOCR:
+    return _ocr_pdf_page(source, index, get_ocr_config())
+
+
+# ---------------------------------------------------------------------------------
+#                      API DU MODULE
+# ---------------------------------------------------------------------------------
+# OCR d'une image (toutes les pages pour un TIFF multi-pages), pages traitées en parallèle.
+#  Returns:
+#      - (liste de (texte, secondes) par page, image de la première page -> métadonnées)
+
+def ocr_image_bytes(content: bytes) -> Tuple[List[PageOCR], Image.Image]:
+    cfg = get_ocr_config()
+    image = Image.open(io.BytesIO(content))
+    max_frames = cfg.get("max_frames", 0)
+
+    frames: List[Image.Image] = []
+    for i, frame in enumerate(ImageSequence.Iterator(image)):
+        if max_frames and i >= max_frames:
+            break
+        # copy() : la frame courante est détachée du fichier (l'itérateur réutilise l'objet)
+        frame_copy = frame.copy()
+        frame_copy.info.setdefault("dpi", image.info.get("dpi", (0, 0)))
+        frames.append(frame_copy)
+
+    if len(frames) == 1:
+        return [_ocr_page(frames[0], cfg)], image
+    pool = get_ocr_pool()
+    futures = [pool.submit(_ocr_page, frame, cfg) for frame in frames]
+    return [f.result() for f in futures], image
+
+
+# OCR des pages d'un PDF sans couche texte (index à partir de 0), en parallèle.
+#  Returns:
+#      - {index: (texte, secondes)}
+
+def ocr_pdf_pages(content: bytes, indexes: Sequence[int]) -> Dict[int, PageOCR]:
+    cfg = get_ocr_config()
+    if not indexes:
+        return {}
+    if len(indexes) == 1:
+        return {indexes[0]: _ocr_pdf_page(content, indexes[0], cfg)}
+    pool = get_ocr_pool()
+    futures = {i: pool.submit(_ocr_pdf_page, content, i, cfg) for i in indexes}
+    return {i: f.result() for i, f in futures.items()}
+
+
+# Une page sans couche texte (ou presque) est considérée comme scannée.
+def needs_ocr(page_text: str, cfg: Optional[Dict[str, object]] = None) -> bool:
+    cfg = cfg if cfg is not None else get_ocr_config()
+    if not cfg.get("pdf_fallback", True):
+        return False
+    return len(page_text.strip()) < cfg.get("pdf_min_chars", 10)
@@ -0,0 +1,142 @@
+# ------------------------------------------------------------------------------------------------------------------------------------------------------------------
+# MODULE : PROJECTION
+# Description : Résultat interne du pipeline et construction de la réponse JSON, réduite à ce que l'appelant demande.
+#
+# Objectif :
+#  - Un gros document renvoie un texte désensibilisé de la taille de l'entrée et une entité (avec sa valeur)
+#    par élément détecté : la réponse complète est plus lourde que l'entrée. Un appelant qui n'a besoin
+#    que de la décision, ou du texte masqué, ne paie plus le reste.
+#  - Paramètres de requête (/sanitize, /sanitize-batch, /sanitize-file, /sanitize-file-stream) :
+#      - entities = "full" (défaut, réponse inchangée) | "positions" (sans les valeurs)
+#                   | "counts" (entities_count + types_count) | "none"
+#      - include_text = true (défaut) | false (pas de sanitized_text, le masquage n'est même pas calculé)
+#    Décision seule : ?entities=none&include_text=false
+#  - Sérialisation rapide : les champs lourds sont construits en listes / dictionnaires simples à partir
+#    des Span et sérialisés en une passe par pydantic-core (to_json), sans modèle Pydantic par entité
+#    ni jsonable_encoder.
+#
+# Remarque :
+#  - Le pipeline renvoie un PipelineResult (texte analysé, décision, score, Span, métadonnées) ; la projection
+#    est appliquée au dernier moment : le cache garde le résultat complet, quelle que soit la vue demandée.
+#  - La vue "full" produit exactement le JSON de SanitizeResponse (mêmes champs, même ordre).
+# ------------------------------------------------------------------------------------------------------------------------------------------------------------------
+
+from dataclasses import dataclass
+from typing import Any, Dict, List, Literal, Optional, Sequence, get_args
+
+from pydantic_core import to_json
+from starlette.responses import JSONResponse
+
+from app.masking_engine import apply_masking
+from app.metrics import stage_timer
+from app.models import SanitizeResponse, Span, to_entities
+
+EntityView = Literal["full", "positions", "counts", "none"]
+ENTITY_VIEWS = get_args(EntityView)
+
+
+# ---------------------------------------------------------------------------------
+#                      VUE DEMANDEE
+# ---------------------------------------------------------------------------------
+
+@dataclass(frozen=True)
+class ResponseView:
+    entities: EntityView = "full"
+    include_text: bool = True
+
+    def __post_init__(self):
+        if self.entities not in ENTITY_VIEWS:
+            raise ValueError(f"Unknown entities view '{self.entities}' (expected one of {ENTITY_VIEWS}).")
+
+
+FULL_VIEW = ResponseView()
+
+
+# ---------------------------------------------------------------------------------
+#                      RESULTAT INTERNE DU PIPELINE
+# ---------------------------------------------------------------------------------
+# Le texte désensibilisé est calculé à la première lecture (étape "masking" des métriques).
+
+class PipelineResult:
+    __slots__ = ("text", "decision", "risk_score", "spans", "metadata", "_sanitized_text")
+
+    def __init__(self, text: str, decision: str, risk_score: float, spans: List[Span], metadata: Dict[str, Any],
+                 sanitized_text: Optional[str] = None):
+        self.text = text
+        self.decision = decision
+        self.risk_score = risk_score
+        self.spans = spans
+        self.metadata = metadata
+        self._sanitized_text = sanitized_text
+
+    @property
+    def sanitized_text(self) -> str:
+        if self._sanitized_text is None:
+            with stage_timer("masking"):
+                self._sanitized_text = apply_masking(self.text, self.spans, self.decision)
+        return self._sanitized_text
+
+    # Modèle Pydantic complet (même contenu que la vue "full")
+    def to_response(self) -> SanitizeResponse:
+        return SanitizeResponse(
+            sanitized_text=self.sanitized_text,
+            decision=self.decision,
+            risk_score=self.risk_score,
+            entities=to_entities(self.text, self.spans),
+            metadata=self.metadata,
+        )
+
+
+# ---------------------------------------------------------------------------------
+#                      PROJECTION
+# ---------------------------------------------------------------------------------
+
+def types_count(spans: Sequence[Span]) -> Dict[str, int]:
+    counts: Dict[str, int] = {}
+    for span in spans:
+        counts[span.type] = counts.get(span.type, 0) + 1
+    return counts
+
+
+# Champs d'entités d'une réponse (ou d'une page en streaming) selon la vue.
+def project_entities(text: str, spans: Sequence[Span], view: ResponseView) -> Dict[str, Any]:
+    if view.entities == "full":
+        return {"entities": [span.to_dict(text) for span in spans]}
+    if view.entities == "positions":
+        return {"entities": [
+            {"type": s.type, "start": s.start, "end": s.end, "confidence": s.confidence, "source": s.source}
+            for s in spans
+        ]}
+    if view.entities == "counts":
+        return {"entities_count": len(spans), "types_count": types_count(spans)}
+    return {}
+
+
+def project(result: PipelineResult, view: ResponseView = FULL_VIEW) -> Dict[str, Any]:
+    payload: Dict[str, Any] = {}
+    if view.include_text:
+        payload["sanitized_text"] = result.sanitized_text
+    payload["decision"] = result.decision
+    payload["risk_score"] = result.risk_score
+    payload.update(project_entities(result.text, result.spans, view))
+    payload["metadata"] = result.metadata
+    return payload
+
+
+# ---------------------------------------------------------------------------------
+#                      SERIALISATION
+# ---------------------------------------------------------------------------------
+# Réponse JSON sérialisée par pydantic-core (compact, UTF-8 sans échappement, comme JSONResponse).
+
+class FastJSONResponse(JSONResponse):
+
+    def render(self, content: Any) -> bytes:
+        return to_json(content)
+
+
+def render_result(result: PipelineResult, view: ResponseView = FULL_VIEW) -> FastJSONResponse:
+    return FastJSONResponse(project(result, view))
+
+
+def render_results(results: Sequence[PipelineResult], view: ResponseView = FULL_VIEW) -> FastJSONResponse:
+    return FastJSONResponse({"results": [project(result, view) for result in results]})
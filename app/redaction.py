@@ -0,0 +1,312 @@
+# ------------------------------------------------------------------------------------------------------------------------------------------------------------------
+# MODULE : REDACTION
+# Description : Fichier masqué renvoyé par /sanitize-file?output=file : le document d'origine, entités masquées
+#               dans le fichier lui-même, au lieu du texte extrait.
+#
+# Objectif :
+#  - DOCX : texte des runs réécrit sur place (jetons <TYPE_MASKED>), mise en forme conservée ; parties XML
+#    lues dans le zip d'entrée et écrites dans le zip de sortie en flux (docx_stream.redact_docx), sans DOM.
+#  - PDF : chaque page est rendue en image, les entités y sont recouvertes d'un rectangle noir, puis les pages
+#    sont écrites une à une dans un nouveau PDF (images JPEG).
+#  - Sortie dans un fichier temporaire (SpooledTemporaryFile : sur disque au-delà de spool_max_bytes),
+#    renvoyée par morceaux.
+#
+# Remarque :
+#  - PDF rastérisé : un rectangle dessiné au-dessus de la couche texte laisserait le texte sélectionnable
+#    et extractible. Sans bibliothèque capable de retirer les objets texte du flux de contenu (PyMuPDF,
+#    pikepdf : non installées), la page est rendue en image ; le PDF masqué n'a donc plus de couche texte.
+#  - Emplacement des entités dans un PDF : chaque valeur détectée est recherchée (casse et espaces ignorés)
+#    dans les caractères de la page (pdfplumber) ; toutes ses occurrences sont masquées. Page sans couche
+#    texte (scannée) ou contenant des images : recherche aussi dans les mots reconnus par Tesseract sur
+#    l'image rendue. Valeur trouvée dans aucune page : PDF refusé (RedactionRefused), jamais renvoyé avec
+#    une entité visible.
+#  - DOCX avec objets incorporés (word/embeddings) : refusé (RedactionRefused), leur contenu n'étant pas
+#    analysé.
+#  - Configuration : section 'redaction' de settings.json.
+# ------------------------------------------------------------------------------------------------------------------------------------------------------------------
+
+import io
+import tempfile
+import zipfile
+from typing import BinaryIO, Dict, Iterator, List, Optional, Sequence, Set, Tuple
+
+import pdfplumber
+import pypdfium2 as pdfium
+import pytesseract
+from PIL import Image, ImageDraw
+
+from app.config import get_ocr_config, get_redaction_config
+from app.docx_stream import extract_docx, redact_docx
+from app.ocr import DEFAULT_LANG, _pdfium_lock
+from app.projection import PipelineResult
+
+DEFAULT_PDF_DPI = 150
+DEFAULT_JPEG_QUALITY = 80
+DEFAULT_BOX_PADDING = 1.0 # points (1/72 de pouce)
+DEFAULT_MIN_VALUE_CHARS = 2
+DEFAULT_SPOOL_MAX_BYTES = 8 * 1024 * 1024
+
+READ_CHUNK_SIZE = 64 * 1024
+
+MEDIA_TYPES = {
+    "docx": "application/vnd.openxmlformats-officedocument.wordprocessingml.document",
+    "pdf": "application/pdf",
+}
+
+# Rectangle (x0, haut, x1, bas) en fraction de la largeur / hauteur de la page
+Box = Tuple[float, float, float, float]
+
+
+class RedactionUnsupported(ValueError):
+    pass
+
+
+# Masquage impossible à garantir pour ce fichier (rien n'est renvoyé, comme pour BLOCK)
+class RedactionRefused(RuntimeError):
+    pass
+
+
+# ---------------------------------------------------------------------------------
+#                      DOCX
+# ---------------------------------------------------------------------------------
+
+def _redact_docx(content: bytes, result: PipelineResult, out: BinaryIO):
+    extracted = extract_docx(content)
+    # Positions des entités valables pour ce texte uniquement (même extraction que l'ingestion)
+    if extracted.text != result.text:
+        raise RuntimeError("DOCX text differs from the analysed text: entity positions cannot be mapped")
+    # Objets incorporés (classeurs, OLE) : contenu non extrait, donc jamais analysé
+    with zipfile.ZipFile(io.BytesIO(content)) as zf:
+        if any(name.startswith("word/embeddings/") for name in zf.namelist()):
+            raise RedactionRefused("le document contient des objets incorporés, non analysés")
+    redact_docx(content, extracted.text_map, result.spans, out)
+
+
+# ---------------------------------------------------------------------------------
+#                      PDF : RECHERCHE DES ENTITES DANS LA PAGE
+# ---------------------------------------------------------------------------------
+
+def _normalize(char: str) -> str:
+    lowered = char.lower()
+    return lowered if len(lowered) == 1 else char
+
+
+# Valeurs détectées, sans espaces ni casse (une entité peut être coupée en fin de ligne dans la page).
+def entity_values(result: PipelineResult, min_chars: int = DEFAULT_MIN_VALUE_CHARS) -> Set[str]:
+    values = set()
+    for s in result.spans:
+        value = "".join(_normalize(c) for c in result.text[s.start:s.end] if not c.isspace())
+        if len(value) >= min_chars:
+            values.add(value)
+    return values
+
+
+# Rectangles des occurrences de chaque valeur dans une suite de caractères (chaque caractère avec son rectangle).
+# found : complété avec les valeurs trouvées au moins une fois.
+def find_boxes(chars: Sequence[Tuple[str, Box]], values: Set[str], found: Optional[Set[str]] = None) -> List[Box]:
+    letters = "".join(c for c, _ in chars)
+    hits = [False] * len(letters)
+    for value in values:
+        start = letters.find(value)
+        if start >= 0 and found is not None:
+            found.add(value)
+        while start >= 0:
+            for i in range(start, start + len(value)):
+                hits[i] = True
+            start = letters.find(value, start + 1)
+    return [chars[i][1] for i, hit in enumerate(hits) if hit]
+
+
+# Caractères de la couche texte (hors espaces), rectangles en fraction de la page.
+def _text_layer_chars(page) -> List[Tuple[str, Box]]:
+    x0, top, _, _ = page.bbox
+    width, height = float(page.width), float(page.height)
+    chars = []
+    for c in page.chars:
+        text = c.get("text", "")
+        for char in text:
+            if char.isspace():
+                continue
+            chars.append((_normalize(char), (
+                (c["x0"] - x0) / width, (c["top"] - top) / height,
+                (c["x1"] - x0) / width, (c["bottom"] - top) / height,
+            )))
+    return chars
+
+
+# Caractères reconnus par Tesseract (page scannée) : chaque lettre d'un mot prend une part égale de son rectangle.
+def _ocr_chars(image: Image.Image) -> List[Tuple[str, Box]]:
+    cfg = get_ocr_config()
+    data = pytesseract.image_to_data(
+        image,
+        lang=cfg.get("lang", DEFAULT_LANG),
+        config=cfg.get("tesseract_config", ""),
+        output_type=pytesseract.Output.DICT,
+    )
+    width, height = float(image.width), float(image.height)
+    chars = []
+    for word, left, top, w, h in zip(data["text"], data["left"], data["top"], data["width"], data["height"]):
+        letters = [c for c in word if not c.isspace()]
+        for i, char in enumerate(letters):
+            step = w / len(letters)
+            chars.append((_normalize(char), (
+                (left + i * step) / width, top / height, (left + (i + 1) * step) / width, (top + h) / height,
+            )))
+    return chars
+
+
+# ---------------------------------------------------------------------------------
+#                      PDF : ECRITURE PAGE PAR PAGE
+# ---------------------------------------------------------------------------------
+# PDF minimal : une image JPEG (DCTDecode) par page, objets écrits au fil de l'eau ; seule la table des
+# positions (xref) reste en mémoire. Objets 1 (catalogue) et 2 (arbre des pages) écrits à la fin.
+
+class ImagePdfWriter:
+
+    def __init__(self, out: BinaryIO):
+        self._out = out
+        self._start = out.tell()
+        self._offsets: Dict[int, int] = {}
+        self._pages: List[int] = []
+        self._next = 3
+        self._out.write(b"%PDF-1.4\n%\xe2\xe3\xcf\xd3\n")
+
+    def _object(self, number: int, body: bytes, stream: bytes = None):
+        self._offsets[number] = self._out.tell() - self._start
+        self._out.write(b"%d 0 obj\n" % number + body)
+        if stream is not None:
+            self._out.write(b"\nstream\n")
+            self._out.write(stream)
+            self._out.write(b"\nendstream")
+        self._out.write(b"\nendobj\n")
+
+    def _reserve(self) -> int:
+        self._next += 1
+        return self._next - 1
+
+    # jpeg : image de la page ; width / height : taille de la page en points
+    def add_page(self, jpeg: bytes, pixels: Tuple[int, int], mode: str, width: float, height: float):
+        image, content, page = self._reserve(), self._reserve(), self._reserve()
+        colorspace = b"/DeviceGray" if mode == "L" else b"/DeviceRGB"
+        self._object(image, b"<< /Type /XObject /Subtype /Image /Width %d /Height %d /ColorSpace %s "
+                            b"/BitsPerComponent 8 /Filter /DCTDecode /Length %d >>"
+                     % (pixels[0], pixels[1], colorspace, len(jpeg)), jpeg)
+        draw = b"q %.2f 0 0 %.2f 0 0 cm /Im0 Do Q" % (width, height)
+        self._object(content, b"<< /Length %d >>" % len(draw), draw)
+        self._object(page, b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 %.2f %.2f] "
+                           b"/Resources << /XObject << /Im0 %d 0 R >> >> /Contents %d 0 R >>"
+                     % (width, height, image, content))
+        self._pages.append(page)
+
+    def close(self):
+        kids = b" ".join(b"%d 0 R" % p for p in self._pages)
+        self._object(2, b"<< /Type /Pages /Kids [%s] /Count %d >>" % (kids, len(self._pages)))
+        self._object(1, b"<< /Type /Catalog /Pages 2 0 R >>")
+        xref = self._out.tell() - self._start
+        self._out.write(b"xref\n0 %d\n0000000000 65535 f \n" % self._next)
+        for number in range(1, self._next):
+            self._out.write(b"%010d 00000 n \n" % self._offsets[number])
+        self._out.write(b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (self._next, xref))
+
+
+# ---------------------------------------------------------------------------------
+#                      PDF
+# ---------------------------------------------------------------------------------
+
+def _render_page(document, index: int, dpi: int) -> Tuple[Image.Image, float, float]:
+    with _pdfium_lock:
+        page = document[index]
+        try:
+            image = page.render(scale=dpi / 72.0).to_pil()
+            # Taille en points de la page (rotation appliquée, comme le rendu)
+            width, height = page.get_size()
+        finally:
+            page.close()
+    return image, width, height
+
+
+def _redact_pdf(content: bytes, result: PipelineResult, out: BinaryIO, cfg: Dict[str, object]):
+    dpi = int(cfg.get("pdf_dpi", DEFAULT_PDF_DPI))
+    quality = int(cfg.get("jpeg_quality", DEFAULT_JPEG_QUALITY))
+    padding = float(cfg.get("box_padding", DEFAULT_BOX_PADDING))
+    values = entity_values(result, int(cfg.get("min_value_chars", DEFAULT_MIN_VALUE_CHARS)))
+
+    found: Set[str] = set()
+
+    writer = ImagePdfWriter(out)
+    with _pdfium_lock:
+        document = pdfium.PdfDocument(content)
+    try:
+        with pdfplumber.open(io.BytesIO(content)) as plumber:
+            for index, page in enumerate(plumber.pages):
+                chars = _text_layer_chars(page)
+                has_images = bool(page.images)
+                # Libère les objets pdfminer de la page (pas d'accumulation sur un long document)
+                page.close()
+                image, width, height = _render_page(document, index, dpi)
+                boxes = find_boxes(chars, values, found)
+                # Page scannée, ou texte dans une image à côté de la couche texte : recherche dans l'OCR aussi
+                if values and (not chars or has_images):
+                    boxes += find_boxes(_ocr_chars(image), values, found)
+
+                if image.mode not in ("RGB", "L"):
+                    image = image.convert("RGB")
+                draw = ImageDraw.Draw(image)
+                pad_x, pad_y = padding / width * image.width, padding / height * image.height
+                for x0, top, x1, bottom in boxes:
+                    draw.rectangle(
+                        (x0 * image.width - pad_x, top * image.height - pad_y,
+                         x1 * image.width + pad_x, bottom * image.height + pad_y),
+                        fill=0,
+                    )
+                jpeg = io.BytesIO()
+                image.save(jpeg, "JPEG", quality=quality)
+                writer.add_page(jpeg.getvalue(), image.size, image.mode, width, height)
+    finally:
+        with _pdfium_lock:
+            document.close()
+    # Valeur introuvable dans toutes les pages (texte mal extrait, OCR illisible) : rien n'est renvoyé
+    missing = values - found
+    if missing:
+        raise RedactionRefused(f"{len(missing)} entité(s) non localisée(s) dans le PDF")
+    writer.close()
+
+
+# ---------------------------------------------------------------------------------
+#                      API DU MODULE
+# ---------------------------------------------------------------------------------
+# Fichier masqué (décision MASK) pour un DOCX ou un PDF déjà analysé.
+#  Args:
+#      - content: octets du fichier d'origine.
+#      - source_type: 'docx' ou 'pdf' (RedactionUnsupported sinon).
+#      - result: résultat du pipeline sur le texte extrait de ce fichier.
+#  Returns:
+#      - Fichier temporaire positionné au début (à fermer par l'appelant).
+
+def redact_file(content: bytes, source_type: str, result: PipelineResult) -> BinaryIO:
+    if source_type not in MEDIA_TYPES:
+        raise RedactionUnsupported(source_type)
+    cfg = get_redaction_config()
+    out = tempfile.SpooledTemporaryFile(max_size=int(cfg.get("spool_max_bytes", DEFAULT_SPOOL_MAX_BYTES)))
+    try:
+        if source_type == "docx":
+            _redact_docx(content, result, out)
+        else:
+            _redact_pdf(content, result, out, cfg)
+    except BaseException:
+        out.close()
+        raise
+    out.seek(0)
+    return out
+
+
+# Contenu d'un fichier par morceaux, fichier fermé à la fin (corps d'une StreamingResponse).
+def iter_file(source: BinaryIO, chunk_size: int = READ_CHUNK_SIZE) -> Iterator[bytes]:
+    try:
+        while True:
+            chunk = source.read(chunk_size)
+            if not chunk:
+                return
+            yield chunk
+    finally:
+        source.close()
@@ -0,0 +1,250 @@
+# ------------------------------------------------------------------------------------------------------------------------------------------------------------------
+# MODULE : RESULT CACHE
+# Description : Cache des résultats du pipeline (LRU + TTL), adressé par le contenu, avec regroupement
+#               des requêtes identiques en cours de calcul.
+#
+# Objectif :
+#  - Une même invite ou une même pièce jointe renvoyée plusieurs fois ne repasse pas par l'OCR ni
+#    par les deux modèles NER.
+#  - Clé = SHA-256 des octets d'entrée (+ nom / type du fichier) + version de la configuration :
+#    une mise à jour des poids (/config/weights) rend les anciennes entrées inaccessibles.
+#  - Plusieurs requêtes identiques simultanées partagent un seul calcul (un "leader" calcule,
+#    les autres attendent son résultat).
+#
+# Remarque :
+#  - Par défaut (store_raw_text = false) le cache ne garde AUCUN texte : ni l'entrée, ni les valeurs
+#    des entités, ni le texte désensibilisé. Il garde la décision, le score, les positions des
+#    entités et les métadonnées ; la réponse est reconstruite à partir du texte de la requête
+#    (masquage = un parcours du texte). Pour un fichier, le texte est ré-extrait (ingestion) mais
+#    les modèles NER ne sont pas relancés.
+#  - store_raw_text = true garde aussi le texte extrait : un fichier déjà vu ne repasse même plus
+#    par l'ingestion / l'OCR.
+#  - Le cache est uniquement en mémoire (rien n'est écrit sur disque).
+# ------------------------------------------------------------------------------------------------------------------------------------------------------------------
+
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Tuple
+
+from app.models import Span
+from app.projection import PipelineResult
+
+# Valeurs par défaut si la section 'cache' de settings.json est incomplète
+DEFAULT_MAX_ENTRIES = 10_000
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+DEFAULT_TTL_SECONDS = 3600
+
+# Coût mémoire estimé d'une entité et d'une entrée (hors textes)
+_SPAN_BYTES = 120
+_ENTRY_BYTES = 400
+
+
+# ---------------------------------------------------------------------------------
+#                      ENTREE DU CACHE
+# ---------------------------------------------------------------------------------
+# Résultat du pipeline sans texte brut : (type, début, fin, confiance, source) par entité.
+
+@dataclass
+class CachedResult:
+    decision: str
+    risk_score: float
+    spans: List[Tuple[str, int, int, float, str]]
+    metadata: Dict[str, object]
+    # Texte extrait (uniquement si store_raw_text est activé)
+    raw_text: Optional[str] = None
+    size: int = field(default=0)
+    expires_at: float = field(default=0.0)
+
+
+# Construit l'entrée de cache d'un résultat du pipeline.
+def entry_from_result(result: PipelineResult, raw_text: str, store_raw_text: bool) -> CachedResult:
+    entry = CachedResult(
+        decision=result.decision,
+        risk_score=result.risk_score,
+        spans=[(e.type, e.start, e.end, e.confidence, e.source) for e in result.spans],
+        metadata=dict(result.metadata),
+        raw_text=raw_text if store_raw_text else None,
+    )
+    entry.size = _ENTRY_BYTES + _SPAN_BYTES * len(entry.spans) + (len(raw_text) * 2 if store_raw_text else 0)
+    return entry
+
+
+# Reconstruit le résultat complet à partir de l'entrée et du texte d'origine
+# (texte désensibilisé recalculé seulement si la vue demandée le contient).
+def result_from_entry(entry: CachedResult, text: str) -> PipelineResult:
+    return PipelineResult(
+        text=text,
+        decision=entry.decision,
+        risk_score=entry.risk_score,
+        spans=[Span(*span) for span in entry.spans],
+        metadata=dict(entry.metadata),
+    )
+
+
+# ---------------------------------------------------------------------------------
+#                      CACHE LRU + TTL
+# ---------------------------------------------------------------------------------
+
+class ResultCache:
+
+    def __init__(self, max_entries: int = DEFAULT_MAX_ENTRIES, max_bytes: int = DEFAULT_MAX_BYTES,
+                 ttl_seconds: float = DEFAULT_TTL_SECONDS, store_raw_text: bool = False):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self.store_raw_text = store_raw_text
+
+        self._entries: "OrderedDict[str, CachedResult]" = OrderedDict()
+        self._inflight: Dict[str, Future] = {}
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+        # Compteurs (exposés par stats())
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    # Clé : SHA-256 de l'entrée et de ses attributs + version de configuration.
+    @staticmethod
+    def make_key(kind: str, payload: bytes, config_version: int, *parts: Optional[str]) -> str:
+        h = hashlib.sha256()
+        h.update(kind.encode())
+        for part in parts:
+            h.update(b"\0" + (part or "").encode("utf-8", errors="ignore"))
+        h.update(b"\0")
+        h.update(payload)
+        return f"{config_version}:{h.hexdigest()}"
+
+    # Cherche une entrée ; sinon rejoint le calcul en cours ou en devient le leader.
+    #  Returns:
+    #      - (entrée, None, False) : trouvée dans le cache.
+    #      - (None, future, False) : calcul identique en cours -> attendre future.
+    #      - (None, future, True)  : l'appelant calcule puis appelle complete(), fail() ou abandon().
+    def begin(self, key: str) -> Tuple[Optional[CachedResult], Optional[Future], bool]:
+        with self._lock:
+            entry = self._get_locked(key)
+            if entry is not None:
+                self.hits += 1
+                return entry, None, False
+            future = self._inflight.get(key)
+            if future is not None:
+                self.coalesced += 1
+                return None, future, False
+            self.misses += 1
+            future = Future()
+            self._inflight[key] = future
+            return None, future, True
+
+    # Le leader publie son résultat : stocké dans le cache et transmis aux requêtes en attente.
+    def complete(self, key: str, entry: CachedResult):
+        with self._lock:
+            self._put_locked(key, entry)
+            future = self._inflight.pop(key, None)
+        if future is not None:
+            future.set_result(entry)
+
+    # Le leader a échoué : les requêtes en attente reçoivent la même erreur, rien n'est stocké.
+    def fail(self, key: str, error: BaseException):
+        with self._lock:
+            future = self._inflight.pop(key, None)
+        if future is not None:
+            future.set_exception(error)
+
+    # Le leader a été annulé : les requêtes en attente reçoivent None et relancent le calcul elles-mêmes.
+    def abandon(self, key: str):
+        with self._lock:
+            future = self._inflight.pop(key, None)
+        if future is not None:
+            future.set_result(None)
+
+    # Lecture simple (sans regroupement), ex: lot de textes.
+    def get(self, key: str) -> Optional[CachedResult]:
+        with self._lock:
+            entry = self._get_locked(key)
+            if entry is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+            return entry
+
+    def put(self, key: str, entry: CachedResult):
+        with self._lock:
+            self._put_locked(key, entry)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self) -> Dict[str, object]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_entries": self.max_entries,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "coalesced": self.coalesced,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+                "inflight": len(self._inflight),
+            }
+
+    def _get_locked(self, key: str) -> Optional[CachedResult]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if entry.expires_at <= time.monotonic():
+            self._remove_locked(key)
+            self.expirations += 1
+            return None
+        # LRU : l'entrée lue devient la plus récente
+        self._entries.move_to_end(key)
+        return entry
+
+    def _put_locked(self, key: str, entry: CachedResult):
+        # Une entrée plus grosse que le cache entier n'est pas stockée
+        if entry.size > self.max_bytes:
+            return
+        if key in self._entries:
+            self._remove_locked(key)
+        entry.expires_at = time.monotonic() + self.ttl_seconds
+        self._entries[key] = entry
+        self._bytes += entry.size
+        # Éviction des entrées les moins récemment utilisées
+        while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+            oldest = next(iter(self._entries))
+            self._remove_locked(oldest)
+            self.evictions += 1
+
+    def _remove_locked(self, key: str):
+        entry = self._entries.pop(key)
+        self._bytes -= entry.size
+
+
+# Instance unique par processus (créée au premier usage)
+_cache: Optional[ResultCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_result_cache(cfg: Dict[str, object]) -> ResultCache:
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = ResultCache(
+                    max_entries=cfg.get("max_entries", DEFAULT_MAX_ENTRIES),
+                    max_bytes=cfg.get("max_bytes", DEFAULT_MAX_BYTES),
+                    ttl_seconds=cfg.get("ttl_seconds", DEFAULT_TTL_SECONDS),
+                    store_raw_text=cfg.get("store_raw_text", False),
+                )
+    return _cache
@@ -1,59 +1,164 @@
 # ------------------------------------------------------------------------------------------------------------------------------------------------------------------
 # RULES_ENGINE.PY
-# Description : 
+# Description : Détection des données sensibles par expressions régulières (settings.json -> rules_engine)
 #
+# Remarque :
+#   - Les patterns sont compilés UNE fois par configuration (plus de re.compile à chaque requête) et
+#     recompilés uniquement quand la section 'rules_engine' change (rechargement à chaud de settings.json).
+#   - Préfiltre optionnel par pattern ("prefilter": liste de littéraux) : si aucun littéral n'est présent
+#     dans le texte, le pattern n'est pas exécuté (ex: EMAIL sans '@').
+#   - Moteur par pattern ("engine": "regex" par défaut, ou "re") : `regex` trouve très vite les patterns
+#     à préfixe littéral (\bFR..., REF...), `re` est plus rapide sur ceux qui commencent par une classe
+#     de caractères (EMAIL). Voir benchmarks/bench_rules.py.
+#   - Stratégie "separate" (défaut) : un parcours par pattern, résultats identiques à l'ancienne boucle.
+#     Stratégie "combined" : une seule regex r0|r1|... (un seul parcours, sans chevauchement, le premier
+#     pattern de la configuration l'emporte). L'alternative désactive la recherche de préfixe littéral :
+#     elle n'est intéressante que pour de nombreux petits patterns sans préfixe.
 # ------------------------------------------------------------------------------------------------------------------------------------------------------------------
 
-import re 
-from typing import List 
-# Import la classe Entity -> pour les entités détectées.
-from app.models import Entity
-# Import la fonction qui charge les patterns regex depuis le fichier de configuration `settings.json`
-from app.config import get_rule_patterns 
+import re
+import threading
+from typing import Any, Dict, List, Optional, Tuple
 
-# Chargement dynamique des patterns
-PATTERNS = get_rule_patterns() 
+import regex
+# Import la classe Span -> représentation interne des entités détectées.
+from app.models import Span, span_type
+# Import de l'instantané de configuration (patterns regex et stratégie de `settings.json`)
+from app.config import ConfigSnapshot, get_snapshot, register_snapshot_builder
+
+# Moteurs de regex utilisables par pattern
+ENGINES = {"regex": regex, "re": re}
+
+STRATEGIES = ("separate", "combined")
+
+
+# ---------------------------------------------------------------------------------
+#                      PATTERNS COMPILES
+# ---------------------------------------------------------------------------------
+# Patterns d'une configuration, compilés une fois. Les regex combinées (stratégie "combined")
+# sont compilées par sous-ensemble de patterns actifs après préfiltre, au premier usage.
+
+class CompiledRules:
+
+    def __init__(self, patterns: List[Dict[str, Any]], strategy: str = "separate"):
+        if strategy not in STRATEGIES:
+            raise ValueError(f"Unknown rules strategy '{strategy}'. Expected one of {STRATEGIES}.")
+        self.source = patterns
+        self.strategy = strategy
+        self.key = _rules_key(patterns, strategy)
+        self.types: List[str] = [span_type(p["type"]) for p in patterns]
+        self.prefilters: List[Tuple[str, ...]] = [tuple(p.get("prefilter", ())) for p in patterns]
+
+        # Compile chaque pattern : une erreur désigne le pattern fautif
+        self.compiled = []
+        for p in patterns:
+            engine = p.get("engine", "regex")
+            if engine not in ENGINES:
+                raise ValueError(f"Unknown regex engine '{engine}' for rule '{p['type']}'.")
+            try:
+                self.compiled.append(ENGINES[engine].compile(p["regex"]))
+            except (re.error, regex.error) as e:
+                raise ValueError(f"Invalid regex for rule '{p['type']}': {e}")
+
+        self._combined: Dict[Tuple[int, ...], Any] = {}
+        self._lock = threading.Lock()
+
+    # Indices des patterns dont le préfiltre est satisfait par le texte.
+    def active_patterns(self, text: str) -> Tuple[int, ...]:
+        return tuple(
+            i for i, literals in enumerate(self.prefilters)
+            if not literals or any(literal in text for literal in literals)
+        )
+
+    # Regex combinée pour les patterns actifs : un groupe nommé r<i> par pattern.
+    def combined(self, active: Tuple[int, ...]):
+        compiled = self._combined.get(active)
+        if compiled is None:
+            with self._lock:
+                compiled = self._combined.get(active)
+                if compiled is None:
+                    compiled = regex.compile("|".join(f"(?P<r{i}>{self.source[i]['regex']})" for i in active))
+                    self._combined[active] = compiled
+        return compiled
+
+    # Parcourt le texte et renvoie les correspondances (indice du pattern, match).
+    def finditer(self, text: str):
+        active = self.active_patterns(text)
+        if not active:
+            return
+        if self.strategy == "combined":
+            # Un seul parcours : le groupe nommé r<i> qui a correspondu donne le pattern
+            for m in self.combined(active).finditer(text):
+                yield int(m.lastgroup[1:]), m
+        else:
+            # Un parcours par pattern actif, dans l'ordre de la configuration
+            for i in active:
+                for m in self.compiled[i].finditer(text):
+                    yield i, m
+
+
+def _rules_key(patterns: List[Dict[str, Any]], strategy: str) -> tuple:
+    return strategy, tuple(
+        (p["type"], p["regex"], tuple(p.get("prefilter", ())), p.get("engine", "regex")) for p in patterns
+    )
+
+
+# ---------------------------------------------------------------------------------
+#                      RECUPERATION DES PATTERNS COMPILES
+# ---------------------------------------------------------------------------------
+# Les règles compilées font partie de l'instantané de configuration (voir config.py) : compilées à la
+# publication d'une nouvelle configuration (une regex invalide la fait refuser), réutilisées telles
+# quelles si les patterns n'ont pas changé (ex: mise à jour des poids).
+
+def _build_rules(data: Dict[str, Any], previous: Optional[CompiledRules]) -> CompiledRules:
+    section = data["rules_engine"]
+    patterns = section["patterns"]
+    strategy = section.get("strategy", "separate")
+    if previous is not None and previous.key == _rules_key(patterns, strategy):
+        return previous
+    return CompiledRules(patterns, strategy)
+
+
+register_snapshot_builder("rules", _build_rules)
+
+
+def get_compiled_rules(snapshot: Optional[ConfigSnapshot] = None) -> CompiledRules:
+    return (snapshot or get_snapshot()).derived("rules")
 
 
 #---------------------------------------------------------------------------------
-#                                INGESTION FICHIERS 
+#                                DETECTION
 # ---------------------------------------------------------------------------------
-# Fonction pour appliquer un ensemble de regex au texte pour détecter des entités sensibles
-#    Args: 
-#        text: Texte brut à analyser. 
+# Fonction pour appliquer l'ensemble des regex au texte pour détecter des entités sensibles
+#    Args:
+#        text: Texte brut à analyser.
+#        snapshot: instantané de configuration de la requête (courant par défaut).
 #
-#    Returns: 
-#       Liste d'objets Entity représentant les éléments détectés. # Le format de sortie.
+#    Returns:
+#       Liste de Span (type, début, fin, confiance, source) représentant les éléments détectés.
+
+def detect_entities(text: str, snapshot: Optional[ConfigSnapshot] = None) -> List[Span]:
 
-def detect_entities(text: str) -> List[Entity]: 
+    rules = get_compiled_rules(snapshot)
+    types = rules.types
 
     # Liste qui stockera toutes les entités sensibles trouvées
-    entities: List[Entity] = [] 
-
-    # Boucle sur chaque pattern chargé dynamiquement depuis la configuration -> dictionnaire avec 'type' et 'regex'
-    for pattern_data in PATTERNS: 
-        # Extrait le type logique de l'entité (ex: BANK_IBAN)
-        entity_type = pattern_data["type"] 
-        # Extrait l'expression régulière (la chaîne de caractères brute).
-        pattern = pattern_data["regex"] 
-        
-        # Compilation de la regex en un objet pattern (pour améliorer les performances)
-        compiled_pattern = re.compile(pattern) 
-
-        # Cherche toutes les occurrences du pattern dans le texte
-        for m in compiled_pattern.finditer(text): 
-            # Ajoute une nouvelle entité à la liste
-            entities.append( 
-                # Crée un nouvel objet Entity.
-                Entity( 
-                    type=entity_type, # Utilise le type de la configuration
-                    value=m.group(0), # TXT exacte qui a correspondu à la regex
-                    start=m.start(), #  index de début de la correspondance 
-                    end=m.end(), # index de fin (exclu) de la correspondance dans le texte
-                    confidence=0.99, # score de confiance élevé et fixe ( Pour le moment )
-                    source="rules", # Marque l'entité comme provenant du moteur de règles
-                ) 
-            ) 
+    entities: List[Span] = []
+
+    # Parcourt les correspondances des patterns actifs (préfiltre appliqué)
+    for i, m in rules.finditer(text):
+        # Ajoute une nouvelle entité à la liste
+        start, end = m.span()
+        entities.append(
+            # Crée un nouvel objet Span (la valeur exacte est relue dans le texte à la sortie du pipeline).
+            Span(
+                types[i], # Type du pattern qui a correspondu
+                start, #  index de début de la correspondance
+                end, # index de fin (exclu) de la correspondance dans le texte
+                0.99, # score de confiance élevé et fixe ( Pour le moment )
+                "rules", # Marque l'entité comme provenant du moteur de règles
+            )
+        )
 
     # Retourne la liste des entités détectées par les règles
-    return entities 
\ No newline at end of file
+    return entities
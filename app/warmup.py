@@ -0,0 +1,194 @@
+# ------------------------------------------------------------------------------------------------------------------------------------------------------------------
+# MODULE : WARMUP
+# Description : Chargement des modèles au démarrage, inférences de chauffe et état de disponibilité (/ready).
+#
+# Objectif :
+#  - La première vraie requête ne paie plus le chargement des modèles (plusieurs secondes) :
+#    camembert-ner et GLiNER sont chargés dans le lifespan de l'application.
+#  - Quelques inférences de chauffe sur des longueurs représentatives (texte court, moyen, long
+#    découpé en fenêtres, lot) initialisent les noyaux, allocations et caches des deux moteurs.
+#  - /ready indique l'état de chaque modèle (pending / loading / warming / ready / error / lazy) et ses temps.
+#
+# Remarque :
+#  - Section 'startup' de settings.json :
+#      - preload  : charger au démarrage (sinon chargement paresseux à la première requête).
+#      - blocking : true -> le serveur n'accepte pas de requête avant la fin du chargement ;
+#                   false -> chargement en arrière-plan, /health répond, /ready renvoie 503 jusqu'à la fin.
+#      - warmup_lengths : longueurs (en caractères) des textes de chauffe.
+#  - Le chargement et la chauffe passent par le pool des détecteurs (mêmes threads, même réglage
+#    des threads torch que les requêtes).
+#  - Mode "server" (section 'inference') : le worker ne charge aucun modèle ; l'état affiché par /ready
+#    est celui du serveur d'inférence partagé, relu jusqu'à ce que ses modèles soient prêts
+#    ("unavailable" tant que le serveur ne répond pas).
+# ------------------------------------------------------------------------------------------------------------------------------------------------------------------
+
+import threading
+import time
+from typing import Callable, Dict, List, Optional
+
+from app.config import get_startup_config, get_batching_config
+from app.metrics import register_callback
+from app.executor import get_executor, apply_torch_threads
+from app.ner_general_hf import _load_model, detect_entities_general_batch
+from app.ner_medical import _load_medical_model, detect_entities_medical_batch
+from app.rules_engine import get_compiled_rules
+from app.inference_client import InferenceUnavailable, get_inference_client, is_remote
+
+# Valeurs par défaut si la section 'startup' de settings.json est incomplète
+DEFAULT_WARMUP_LENGTHS = [64, 512, 4096]
+
+# Mode "server" : intervalle entre deux lectures de l'état des modèles du serveur d'inférence
+REMOTE_POLL_SECONDS = 1.0
+
+# Texte de chauffe (français, avec des entités des deux modèles)
+WARMUP_SAMPLE = (
+    "Le patient Jean Dupont, né le 12/03/1975 à Lyon, est suivi au CHU de Bordeaux pour un diabète "
+    "de type 2 et une hypertension. Il prend de la metformine 1000 mg deux fois par jour. "
+    "Contact : jean.dupont@example.fr, 06 12 34 56 78. "
+)
+
+MODELS = ("general", "medical")
+
+# État de chaque modèle, lu par /ready
+_states: Dict[str, Dict[str, object]] = {
+    name: {"state": "pending", "load_seconds": None, "warmup_seconds": None, "error": None} for name in MODELS
+}
+_states_lock = threading.Lock()
+
+
+def _set_state(name: str, **values):
+    with _states_lock:
+        _states[name].update(values)
+
+
+def get_model_states() -> Dict[str, Dict[str, object]]:
+    with _states_lock:
+        return {name: dict(state) for name, state in _states.items()}
+
+
+def is_ready() -> bool:
+    with _states_lock:
+        return all(state["state"] in ("ready", "lazy") for state in _states.values())
+
+
+def warmup_texts(lengths: List[int]) -> List[str]:
+    texts = []
+    for length in lengths:
+        repeated = WARMUP_SAMPLE * (length // len(WARMUP_SAMPLE) + 1)
+        texts.append(repeated[:length])
+    return texts
+
+
+# ---------------------------------------------------------------------------------
+#                      CHARGEMENT + CHAUFFE D'UN MODELE
+# ---------------------------------------------------------------------------------
+
+def _prepare_model(name: str, load: Callable[[], object], infer: Callable[[List[str]], object],
+                   texts: List[str], batch_size: int, warmup: bool):
+    # Mêmes threads torch que les requêtes, mais hors des métriques des étapes
+    apply_torch_threads(name)
+    try:
+        _set_state(name, state="loading", error=None)
+        t0 = time.perf_counter()
+        load()
+        _set_state(name, load_seconds=round(time.perf_counter() - t0, 3))
+
+        if warmup:
+            _set_state(name, state="warming")
+            t0 = time.perf_counter()
+            # Une inférence par longueur (le texte long passe par le découpage en fenêtres) ...
+            for text in texts:
+                infer([text])
+            # ... puis un lot complet de textes courts (forme des lots du micro-batcher)
+            infer(texts[:1] * batch_size)
+            _set_state(name, warmup_seconds=round(time.perf_counter() - t0, 3))
+
+        _set_state(name, state="ready")
+        print(f"[WARMUP] {name} ready: {get_model_states()[name]}")
+    except Exception as e:
+        _set_state(name, state="error", error=str(e))
+        print(f"[WARMUP] {name} failed: {e}")
+
+
+# Charge (et chauffe) les deux modèles en parallèle, puis compile les règles.
+# Bloquant : à appeler hors de la boucle asynchrone.
+
+def preload_models(warmup: Optional[bool] = None):
+    cfg = get_startup_config()
+    if warmup is None:
+        warmup = cfg.get("warmup", True)
+    texts = warmup_texts(cfg.get("warmup_lengths", DEFAULT_WARMUP_LENGTHS))
+    batch_size = get_batching_config().get("max_batch_size", 16)
+
+    get_compiled_rules()
+    executor = get_executor()
+    futures = [
+        executor.submit(_prepare_model, "general", _load_model, detect_entities_general_batch,
+                        texts, batch_size, warmup),
+        executor.submit(_prepare_model, "medical", _load_medical_model, detect_entities_medical_batch,
+                        texts, batch_size, warmup),
+    ]
+    for future in futures:
+        future.result()
+
+
+# Mode "server" : recopie l'état des modèles du serveur d'inférence jusqu'à ce qu'ils soient prêts.
+
+def wait_remote_models():
+    get_compiled_rules()
+    while True:
+        try:
+            states = get_inference_client().model_states()
+        except InferenceUnavailable as e:
+            for name in MODELS:
+                _set_state(name, state="unavailable", error=str(e))
+        else:
+            for name in MODELS:
+                _set_state(name, **states.get(name, {"state": "error", "error": "unknown model"}))
+            if is_ready():
+                print(f"[WARMUP] inference server ready: {get_model_states()}")
+                return
+        time.sleep(REMOTE_POLL_SECONDS)
+
+
+# Lance le préchargement selon la section 'startup' (appelé par le lifespan de main.py).
+#  Returns:
+#      - Thread de chargement en arrière-plan (blocking = false), sinon None.
+
+def start_preload() -> Optional[threading.Thread]:
+    cfg = get_startup_config()
+    if is_remote():
+        # Modèles chargés par le serveur d'inférence partagé ; clé partagée absente : refus au démarrage
+        get_inference_client()
+        if cfg.get("blocking", False):
+            wait_remote_models()
+            return None
+        thread = threading.Thread(target=wait_remote_models, name="model-preload", daemon=True)
+        thread.start()
+        return thread
+    if not cfg.get("preload", True):
+        # Chargement paresseux : les modèles seront chargés par la première requête
+        for name in MODELS:
+            _set_state(name, state="lazy")
+        return None
+    if cfg.get("blocking", False):
+        preload_models()
+        return None
+    thread = threading.Thread(target=preload_models, name="model-preload", daemon=True)
+    thread.start()
+    return thread
+
+
+# État des modèles exposé dans /metrics
+def _model_metrics():
+    for name, state in get_model_states().items():
+        yield (name,), 1.0 if state["state"] in ("ready", "lazy") else 0.0
+
+
+def _model_load_metrics():
+    for name, state in get_model_states().items():
+        yield (name,), state["load_seconds"]
+
+
+register_callback("desens_model_ready", "1 si le modèle est chargé et chauffé.", ("model",), _model_metrics)
+register_callback("desens_model_load_seconds", "Durée de chargement du modèle.", ("model",), _model_load_metrics)
@@ -0,0 +1,132 @@
+# ------------------------------------------------------------------------------------------------------------------------------------------------------------------
+# BENCHMARK : EXTRACTION DOCX
+# Description : Compare l'ancienne extraction (python-docx : modèle objet complet, document.paragraphs seulement)
+#               à l'extraction en flux de app/docx_stream.py sur des DOCX synthétiques de plusieurs centaines de pages
+#               (paragraphes, tableaux, en-têtes et pieds de page) : temps, pic mémoire, texte extrait, et
+#               entités trouvées par les règles dans ce texte (couverture).
+#
+# Utilisation (depuis la racine du projet) :
+#   python -m benchmarks.bench_docx
+#   python -m benchmarks.bench_docx --pages 100 500 --repeat 3
+#
+# Remarque :
+#  - Pic mémoire mesuré dans un processus neuf par extraction (pic RSS - RSS avant l'appel) : l'arbre lxml
+#    de python-docx est alloué en C, invisible pour tracemalloc.
+#  - Un IBAN dans un tableau de chaque page et un numéro de compte dans l'en-tête : entités que
+#    l'ancienne extraction ne voyait pas.
+# ------------------------------------------------------------------------------------------------------------------------------------------------------------------
+
+import argparse
+import io
+import multiprocessing as mp
+import time
+from typing import Callable, Dict, Tuple
+
+from app.rules_engine import detect_entities
+from benchmarks.corpus import make_corpus
+
+# Environ une page A4 de texte courant
+CHARS_PER_PAGE = 3_000
+PARAGRAPH_CHARS = 400
+
+
+def make_docx(pages: int, seed: int = 42) -> bytes:
+    import docx
+    document = docx.Document()
+    section = document.sections[0]
+    section.header.paragraphs[0].text = "Relevé de compte FR7630006000011234567890189"
+    section.footer.paragraphs[0].text = "Service client : service.client@banque-exemple.fr"
+    text, _ = make_corpus(pages * CHARS_PER_PAGE, seed=seed)
+    page_chars = 0
+    for start in range(0, len(text), PARAGRAPH_CHARS):
+        document.add_paragraph(text[start:start + PARAGRAPH_CHARS])
+        page_chars += PARAGRAPH_CHARS
+        if page_chars >= CHARS_PER_PAGE:
+            page_chars = 0
+            table = document.add_table(rows=2, cols=2)
+            table.cell(0, 0).text = "Titulaire"
+            table.cell(0, 1).text = "Jean Dupont"
+            table.cell(1, 0).text = "IBAN"
+            table.cell(1, 1).text = "FR7610278060000002028010172"
+    buffer = io.BytesIO()
+    document.save(buffer)
+    return buffer.getvalue()
+
+
+# Ancienne implémentation de ingestion._ingest_docx
+def legacy_extract(content: bytes) -> str:
+    import docx
+    document = docx.Document(io.BytesIO(content))
+    return "\n".join(t for t in (p.text for p in document.paragraphs) if t)
+
+
+def stream_extract(content: bytes) -> str:
+    from app.docx_stream import extract_docx
+    return extract_docx(content).text
+
+
+EXTRACTORS: Dict[str, Callable[[bytes], str]] = {"python-docx": legacy_extract, "stream": stream_extract}
+
+
+def _rss_kb(field: str) -> int:
+    with open("/proc/self/status") as f:
+        for line in f:
+            if line.startswith(field + ":"):
+                return int(line.split()[1])
+    return 0
+
+
+def _peak_child(name: str, content: bytes, out):
+    import docx  # noqa: F401  (imports hors mesure)
+    from app import docx_stream  # noqa: F401
+    before = _rss_kb("VmRSS")
+    EXTRACTORS[name](content)
+    out.put(_rss_kb("VmHWM") - before)
+
+
+# Pic mémoire (Ko) d'une extraction, dans un processus neuf (Linux : /proc/self/status).
+def peak_memory_kb(name: str, content: bytes) -> int:
+    ctx = mp.get_context("spawn")
+    out = ctx.Queue()
+    proc = ctx.Process(target=_peak_child, args=(name, content, out))
+    proc.start()
+    peak = out.get(timeout=600)
+    proc.join()
+    return peak
+
+
+def _best_of(fn: Callable[[], object], repeat: int) -> Tuple[float, object]:
+    best, result = float("inf"), None
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - t0)
+    return best, result
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark de l'extraction DOCX (python-docx / flux).")
+    parser.add_argument("--pages", type=int, nargs="+", default=[100, 300])
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--no-memory", action="store_true", help="ne pas mesurer le pic mémoire (plus rapide)")
+    args = parser.parse_args(argv)
+
+    print(f"{'pages':>6} {'docx KB':>8} {'extractor':>12} {'ms':>9} {'speedup':>8} {'peak MB':>8} "
+          f"{'chars':>9} {'entities':>9} {'IBAN':>5}")
+    for pages in args.pages:
+        content = make_docx(pages)
+        legacy_time = None
+        for name, extract in EXTRACTORS.items():
+            elapsed, text = _best_of(lambda: extract(content), args.repeat)
+            legacy_time = legacy_time or elapsed
+            entities = detect_entities(text)
+            ibans = sum(1 for e in entities if e.type == "BANK_IBAN")
+            peak = "" if args.no_memory else f"{peak_memory_kb(name, content) / 1024:.1f}"
+            print(
+                f"{pages:>6} {len(content) / 1024:>8.0f} {name:>12} {elapsed * 1000:>9.1f} "
+                f"{legacy_time / elapsed:>7.2f}x {peak:>8} {len(text):>9} {len(entities):>9} {ibans:>5}"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+# ------------------------------------------------------------------------------------------------------------------------------------------------------------------
+# BENCHMARK : ENTITY FUSION
+# Description : Compare la fusion indexée (tri + bisect, N sources) à l'ancienne fusion
+#               (chaque entité ML comparée à chaque entité de règles, O(n·m)).
+#
+# Utilisation (depuis la racine du projet) :
+#   python -m benchmarks.bench_fusion
+#   python -m benchmarks.bench_fusion --entities 1000 10000 50000
+#
+# Remarque :
+#  - Entités synthétiques réparties sur trois sources (rules / general / medical), avec ~20 %
+#    de chevauchements entre sources, comme un relevé bancaire dense.
+# ------------------------------------------------------------------------------------------------------------------------------------------------------------------
+
+import argparse
+import random
+import time
+from typing import Dict, List
+
+from app.entity_fusion import fuse_sources
+from app.models import Span
+
+
+def make_sources(n: int, seed: int = 42) -> Dict[str, List[Span]]:
+    rng = random.Random(seed)
+    sources: Dict[str, List[Span]] = {"rules": [], "general": [], "medical": []}
+    names = list(sources)
+    pos = 0
+    for _ in range(n):
+        # ~20 % des entités recouvrent la précédente
+        if rng.random() > 0.2:
+            pos += rng.randint(20, 60)
+        length = rng.randint(4, 30)
+        name = rng.choice(names)
+        sources[name].append(Span(
+            "BANK_IBAN" if name == "rules" else "PER",
+            pos, pos + length,
+            0.99 if name == "rules" else rng.random(),
+            "rules" if name == "rules" else "ml",
+        ))
+    return sources
+
+
+# Ancienne implémentation : règles prioritaires, chaque entité ML comparée à toutes les règles.
+def legacy_fuse(rule_entities: List[Span], ml_entities: List[Span]) -> List[Span]:
+    fused: List[Span] = list(rule_entities)
+    for ml_ent in ml_entities:
+        overlaps = False
+        for rule_ent in rule_entities:
+            if not (ml_ent.end <= rule_ent.start or ml_ent.start >= rule_ent.end):
+                overlaps = True
+                break
+        if not overlaps:
+            fused.append(ml_ent)
+    return fused
+
+
+def _overlaps(entities: List[Span]) -> int:
+    ordered = sorted(entities, key=lambda e: e.start)
+    return sum(1 for a, b in zip(ordered, ordered[1:]) if b.start < a.end)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark de la fusion d'entités.")
+    parser.add_argument("--entities", type=int, nargs="+", default=[1_000, 10_000])
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args(argv)
+
+    print(f"{'entities':>9} {'legacy (ms)':>12} {'indexed (ms)':>13} {'speedup':>8} {'legacy overlaps':>16} {'indexed overlaps':>17}")
+    for n in args.entities:
+        sources = make_sources(n)
+        ml = sources["general"] + sources["medical"]
+
+        t0 = time.perf_counter()
+        for _ in range(args.repeat):
+            legacy = legacy_fuse(sources["rules"], ml)
+        legacy_time = (time.perf_counter() - t0) / args.repeat
+
+        t0 = time.perf_counter()
+        for _ in range(args.repeat):
+            indexed = fuse_sources(sources, priority=["rules", "general", "medical"])
+        indexed_time = (time.perf_counter() - t0) / args.repeat
+
+        print(
+            f"{n:>9} {legacy_time * 1000:>12.2f} {indexed_time * 1000:>13.2f} {legacy_time / indexed_time:>7.1f}x "
+            f"{_overlaps(legacy):>16} {_overlaps(indexed):>17}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,163 @@
+# ------------------------------------------------------------------------------------------------------------------------------------------------------------------
+# BENCHMARK : MEMOIRE PAR WORKER (MODELES LOCAUX / SERVEUR D'INFERENCE PARTAGE)
+# Description : Lance N processus workers (démarrage "spawn", comme uvicorn --workers) qui exécutent la détection ML,
+#               d'abord avec les modèles chargés dans chaque worker (inference.mode = "local"), puis avec un
+#               serveur d'inférence partagé (inference.mode = "server", voir app/inference_server.py), et compare
+#               la mémoire de chaque processus une fois tous les workers actifs.
+#
+# Utilisation (depuis la racine du projet) :
+#   python -m benchmarks.bench_inference_memory
+#   python -m benchmarks.bench_inference_memory --workers 2 4 8 --stand-in-mb 1100
+#   python -m benchmarks.bench_inference_memory --models real          # vrais modèles (téléchargement / cache HF)
+#
+# Remarque :
+#  - Sans réseau : modèles de substitution de benchmarks/run.py, plus un bloc mémoire de --stand-in-mb Mo
+#    écrit au "chargement" pour tenir lieu des poids (camembert-ner fp32 + GLiNER : environ 1,1 Go).
+#  - RSS compte aussi les pages partagées (bibliothèques) dans chaque processus ; PSS (smaps_rollup, Linux)
+#    les répartit entre les processus qui les partagent : la colonne "total PSS" est la mémoire réelle du pod.
+# ------------------------------------------------------------------------------------------------------------------------------------------------------------------
+
+import argparse
+import multiprocessing as mp
+import os
+import secrets
+import tempfile
+import time
+from typing import Dict, List, Optional, Tuple
+
+from app.inference_client import DEFAULT_AUTHKEY_ENV
+from benchmarks.corpus import make_corpus
+
+MODES = ("local", "server")
+
+
+# Mémoire d'un processus (Mo) : (RSS, PSS) ; PSS = None hors Linux récent.
+def process_memory(pid: int) -> Tuple[float, Optional[float]]:
+    values: Dict[str, float] = {}
+    try:
+        with open(f"/proc/{pid}/smaps_rollup") as f:
+            for line in f:
+                key, _, rest = line.partition(":")
+                if key in ("Rss", "Pss"):
+                    values[key] = int(rest.split()[0]) / 1024
+    except OSError:
+        import resource
+        # Repli (macOS...) : pic RSS du processus courant seulement
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, None
+    return values.get("Rss", 0.0), values.get("Pss")
+
+
+# "Chargement" des modèles dans le processus courant.
+#  Returns:
+#      - Objet à garder en vie (bloc tenant lieu des poids), None avec les vrais modèles.
+def load_models(models: str, stand_in_mb: int):
+    if models == "real":
+        from app.warmup import preload_models
+        preload_models(warmup=False)
+        return None
+    from benchmarks.run import install_stand_ins
+    install_stand_ins()
+    # Pages réellement écrites (un bloc alloué sans être écrit ne serait pas résident)
+    return bytearray(b"\x01") * (stand_in_mb * 1024 * 1024)
+
+
+def _use_mode(mode: str, address: str):
+    from app.config import get_config, publish_config, thaw
+    cfg = thaw(get_config())
+    cfg.setdefault("inference", {}).update({"mode": mode, "socket_path": address})
+    publish_config(cfg)
+
+
+def _server_main(address: str, models: str, stand_in_mb: int, ready, stop):
+    _use_mode("local", address)
+    weights = load_models(models, stand_in_mb)
+    from app.inference_client import authkey
+    from app.inference_server import InferenceServer
+    server = InferenceServer(address, authkey())
+    server.start()
+    ready.set()
+    stop.wait()
+    server.close()
+    del weights
+
+
+def _worker_main(mode: str, address: str, models: str, stand_in_mb: int, texts: List[str], done, stop):
+    _use_mode(mode, address)
+    weights = load_models(models, stand_in_mb) if mode == "local" else None
+    from app.batching import detect_entities_ml_batch
+    entities = 0
+    for _ in range(3):
+        entities = sum(len(g) + len(m) for g, m in detect_entities_ml_batch(texts))
+    done.put((os.getpid(), entities))
+    stop.wait()
+    del weights
+
+
+# Returns:
+#     - (mémoire de chaque worker, mémoire du serveur ou None, entités détectées par lot)
+def run_mode(mode: str, workers: int, models: str, stand_in_mb: int, texts: List[str]):
+    ctx = mp.get_context("spawn")
+    stop = ctx.Event()
+    done = ctx.Queue()
+    address = os.path.join(tempfile.mkdtemp(prefix="desens-bench-"), "inference.sock")
+    # Clé partagée (obligatoire en mode "server"), héritée par les processus lancés
+    os.environ.setdefault(DEFAULT_AUTHKEY_ENV, secrets.token_hex(16))
+    server = None
+    try:
+        if mode == "server":
+            ready = ctx.Event()
+            server = ctx.Process(target=_server_main, args=(address, models, stand_in_mb, ready, stop))
+            server.start()
+            if not ready.wait(600):
+                raise RuntimeError("inference server did not start")
+
+        procs = [
+            ctx.Process(target=_worker_main, args=(mode, address, models, stand_in_mb, texts, done, stop))
+            for _ in range(workers)
+        ]
+        for p in procs:
+            p.start()
+        results = [done.get(timeout=600) for _ in procs]
+
+        # Mesure avec tous les processus vivants (pages partagées réparties entre eux)
+        worker_memory = [process_memory(pid) for pid, _ in results]
+        server_memory = process_memory(server.pid) if server is not None else None
+        return worker_memory, server_memory, results[0][1]
+    finally:
+        stop.set()
+        for p in mp.active_children():
+            p.join(30)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark de la mémoire par worker (modèles locaux / serveur partagé).")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--models", choices=("stand-in", "real"), default="stand-in")
+    parser.add_argument("--stand-in-mb", type=int, default=300,
+                        help="taille du bloc tenant lieu des poids (modèles de substitution)")
+    parser.add_argument("--texts", type=int, default=16, help="textes par lot de détection")
+    parser.add_argument("--size", type=int, default=2_000, help="taille de chaque texte (caractères)")
+    args = parser.parse_args(argv)
+
+    texts = [make_corpus(args.size, seed=i)[0] for i in range(args.texts)]
+
+    print(f"{'mode':>7} {'workers':>8} {'worker RSS (MB)':>16} {'worker PSS (MB)':>16} "
+          f"{'server PSS (MB)':>16} {'total PSS (MB)':>15} {'entities':>9}")
+    for workers in args.workers:
+        for mode in MODES:
+            t0 = time.perf_counter()
+            worker_memory, server_memory, entities = run_mode(mode, workers, args.models, args.stand_in_mb, texts)
+            rss = sum(m[0] for m in worker_memory) / len(worker_memory)
+            pss_values = [m[1] for m in worker_memory]
+            pss = sum(pss_values) / len(pss_values) if None not in pss_values else float("nan")
+            server_pss = server_memory[1] if server_memory and server_memory[1] is not None else 0.0
+            total = pss * workers + server_pss
+            print(
+                f"{mode:>7} {workers:>8} {rss:>16.0f} {pss:>16.0f} "
+                f"{server_pss if server_memory else float('nan'):>16.0f} {total:>15.0f} {entities:>9}"
+                f"   ({time.perf_counter() - t0:.1f}s)"
+            )
+
+
+if __name__ == "__main__":
+    main()
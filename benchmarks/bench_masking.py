@@ -0,0 +1,83 @@
+# ------------------------------------------------------------------------------------------------------------------------------------------------------------------
+# BENCHMARK : MASKING ENGINE
+# Description : Compare le masquage en un seul parcours (apply_masking) à
+#               l'ancien masquage (reconstruction de toute la chaîne pour chaque entité).
+#
+# Utilisation (depuis la racine du projet) :
+#   python -m benchmarks.bench_masking
+#   python -m benchmarks.bench_masking --sizes 100000 5000000 --density 0.01
+#
+# Remarque :
+#  - Vérifie aussi que la sortie est identique à l'ancienne implémentation pour ALLOW, MASK et BLOCK.
+# ------------------------------------------------------------------------------------------------------------------------------------------------------------------
+
+import argparse
+import random
+import time
+from typing import List
+
+from app.masking_engine import apply_masking
+from app.models import Span
+
+
+def make_case(size: int, density: float, seed: int = 42):
+    rng = random.Random(seed)
+    text = "".join(rng.choice("abcdefghij klmnopqrst uvwxyz éàè\n") for _ in range(size))
+    entities: List[Span] = []
+    pos = 0
+    n = int(size * density)
+    step = max(1, size // max(1, n))
+    while pos + 20 < size and len(entities) < n:
+        start = pos + rng.randint(0, step // 2)
+        end = start + rng.randint(3, 15)
+        if end > size:
+            break
+        entities.append(Span("PER", start, end, 1.0, "ml"))
+        pos = end + 1
+    return text, entities
+
+
+# Ancienne implémentation : une copie complète du texte par entité.
+def legacy_masking(text: str, entities: List[Span], decision: str) -> str:
+    if decision == "ALLOW":
+        return text
+    if decision == "BLOCK":
+        return "Texte trop sensible pour être envoyé tel quel."
+    sanitized = text
+    for e in sorted(entities, key=lambda x: x.start, reverse=True):
+        token = f"<{e.type}_MASKED>"
+        sanitized = sanitized[:e.start] + token + sanitized[e.end:]
+    return sanitized
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark du masquage.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 1_000_000, 5_000_000])
+    parser.add_argument("--density", type=float, default=0.005, help="entités par caractère")
+    args = parser.parse_args(argv)
+
+    print(f"{'size':>10} {'entities':>9} {'legacy (ms)':>12} {'single-pass (ms)':>17} {'speedup':>8} {'identical':>10}")
+    for size in args.sizes:
+        text, entities = make_case(size, args.density)
+
+        identical = all(
+            legacy_masking(text, entities, d) == apply_masking(text, entities, d)
+            for d in ("ALLOW", "MASK", "BLOCK")
+        )
+
+        t0 = time.perf_counter()
+        legacy_masking(text, entities, "MASK")
+        legacy_time = time.perf_counter() - t0
+
+        t0 = time.perf_counter()
+        apply_masking(text, entities, "MASK")
+        single_time = time.perf_counter() - t0
+
+        print(
+            f"{size:>10} {len(entities):>9} {legacy_time * 1000:>12.2f} {single_time * 1000:>17.2f} "
+            f"{legacy_time / single_time:>7.1f}x {str(identical):>10}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,58 @@
+# ------------------------------------------------------------------------------------------------------------------------------------------------------------------
+# BENCHMARK : MEDICAL GATE
+# Description : Mesure le coût de la porte lexicale du NER médical et la part des fenêtres écartées
+#               (donc de passes GLiNER évitées) sur un corpus bancaire et sur un corpus mixte.
+#
+# Utilisation (depuis la racine du projet) :
+#   python -m benchmarks.bench_medical_gate
+#   python -m benchmarks.bench_medical_gate --sizes 10000 1000000 --lexicon data/medical_lexicon_fr.txt
+#
+# Remarque :
+#  - Corpus de benchmarks/corpus.py : "bank" = sans terme ni phrase médicale, "mixed" = densités par défaut.
+#  - Fenêtres planifiées comme dans ner_medical.py (section ner_medical.chunking). Aucun modèle nécessaire.
+# ------------------------------------------------------------------------------------------------------------------------------------------------------------------
+
+import argparse
+import time
+
+from app.config import get_ner_medical_config
+from app.medical_gate import DEFAULT_LEXICON_PATH, MedicalGate, load_lexicon
+from app.ner_medical import _plan_text_windows
+from benchmarks.corpus import BANK_FILLER, DEFAULT_DENSITIES, FILLER, make_corpus
+
+# Profil -> (densités, phrases neutres)
+PROFILES = {
+    "bank": ({**DEFAULT_DENSITIES, "MEDICAL": 0.0}, BANK_FILLER),
+    "mixed": (DEFAULT_DENSITIES, FILLER),
+}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark de la porte lexicale du NER médical.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1_000, 100_000, 1_000_000])
+    parser.add_argument("--lexicon", default=DEFAULT_LEXICON_PATH)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args(argv)
+
+    gate = MedicalGate(load_lexicon(args.lexicon))
+    chunking = {**get_ner_medical_config().get("chunking", {}), "enabled": True}
+    print(f"lexique : {gate.size} termes ({args.lexicon})")
+
+    print(f"{'profile':>8} {'size':>10} {'windows':>8} {'skipped':>8} {'gate (ms)':>10} {'MB/s':>8}")
+    for profile, (densities, filler) in PROFILES.items():
+        for size in args.sizes:
+            text, _ = make_corpus(size, densities=densities, filler=filler)
+            windows = _plan_text_windows(text, chunking)
+
+            t0 = time.perf_counter()
+            for _ in range(args.repeat):
+                passed = [gate.has_signal(text, start, end) for start, end in windows]
+            elapsed = (time.perf_counter() - t0) / args.repeat
+
+            skipped = sum(1 for ok in passed if not ok)
+            mb_s = len(text.encode("utf-8")) / 1e6 / elapsed if elapsed else 0.0
+            print(f"{profile:>8} {size:>10} {len(windows):>8} {skipped:>8} {elapsed * 1000:>10.3f} {mb_s:>8.1f}")
+
+
+if __name__ == "__main__":
+    main()
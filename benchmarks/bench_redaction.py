@@ -0,0 +1,88 @@
+# ------------------------------------------------------------------------------------------------------------------------------------------------------------------
+# BENCHMARK : DOCX MASQUE (SORTIE FICHIER)
+# Description : Compare la réécriture en flux de app/docx_stream.py (redact_docx : parties XML du zip d'entrée vers le
+#               zip de sortie, sans DOM) à un aller-retour python-docx (document entier chargé puis enregistré)
+#               sur les DOCX synthétiques de bench_docx : temps et pic mémoire.
+#
+# Utilisation (depuis la racine du projet) :
+#   python -m benchmarks.bench_redaction
+#   python -m benchmarks.bench_redaction --pages 100 500 --repeat 3
+#
+# Remarque :
+#  - L'aller-retour python-docx ne masque rien (ouverture + enregistrement) : borne basse du coût d'une
+#    réécriture par DOM.
+#  - Entités : moteur de règles sur le texte extrait (les modèles NER ne changent rien à la réécriture).
+# ------------------------------------------------------------------------------------------------------------------------------------------------------------------
+
+import argparse
+import io
+import multiprocessing as mp
+from typing import Callable, Dict
+
+from app.docx_stream import extract_docx, redact_docx
+from app.rules_engine import detect_entities
+from benchmarks.bench_docx import _best_of, _rss_kb, make_docx
+
+
+def dom_roundtrip(content: bytes, spans) -> bytes:
+    import docx
+    document = docx.Document(io.BytesIO(content))
+    out = io.BytesIO()
+    document.save(out)
+    return out.getvalue()
+
+
+def stream_redact(content: bytes, spans) -> bytes:
+    out = io.BytesIO()
+    redact_docx(content, extract_docx(content).text_map, spans, out)
+    return out.getvalue()
+
+
+WRITERS: Dict[str, Callable[[bytes, list], bytes]] = {"python-docx": dom_roundtrip, "stream": stream_redact}
+
+
+def _peak_child(name: str, content: bytes, out):
+    import docx  # noqa: F401  (imports hors mesure)
+    spans = detect_entities(extract_docx(content).text)
+    # Sortie comptée à part : seule la mémoire de travail est mesurée
+    before = _rss_kb("VmRSS")
+    result = WRITERS[name](content, spans)
+    out.put(_rss_kb("VmHWM") - before - len(result) // 1024)
+
+
+# Pic mémoire (Ko) d'une réécriture, dans un processus neuf (Linux : /proc/self/status).
+def peak_memory_kb(name: str, content: bytes) -> int:
+    ctx = mp.get_context("spawn")
+    out = ctx.Queue()
+    proc = ctx.Process(target=_peak_child, args=(name, content, out))
+    proc.start()
+    peak = out.get(timeout=600)
+    proc.join()
+    return peak
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark de la réécriture DOCX masquée (python-docx / flux).")
+    parser.add_argument("--pages", type=int, nargs="+", default=[100, 300])
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--no-memory", action="store_true", help="ne pas mesurer le pic mémoire (plus rapide)")
+    args = parser.parse_args(argv)
+
+    print(f"{'pages':>6} {'docx KB':>8} {'writer':>12} {'ms':>9} {'speedup':>8} {'peak MB':>8} {'out KB':>8} {'masked':>7}")
+    for pages in args.pages:
+        content = make_docx(pages)
+        spans = detect_entities(extract_docx(content).text)
+        legacy_time = None
+        for name, write in WRITERS.items():
+            elapsed, result = _best_of(lambda: write(content, spans), args.repeat)
+            legacy_time = legacy_time or elapsed
+            masked = extract_docx(result).text.count("_MASKED>")
+            peak = "" if args.no_memory else f"{peak_memory_kb(name, content) / 1024:.1f}"
+            print(
+                f"{pages:>6} {len(content) / 1024:>8.0f} {name:>12} {elapsed * 1000:>9.1f} "
+                f"{legacy_time / elapsed:>7.2f}x {peak:>8} {len(result) / 1024:>8.0f} {masked:>7}"
+            )
+
+
+if __name__ == "__main__":
+    main()
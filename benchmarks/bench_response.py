@@ -0,0 +1,92 @@
+# ------------------------------------------------------------------------------------------------------------------------------------------------------------------
+# BENCHMARK : CONSTRUCTION ET SERIALISATION DE LA REPONSE
+# Description : Compare l'ancienne réponse (SanitizeResponse Pydantic, encodée par FastAPI : jsonable_encoder puis
+#               json.dumps) à la réponse projetée (projection.py, sérialisée par pydantic-core), pour chaque vue :
+#               taille de la réponse et temps de construction + sérialisation.
+#
+# Utilisation (depuis la racine du projet) :
+#   python -m benchmarks.bench_response
+#   python -m benchmarks.bench_response --sizes 100000 --density-scale 4
+#
+# Remarque :
+#  - Détection hors chronométrage (règles + modèles de substitution de benchmarks/run.py) : seul le coût
+#    de la réponse est mesuré, masquage compris quand la vue contient le texte.
+#  - La vue "full" produit le même JSON que l'ancienne réponse (colonne identical).
+# ------------------------------------------------------------------------------------------------------------------------------------------------------------------
+
+import argparse
+import json
+import time
+from typing import Callable, List, Tuple
+
+from fastapi.encoders import jsonable_encoder
+
+from app.decision_engine import compute_decision
+from app.entity_fusion import fuse_sources
+from app.projection import PipelineResult, ResponseView, render_result
+from app.rules_engine import detect_entities
+from benchmarks.corpus import DEFAULT_DENSITIES, make_corpus
+from benchmarks.run import StandInModels
+
+VIEWS: List[Tuple[str, ResponseView]] = [
+    ("full", ResponseView()),
+    ("positions", ResponseView(entities="positions")),
+    ("counts", ResponseView(entities="counts")),
+    ("masked text", ResponseView(entities="none")),
+    ("decision", ResponseView(entities="none", include_text=False)),
+]
+
+
+def _best_of(fn: Callable[[], object], repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - t0)
+    return best
+
+
+# Ancienne réponse : modèle Pydantic complet, encodé comme FastAPI le fait pour un BaseModel renvoyé tel quel.
+def legacy_render(result: PipelineResult) -> bytes:
+    content = jsonable_encoder(result.to_response())
+    return json.dumps(content, ensure_ascii=False, allow_nan=False, separators=(",", ":")).encode("utf-8")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark de la réponse (projection + sérialisation).")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 1_000_000])
+    parser.add_argument("--density-scale", type=float, default=4.0,
+                        help="multiplie les densités par défaut du corpus (entités par Ko)")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args(argv)
+
+    densities = {kind: density * args.density_scale for kind, density in DEFAULT_DENSITIES.items()}
+    models = StandInModels()
+
+    print(f"{'size':>10} {'entities':>9} {'view':>12} {'bytes':>11} {'ms':>9} {'vs legacy bytes':>16} {'vs legacy time':>15} {'identical':>10}")
+    for size in args.sizes:
+        text, _ = make_corpus(size, densities=densities)
+        spans = fuse_sources({"rules": detect_entities(text), "general": models.general(text), "medical": models.medical(text)})
+        _, risk_score = compute_decision(spans)
+
+        # Nouveau résultat à chaque passage : le texte désensibilisé n'est pas réutilisé d'un passage à l'autre
+        # (décision MASK forcée : le masquage est mesuré quelle que soit la décision réelle du corpus)
+        def new_result() -> PipelineResult:
+            return PipelineResult(text, "MASK", risk_score, spans, {"source_type": "text", "size": len(text)})
+
+        legacy_body = legacy_render(new_result())
+        legacy_time = _best_of(lambda: legacy_render(new_result()), args.repeat)
+        print(f"{size:>10} {len(spans):>9} {'legacy':>12} {len(legacy_body):>11} {legacy_time * 1000:>9.2f}")
+
+        for name, view in VIEWS:
+            body = render_result(new_result(), view).body
+            elapsed = _best_of(lambda: render_result(new_result(), view).body, args.repeat)
+            identical = json.loads(body) == json.loads(legacy_body) if name == "full" else ""
+            print(
+                f"{'':>10} {'':>9} {name:>12} {len(body):>11} {elapsed * 1000:>9.2f} "
+                f"{len(body) / len(legacy_body):>15.1%} {elapsed / legacy_time:>14.1%} {str(identical):>10}"
+            )
+
+
+if __name__ == "__main__":
+    main()
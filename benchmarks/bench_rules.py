@@ -0,0 +1,106 @@
+# ------------------------------------------------------------------------------------------------------------------------------------------------------------------
+# BENCHMARK : RULES ENGINE
+# Description : Compare le moteur de règles (patterns précompilés + préfiltres, stratégies "separate"
+#               et "combined") à l'ancienne boucle (re.compile + finditer pour chaque pattern, à chaque requête).
+#
+# Utilisation (depuis la racine du projet) :
+#   python -m benchmarks.bench_rules
+#   python -m benchmarks.bench_rules --sizes 10000 1000000 --extra-patterns 30
+#
+# Remarque :
+#  - --extra-patterns ajoute des patterns "client" fictifs pour simuler une configuration plus riche.
+#  - Aucun modèle ni réseau nécessaire.
+# ------------------------------------------------------------------------------------------------------------------------------------------------------------------
+
+import argparse
+import random
+import re
+import time
+from typing import Dict, List
+
+from app import rules_engine
+from app.config import get_rule_patterns
+from app.models import Entity
+
+# Fragments de texte utilisés pour générer le corpus (entités et texte neutre)
+FILLER = [
+    "Bonjour, veuillez trouver ci-joint le relevé du mois.",
+    "Le client a demandé un rendez-vous en agence.",
+    "Merci de confirmer la réception de ce courrier.",
+    "Le dossier est en cours de traitement par nos services.",
+]
+SENSITIVE = [
+    "IBAN FR7630006000011234567890189",
+    "carte 4970 1012 3456 7890",
+    "email jean.dupont@example.com",
+    "tel 06 12 34 56 78",
+]
+
+
+def make_text(size: int, seed: int = 42) -> str:
+    rng = random.Random(seed)
+    parts: List[str] = []
+    length = 0
+    while length < size:
+        piece = rng.choice(SENSITIVE) if rng.random() < 0.2 else rng.choice(FILLER)
+        parts.append(piece)
+        length += len(piece) + 1
+    return " ".join(parts)[:size]
+
+
+def extra_patterns(n: int) -> List[Dict[str, str]]:
+    # Patterns fictifs (références internes) qui ne correspondent presque jamais
+    return [{"type": f"CUSTOM_{i}", "regex": rf"\bREF{i:03d}-[A-Z]{{4}}-\d{{6}}\b"} for i in range(n)]
+
+
+# Ancienne implémentation : compilation et parcours du texte pour chaque pattern.
+def legacy_detect(text: str, patterns: List[Dict[str, str]]) -> List[Entity]:
+    entities: List[Entity] = []
+    for pattern_data in patterns:
+        compiled_pattern = re.compile(pattern_data["regex"])
+        for m in compiled_pattern.finditer(text):
+            entities.append(Entity(
+                type=pattern_data["type"], value=m.group(0), start=m.start(), end=m.end(),
+                confidence=0.99, source="rules",
+            ))
+    return entities
+
+
+def _best_of(fn, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - t0)
+    return best
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark du moteur de règles.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1_000, 100_000, 2_000_000])
+    parser.add_argument("--extra-patterns", type=int, default=0)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args(argv)
+
+    patterns = list(get_rule_patterns()) + extra_patterns(args.extra_patterns)
+    strategies = {name: rules_engine.CompiledRules(patterns, name) for name in rules_engine.STRATEGIES}
+
+    print(f"{len(patterns)} patterns")
+    print(f"{'size':>10} {'legacy (ms)':>12} {'separate (ms)':>14} {'combined (ms)':>14} {'best speedup':>13}")
+    for size in args.sizes:
+        text = make_text(size)
+        legacy = _best_of(lambda: legacy_detect(text, patterns), args.repeat)
+        timings = {}
+        for name, compiled in strategies.items():
+            # Le moteur lit les patterns compilés de la configuration : on lui fournit ceux du benchmark
+            rules_engine.get_compiled_rules = lambda compiled=compiled: compiled
+            timings[name] = _best_of(lambda: rules_engine.detect_entities(text), args.repeat)
+        best = min(timings.values())
+        print(
+            f"{size:>10} {legacy * 1000:>12.2f} {timings['separate'] * 1000:>14.2f} "
+            f"{timings['combined'] * 1000:>14.2f} {legacy / best:>12.1f}x"
+        )
+
+
+if __name__ == "__main__":
+    main()
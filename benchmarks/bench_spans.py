@@ -0,0 +1,145 @@
+# ------------------------------------------------------------------------------------------------------------------------------------------------------------------
+# BENCHMARK : REPRESENTATION INTERNE DES ENTITES
+# Description : Compare l'ancien pipeline (une Entity Pydantic validée par correspondance, avec copie de la valeur)
+#               au pipeline actuel (Span à __slots__, conversion en Entity seulement pour la réponse), sur des
+#               textes très denses en entités (type OCR de relevés / listes de contacts).
+#
+# Utilisation (depuis la racine du projet) :
+#   python -m benchmarks.bench_spans
+#   python -m benchmarks.bench_spans --sizes 10000 1000000 --density-scale 10
+#
+# Remarque :
+#  - Mêmes correspondances des deux côtés (règles + modèles de substitution de benchmarks/run.py,
+#    calculées une fois hors chronométrage) : seul le coût des objets est mesuré, de la sortie des
+#    détecteurs jusqu'à la réponse (fusion, score, masquage, SanitizeResponse).
+#  - Mémoire (tracemalloc, passages séparés : tracemalloc ralentit fortement l'exécution) :
+#      - objets : taille des entités produites par les détecteurs (ce que le pipeline garde en mémoire) ;
+#      - pic : pic d'allocation d'un passage complet, réponse comprise.
+# ------------------------------------------------------------------------------------------------------------------------------------------------------------------
+
+import argparse
+import time
+import tracemalloc
+from typing import Callable, Dict, List, Tuple
+
+from app.decision_engine import compute_decision
+from app.entity_fusion import fuse_sources
+from app.masking_engine import apply_masking
+from app.models import Entity, SanitizeResponse, Span, to_entities
+from app.rules_engine import detect_entities
+from benchmarks.corpus import DEFAULT_DENSITIES, make_corpus
+from benchmarks.run import StandInModels
+
+# Correspondance brute : (type, début, fin, confiance, source)
+Match = Tuple[str, int, int, float, str]
+
+
+def collect_matches(text: str, models: StandInModels) -> Dict[str, List[Match]]:
+    detected = {
+        "rules": detect_entities(text),
+        "general": models.general(text),
+        "medical": models.medical(text),
+    }
+    return {
+        name: [(s.type, s.start, s.end, s.confidence, s.source) for s in spans]
+        for name, spans in detected.items()
+    }
+
+
+# Ancienne implémentation : chaque détecteur construit une Entity validée (valeur copiée), gardée jusqu'à la réponse.
+def legacy_sources(text: str, matches: Dict[str, List[Match]]) -> Dict[str, List[Entity]]:
+    return {
+        name: [
+            Entity(type=t, value=text[start:end], start=start, end=end, confidence=confidence, source=source)
+            for t, start, end, confidence, source in source_matches
+        ]
+        for name, source_matches in matches.items()
+    }
+
+
+def span_sources(text: str, matches: Dict[str, List[Match]]) -> Dict[str, List[Span]]:
+    return {name: [Span(*m) for m in source_matches] for name, source_matches in matches.items()}
+
+
+def legacy_pipeline(text: str, matches: Dict[str, List[Match]]) -> SanitizeResponse:
+    entities = fuse_sources(legacy_sources(text, matches))
+    decision, risk_score = compute_decision(entities)
+    return SanitizeResponse(
+        sanitized_text=apply_masking(text, entities, "MASK"),
+        decision=decision,
+        risk_score=risk_score,
+        entities=entities,
+    )
+
+
+def span_pipeline(text: str, matches: Dict[str, List[Match]]) -> SanitizeResponse:
+    entities = fuse_sources(span_sources(text, matches))
+    decision, risk_score = compute_decision(entities)
+    return SanitizeResponse(
+        sanitized_text=apply_masking(text, entities, "MASK"),
+        decision=decision,
+        risk_score=risk_score,
+        entities=to_entities(text, entities),
+    )
+
+
+def _best_of(fn: Callable[[], object], repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - t0)
+    return best
+
+
+# Returns:
+#     - (octets encore alloués par le résultat de fn, pic d'allocation pendant fn)
+def _memory(fn: Callable[[], object]) -> Tuple[int, int]:
+    tracemalloc.start()
+    try:
+        result = fn()
+        retained, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    del result
+    return retained, peak
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark de la représentation interne des entités.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000, 1_000_000])
+    parser.add_argument("--density-scale", type=float, default=8.0,
+                        help="multiplie les densités par défaut du corpus (entités par Ko)")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args(argv)
+
+    densities = {kind: density * args.density_scale for kind, density in DEFAULT_DENSITIES.items()}
+    models = StandInModels()
+
+    print(f"{'size':>10} {'entities':>9} {'legacy (ms)':>12} {'spans (ms)':>11} {'speedup':>8} "
+          f"{'objects KB legacy/spans':>24} {'peak KB legacy/spans':>21} {'identical':>10}")
+    for size in args.sizes:
+        text, _ = make_corpus(size, densities=densities)
+        matches = collect_matches(text, models)
+
+        legacy = legacy_pipeline(text, matches)
+        current = span_pipeline(text, matches)
+        identical = legacy.model_dump() == current.model_dump()
+
+        legacy_time = _best_of(lambda: legacy_pipeline(text, matches), args.repeat)
+        span_time = _best_of(lambda: span_pipeline(text, matches), args.repeat)
+        legacy_objects, _ = _memory(lambda: legacy_sources(text, matches))
+        span_objects, _ = _memory(lambda: span_sources(text, matches))
+        _, legacy_peak = _memory(lambda: legacy_pipeline(text, matches))
+        _, span_peak = _memory(lambda: span_pipeline(text, matches))
+
+        objects = f"{legacy_objects / 1024:.0f}/{span_objects / 1024:.0f}"
+        peak = f"{legacy_peak / 1024:.0f}/{span_peak / 1024:.0f}"
+        print(
+            f"{size:>10} {sum(len(m) for m in matches.values()):>9} {legacy_time * 1000:>12.2f} {span_time * 1000:>11.2f} "
+            f"{legacy_time / span_time:>7.2f}x {objects:>24} {peak:>21} {str(identical):>10}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,221 @@
+# ------------------------------------------------------------------------------------------------------------------------------------------------------------------
+# BENCHMARK : CORPUS SYNTHETIQUE
+# Description : Génère des textes français reproductibles (graine fixe) avec des densités réalistes
+#               d'IBAN, numéros de carte, emails, téléphones, noms de personnes et termes médicaux.
+#
+# Utilisation (depuis la racine du projet) :
+#   python -m benchmarks.corpus --size 2000 --seed 42
+#
+# Remarque :
+#  - Même graine + même taille -> même texte, octet pour octet (comparaisons entre deux versions du code).
+#  - La taille demandée est en octets UTF-8 ; le texte est coupé en fin de phrase (taille <= demandée,
+#    sauf si la première phrase est déjà plus longue).
+#  - Les densités sont exprimées en entités par Ko de texte (DEFAULT_DENSITIES) ; les formats sont
+#    variés (IBAN compact / groupé, téléphones 06 / 01. / +33...) comme dans les documents réels,
+#    certains ne sont donc volontairement pas reconnus par les règles.
+# ------------------------------------------------------------------------------------------------------------------------------------------------------------------
+
+import argparse
+import random
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+# Entités par Ko de texte (relevés, courriers et comptes rendus mélangés)
+DEFAULT_DENSITIES: Dict[str, float] = {
+    "IBAN": 0.3,
+    "CARD": 0.2,
+    "EMAIL": 0.8,
+    "PHONE": 0.8,
+    "PERSON": 1.5,
+    "MEDICAL": 1.2,
+}
+
+# Tailles par défaut de la suite : 100 o -> 10 Mo
+DEFAULT_SIZES = [100, 1_000, 10_000, 100_000, 1_000_000, 10_000_000]
+
+FIRST_NAMES = [
+    "Jean", "Marie", "Pierre", "Sophie", "Nicolas", "Isabelle", "Julien", "Camille", "Thomas", "Élodie",
+    "François", "Chloé", "Mathieu", "Léa", "Antoine", "Manon", "Hélène", "Sébastien", "Inès", "Karim",
+]
+LAST_NAMES = [
+    "Dupont", "Martin", "Bernard", "Dubois", "Lefèvre", "Moreau", "Girard", "Roux", "Fournier", "Mercier",
+    "Bonnet", "Lambert", "Fontaine", "Chevalier", "Rousseau", "Benali", "Garnier", "Faure", "Leroy", "Caron",
+]
+MEDICAL_TERMS = [
+    "diabète de type 2", "hypertension artérielle", "insuffisance rénale", "asthme", "fibrillation auriculaire",
+    "dépression", "cancer du sein", "BPCO", "metformine", "paracétamol", "amoxicilline", "insuline glargine",
+    "lévothyroxine", "IRM cérébrale", "scanner thoracique", "échographie abdominale", "coloscopie",
+    "chimiothérapie", "dialyse", "appendicectomie",
+]
+DOMAINS = ["example.fr", "mail.example.com", "orange.example.fr", "chu-example.fr"]
+
+FILLER = [
+    "Veuillez trouver ci-joint le relevé du mois de mars.",
+    "Le dossier est en cours de traitement par nos services.",
+    "Merci de confirmer la réception de ce courrier dans les meilleurs délais.",
+    "Le client a demandé un rendez-vous en agence pour la semaine prochaine.",
+    "Les conditions générales applicables sont disponibles sur demande.",
+    "La réunion de suivi est prévue jeudi à quatorze heures.",
+    "Aucune anomalie n'a été relevée lors du dernier contrôle.",
+    "Le montant sera prélevé à la date d'échéance habituelle.",
+    "Nous restons à votre disposition pour toute information complémentaire.",
+    "L'examen clinique est sans particularité ce jour.",
+    "Le compte rendu a été transmis au médecin traitant.",
+    "Le contrat a été renouvelé pour une durée d'un an.",
+]
+# Phrases neutres sans vocabulaire médical (corpus purement bancaire)
+MEDICAL_FILLER = [
+    "L'examen clinique est sans particularité ce jour.",
+    "Le compte rendu a été transmis au médecin traitant.",
+]
+BANK_FILLER = [sentence for sentence in FILLER if sentence not in MEDICAL_FILLER]
+
+
+# ---------------------------------------------------------------------------------
+#                      GENERATEURS D'ENTITES
+# ---------------------------------------------------------------------------------
+# Chaque générateur renvoie une phrase complète contenant une entité.
+
+def _digits(rng: random.Random, n: int) -> str:
+    return "".join(str(rng.randint(0, 9)) for _ in range(n))
+
+
+def _luhn_complete(partial: str) -> str:
+    total = 0
+    for i, d in enumerate(reversed(partial)):
+        v = int(d)
+        if i % 2 == 0:
+            v *= 2
+            if v > 9:
+                v -= 9
+        total += v
+    return partial + str((10 - total % 10) % 10)
+
+
+def _iban(rng: random.Random) -> str:
+    bban = _digits(rng, 23)
+    compact = f"FR{rng.randint(10, 99)}{bban}"
+    if rng.random() < 0.7:
+        return f"Le virement sera effectué sur l'IBAN {compact}."
+    grouped = " ".join(compact[i:i + 4] for i in range(0, len(compact), 4))
+    return f"Coordonnées bancaires : {grouped}."
+
+
+def _card(rng: random.Random) -> str:
+    number = _luhn_complete(rng.choice(["4970", "5132", "4562"]) + _digits(rng, 11))
+    grouped = " ".join(number[i:i + 4] for i in range(0, 16, 4))
+    return f"Paiement refusé pour la carte {grouped if rng.random() < 0.8 else number}."
+
+
+def _person(rng: random.Random) -> str:
+    return f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}"
+
+
+def _strip_accents(value: str) -> str:
+    return value.translate(str.maketrans("éèêëàâîïôöûüçÉ", "eeeeaaiioouucE"))
+
+
+def _email(rng: random.Random) -> str:
+    first, last = rng.choice(FIRST_NAMES), rng.choice(LAST_NAMES)
+    local = _strip_accents(f"{first}.{last}").lower()
+    return f"Contact : {local}@{rng.choice(DOMAINS)}."
+
+
+def _phone(rng: random.Random) -> str:
+    digits = f"0{rng.randint(1, 7)}" + _digits(rng, 8)
+    style = rng.random()
+    if style < 0.6:
+        number = " ".join(digits[i:i + 2] for i in range(0, 10, 2))
+    elif style < 0.85:
+        number = ".".join(digits[i:i + 2] for i in range(0, 10, 2))
+    else:
+        number = "+33 " + digits[1] + " " + " ".join(digits[i:i + 2] for i in range(2, 10, 2))
+    return f"Joignable au {number}."
+
+
+def _person_sentence(rng: random.Random) -> str:
+    return rng.choice([
+        "Le dossier de {} a été mis à jour.",
+        "{} s'est présenté à l'accueil ce matin.",
+        "Rendez-vous confirmé avec {}.",
+    ]).format(_person(rng))
+
+
+def _medical(rng: random.Random) -> str:
+    return rng.choice([
+        "Antécédents : {}.",
+        "Le patient est traité par {} depuis deux ans.",
+        "Une {} est prévue le mois prochain.",
+        "Suivi pour {}.",
+    ]).format(rng.choice(MEDICAL_TERMS))
+
+
+GENERATORS: Dict[str, Callable[[random.Random], str]] = {
+    "IBAN": _iban,
+    "CARD": _card,
+    "EMAIL": _email,
+    "PHONE": _phone,
+    "PERSON": _person_sentence,
+    "MEDICAL": _medical,
+}
+
+
+# ---------------------------------------------------------------------------------
+#                      GENERATION DU CORPUS
+# ---------------------------------------------------------------------------------
+# Alterne phrases neutres et phrases à entités : une entité de type t est insérée dès que le
+# nombre d'entités de ce type passe sous densité[t] * taille produite / 1024 (à une gigue près).
+#  Args:
+#      - size: taille cible en octets UTF-8.
+#      - seed: graine du générateur.
+#      - densities: entités par Ko (DEFAULT_DENSITIES par défaut).
+#      - filler: phrases neutres (FILLER par défaut, BANK_FILLER pour un corpus sans vocabulaire médical).
+#  Returns:
+#      - (texte, nombre d'entités insérées par type)
+
+def make_corpus(size: int, seed: int = 42, densities: Optional[Dict[str, float]] = None,
+                filler: Optional[Sequence[str]] = None) -> Tuple[str, Dict[str, int]]:
+    rng = random.Random(f"{seed}:{size}")
+    densities = DEFAULT_DENSITIES if densities is None else densities
+    filler = FILLER if filler is None else filler
+    counts = {name: 0 for name in densities}
+    parts: List[str] = []
+    total = 0
+
+    def add(sentence: str) -> bool:
+        nonlocal total
+        n = len(sentence.encode("utf-8")) + 1
+        if parts and total + n > size:
+            return False
+        parts.append(sentence)
+        total += n
+        return True
+
+    while True:
+        if not add(rng.choice(filler)):
+            break
+        for kind, density in densities.items():
+            if counts[kind] + rng.random() < density * total / 1024.0:
+                if not add(GENERATORS[kind](rng)):
+                    return " ".join(parts), counts
+                counts[kind] += 1
+        # Retour à la ligne de temps en temps (paragraphes)
+        if rng.random() < 0.15 and total + 1 <= size:
+            parts[-1] += "\n"
+            total += 1
+
+    return " ".join(parts), counts
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Génère un texte synthétique (stdout).")
+    parser.add_argument("--size", type=int, default=2_000)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args(argv)
+
+    text, counts = make_corpus(args.size, args.seed)
+    print(text)
+    print(f"\n# {len(text.encode('utf-8'))} octets, entités : {counts}")
+
+
+if __name__ == "__main__":
+    main()
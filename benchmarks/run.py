@@ -0,0 +1,326 @@
+# ------------------------------------------------------------------------------------------------------------------------------------------------------------------
+# BENCHMARK : SUITE PAR ETAPE (HORS LIGNE)
+# Description : Chronomètre chaque étape du pipeline (ingestion, rules, ner_general, ner_medical, fusion,
+#               scoring, masking, audit) puis le pipeline complet, sur des corpus synthétiques de 100 o à 10 Mo
+#               (benchmarks/corpus.py), écrit les résultats en JSON et les compare à une référence.
+#
+# Utilisation (depuis la racine du projet) :
+#   python -m benchmarks.run
+#   python -m benchmarks.run --sizes 1000 100000 --stages rules fusion pipeline
+#   python -m benchmarks.run --save-baseline                 # met à jour benchmarks/baseline.json
+#   python -m benchmarks.run --fail-on-regression            # code retour 1 si une étape régresse
+#
+# Remarque :
+#  - Aucun réseau : par défaut les deux modèles NER sont remplacés par des modèles de substitution
+#    (dictionnaires des noms et termes médicaux du corpus), branchés à la place des détecteurs dans
+#    app.batching. Le pipeline complet passe donc par le vrai code (pool des détecteurs, micro-batcher,
+#    fusion, décision, masquage, audit) avec une inférence ML quasi nulle.
+#    --models real utilise les vrais modèles (cache Hugging Face local requis).
+#  - masking est mesuré avec la décision MASK (sinon les gros textes sont BLOQUÉS et rien n'est masqué).
+#  - audit mesure le coût côté requête (mise en file) ; le journal est écrit dans un répertoire temporaire.
+#  - Résultats : benchmarks/results/run-<date>.json (médiane, min, p95 en ms et débit en Mo/s par taille
+#    et par étape). Une étape régresse si sa médiane dépasse celle de la référence de plus de --threshold
+#    (et d'au moins --noise-ms). La référence dépend de la machine : la régénérer sur la machine de mesure.
+# ------------------------------------------------------------------------------------------------------------------------------------------------------------------
+
+import argparse
+import datetime
+import json
+import math
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Callable, Dict, List, Tuple
+
+# Aucun téléchargement de modèle pendant la suite
+os.environ.setdefault("HF_HUB_OFFLINE", "1")
+os.environ.setdefault("TRANSFORMERS_OFFLINE", "1")
+
+from benchmarks.corpus import DEFAULT_SIZES, FIRST_NAMES, LAST_NAMES, MEDICAL_TERMS, make_corpus
+
+STAGES = ["ingestion", "rules", "ner_general", "ner_medical", "fusion", "scoring", "masking", "audit", "pipeline"]
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_BASELINE = os.path.join(BENCH_DIR, "baseline.json")
+DEFAULT_RESULTS_DIR = os.path.join(BENCH_DIR, "results")
+
+SCHEMA_VERSION = 1
+
+
+# ---------------------------------------------------------------------------------
+#                      MODELES DE SUBSTITUTION
+# ---------------------------------------------------------------------------------
+# Mêmes signatures et même format de sortie que les détecteurs réels (PER / MED_*, source "ml").
+
+class StandInModels:
+
+    def __init__(self):
+        import re
+        from app.models import Span
+        self._span = Span
+        firsts = "|".join(map(re.escape, FIRST_NAMES))
+        lasts = "|".join(map(re.escape, LAST_NAMES))
+        self._names = re.compile(rf"\b(?:{firsts}) (?:{lasts})\b")
+        terms = sorted(MEDICAL_TERMS, key=len, reverse=True)
+        self._terms = re.compile(r"\b(?:" + "|".join(map(re.escape, terms)) + r")\b", re.IGNORECASE)
+
+    def _find(self, pattern, text: str, label, confidence: float):
+        return [
+            self._span(label(m.group(0)), m.start(), m.end(), confidence, "ml")
+            for m in pattern.finditer(text)
+        ]
+
+    def general(self, text: str):
+        return self._find(self._names, text, lambda _: "PER", 0.98)
+
+    def medical(self, text: str):
+        return self._find(self._terms, text, lambda _: "MED_MALADIE", 0.9)
+
+    def general_batch(self, texts: List[str]):
+        return [self.general(t) for t in texts]
+
+    def medical_batch(self, texts: List[str]):
+        return [self.medical(t) for t in texts]
+
+    @staticmethod
+    def count_tokens(texts: List[str]) -> List[int]:
+        # Approximation : ~4 caractères par jeton (pas de tokenizer à charger)
+        return [len(t) // 4 for t in texts]
+
+
+def install_stand_ins() -> StandInModels:
+    from app import batching
+    models = StandInModels()
+    batching.detect_entities_general = models.general
+    batching.detect_entities_general_batch = models.general_batch
+    batching.detect_entities_medical = models.medical
+    batching.detect_entities_medical_batch = models.medical_batch
+    batching.count_tokens = models.count_tokens
+    return models
+
+
+# ---------------------------------------------------------------------------------
+#                      CHRONOMETRAGE
+# ---------------------------------------------------------------------------------
+# Répète l'appel au moins `repeat` fois et au moins `min_time` secondes (plafonné à max_runs).
+
+def time_call(fn: Callable[[], object], repeat: int, min_time: float, max_runs: int = 1000) -> Dict[str, float]:
+    timings: List[float] = []
+    started = time.perf_counter()
+    while len(timings) < max_runs:
+        t0 = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - t0)
+        if len(timings) >= repeat and time.perf_counter() - started >= min_time:
+            break
+    timings.sort()
+    p95 = timings[min(len(timings) - 1, math.ceil(0.95 * len(timings)) - 1)]
+    return {
+        "runs": len(timings),
+        "median_ms": round(statistics.median(timings) * 1000, 4),
+        "min_ms": round(timings[0] * 1000, 4),
+        "p95_ms": round(p95 * 1000, 4),
+    }
+
+
+# Returns:
+#     - (appel à chronométrer par étape, nombre d'entités fusionnées, décision)
+
+def _stage_calls(text: str, models) -> Tuple[Dict[str, Callable[[], object]], int, str]:
+    from app.ingestion import ingest_file
+    from app.rules_engine import detect_entities
+    from app.entity_fusion import fuse_sources
+    from app.decision_engine import compute_decision
+    from app.masking_engine import apply_masking
+    from app.audit import log_audit
+    from app.main import run_sanitization_pipeline
+    from app.projection import render_result
+
+    content = text.encode("utf-8")
+    sources = {"rules": detect_entities(text), "general": models.general(text), "medical": models.medical(text)}
+    entities = fuse_sources(sources)
+    decision, risk_score = compute_decision(entities)
+    metadata = {"size": len(content)}
+
+    return {
+        "ingestion": lambda: ingest_file(content, "corpus.txt", "text/plain"),
+        "rules": lambda: detect_entities(text),
+        "ner_general": lambda: models.general(text),
+        "ner_medical": lambda: models.medical(text),
+        "fusion": lambda: fuse_sources(sources),
+        "scoring": lambda: compute_decision(entities),
+        "masking": lambda: apply_masking(text, entities, "MASK"),
+        "audit": lambda: log_audit(text, entities, decision, risk_score),
+        # Pipeline complet jusqu'à la réponse JSON (vue complète, masquage compris)
+        "pipeline": lambda: render_result(run_sanitization_pipeline(text, "text", metadata)),
+    }, len(entities), decision
+
+
+# ---------------------------------------------------------------------------------
+#                      COMPARAISON A LA REFERENCE
+# ---------------------------------------------------------------------------------
+# Returns:
+#     - [{size, stage, baseline_ms, current_ms, ratio, regression}] pour les couples présents des deux côtés.
+
+def compare(results: Dict[str, object], baseline: Dict[str, object], threshold: float, noise_ms: float) -> List[Dict[str, object]]:
+    reference = {
+        (entry["size"], stage): stats["median_ms"]
+        for entry in baseline.get("results", [])
+        for stage, stats in entry["stages"].items()
+    }
+    rows = []
+    for entry in results["results"]:
+        for stage, stats in entry["stages"].items():
+            base = reference.get((entry["size"], stage))
+            if base is None:
+                continue
+            current = stats["median_ms"]
+            ratio = current / base if base > 0 else float("inf")
+            rows.append({
+                "size": entry["size"],
+                "stage": stage,
+                "baseline_ms": base,
+                "current_ms": current,
+                "ratio": round(ratio, 3),
+                "regression": ratio > 1.0 + threshold and current - base > noise_ms,
+            })
+    return rows
+
+
+def _environment() -> Dict[str, object]:
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                                cwd=BENCH_DIR, timeout=5).stdout.strip() or None
+    except Exception:
+        commit = None
+    return {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "machine": platform.machine(),
+        "cpu_count": os.cpu_count(),
+        "git_commit": commit,
+    }
+
+
+# ---------------------------------------------------------------------------------
+#                      SUITE
+# ---------------------------------------------------------------------------------
+
+def run_suite(sizes: List[int], stages: List[str], seed: int, repeat: int, min_time: float,
+              models_mode: str = "stand-in") -> Dict[str, object]:
+    from app.config import get_config, publish_config, thaw
+    from app.audit import shutdown_audit
+    from app.executor import shutdown_executor
+
+    # Journal d'audit hors du projet (avant le premier log_audit, qui démarre l'écrivain)
+    audit_dir = tempfile.mkdtemp(prefix="bench-audit-")
+    config = thaw(get_config())
+    config.setdefault("audit", {})["path"] = os.path.join(audit_dir, "audit.log")
+    publish_config(config)
+
+    if models_mode == "stand-in":
+        models = install_stand_ins()
+    else:
+        from app.ner_general_hf import detect_entities_general
+        from app.ner_medical import detect_entities_medical
+        models = argparse.Namespace(general=detect_entities_general, medical=detect_entities_medical)
+
+    results = []
+    try:
+        for size in sizes:
+            text, planted = make_corpus(size, seed)
+            calls, detected, decision = _stage_calls(text, models)
+            entry = {
+                "size": size,
+                "bytes": len(text.encode("utf-8")),
+                "planted": planted,
+                "detected": detected,
+                "decision": decision,
+                "stages": {},
+            }
+            for stage in stages:
+                stats = time_call(calls[stage], repeat, min_time)
+                median_s = stats["median_ms"] / 1000
+                stats["mb_per_s"] = round(entry["bytes"] / 1e6 / median_s, 2) if median_s > 0 else None
+                entry["stages"][stage] = stats
+                print(f"{size:>10} {stage:<12} {stats['median_ms']:>12.3f} {stats['p95_ms']:>12.3f} "
+                      f"{stats['mb_per_s'] or 0:>10.1f} {stats['runs']:>6}")
+            results.append(entry)
+    finally:
+        shutdown_executor()
+        shutdown_audit()
+
+    return {
+        "schema": SCHEMA_VERSION,
+        "created": datetime.datetime.now().isoformat(timespec="seconds"),
+        "seed": seed,
+        "models": models_mode,
+        "environment": _environment(),
+        "results": results,
+    }
+
+
+def _print_comparison(rows: List[Dict[str, object]], threshold: float):
+    if not rows:
+        print("\nAucune mesure commune avec la référence.")
+        return
+    print(f"\nComparaison à la référence (seuil +{threshold:.0%}) :")
+    print(f"{'size':>10} {'stage':<12} {'baseline (ms)':>14} {'current (ms)':>13} {'ratio':>7}")
+    for row in rows:
+        flag = "  REGRESSION" if row["regression"] else ""
+        print(f"{row['size']:>10} {row['stage']:<12} {row['baseline_ms']:>14.3f} {row['current_ms']:>13.3f} "
+              f"{row['ratio']:>7.2f}{flag}")
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark hors ligne des étapes du pipeline.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES)
+    parser.add_argument("--stages", nargs="+", choices=STAGES, default=STAGES)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--repeat", type=int, default=3, help="Nombre minimal de mesures par étape.")
+    parser.add_argument("--min-time", type=float, default=0.2, help="Durée minimale de mesure par étape (s).")
+    parser.add_argument("--models", choices=["stand-in", "real"], default="stand-in")
+    parser.add_argument("--output", help="Fichier JSON des résultats (défaut : benchmarks/results/run-<date>.json).")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE)
+    parser.add_argument("--save-baseline", action="store_true", help="Écrit les résultats comme nouvelle référence.")
+    parser.add_argument("--threshold", type=float, default=0.15, help="Régression si médiane > référence × (1 + seuil).")
+    parser.add_argument("--noise-ms", type=float, default=0.05, help="Écart absolu minimal pour signaler une régression.")
+    parser.add_argument("--fail-on-regression", action="store_true")
+    args = parser.parse_args(argv)
+
+    print(f"{'size':>10} {'stage':<12} {'median (ms)':>12} {'p95 (ms)':>12} {'MB/s':>10} {'runs':>6}")
+    results = run_suite(args.sizes, args.stages, args.seed, args.repeat, args.min_time, args.models)
+
+    rows: List[Dict[str, object]] = []
+    if not args.save_baseline and os.path.exists(args.baseline):
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+        if baseline.get("seed") != args.seed or baseline.get("models") != args.models:
+            print(f"\n[BENCH] Référence ignorée : seed/modèles différents ({args.baseline}).")
+        else:
+            rows = compare(results, baseline, args.threshold, args.noise_ms)
+            results["comparison"] = {"baseline": os.path.relpath(args.baseline), "threshold": args.threshold, "rows": rows}
+            _print_comparison(rows, args.threshold)
+
+    output = args.baseline if args.save_baseline else args.output
+    if output is None:
+        os.makedirs(DEFAULT_RESULTS_DIR, exist_ok=True)
+        output = os.path.join(DEFAULT_RESULTS_DIR, f"run-{datetime.datetime.now():%Y%m%d-%H%M%S}.json")
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(results, f, indent=2, ensure_ascii=False)
+    print(f"\n[BENCH] Résultats écrits dans {output}")
+
+    regressions = [row for row in rows if row["regression"]]
+    if regressions:
+        print(f"[BENCH] {len(regressions)} régression(s) au-delà du seuil.")
+        if args.fail_on_regression:
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,146 @@
+# ------------------------------------------------------------------------------------------------------------------------------------------------------------------
+# TESTS : CONTROLE D'ADMISSION ET ECHEANCES
+# File d'attente bornée (429 si pleine, 503 après queue_timeout), place transmise dans l'ordre d'arrivée,
+# échéance par requête (en file, avant une étape, en attente d'un Future).
+# ------------------------------------------------------------------------------------------------------------------------------------------------------------------
+
+import asyncio
+import time
+from concurrent.futures import Future
+
+import pytest
+
+from app.admission import (
+    DEFAULT_DEADLINE_HEADER, NO_DEADLINE, AdmissionController, AdmissionRejected, Deadline, DeadlineExceeded,
+    deadline_from_headers, wait_future,
+)
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+def test_queue_full_rejected_with_429():
+    async def scenario():
+        controller = AdmissionController(max_concurrent=1, max_queue=1, queue_timeout_ms=1_000)
+        await controller.acquire()
+        queued = asyncio.ensure_future(controller.acquire())
+        await asyncio.sleep(0)
+        assert controller.queue_depth() == 1
+
+        with pytest.raises(AdmissionRejected) as exc:
+            await controller.acquire()
+        assert exc.value.status_code == 429 and exc.value.reason == "queue_full"
+
+        # Place transmise à la requête en file : toujours une seule active
+        controller.release()
+        await asyncio.wait_for(queued, 1)
+        assert controller.active == 1 and controller.queue_depth() == 0
+        controller.release()
+        assert controller.active == 0
+
+    run(scenario())
+
+
+def test_queue_timeout_rejected_with_503():
+    async def scenario():
+        controller = AdmissionController(max_concurrent=1, max_queue=4, queue_timeout_ms=50)
+        await controller.acquire()
+        t0 = time.monotonic()
+        with pytest.raises(AdmissionRejected) as exc:
+            await controller.acquire()
+        assert exc.value.status_code == 503 and exc.value.reason == "queue_timeout"
+        assert time.monotonic() - t0 < 1
+        # La requête abandonnée ne reste pas dans la file
+        assert controller.queue_depth() == 0
+        controller.release()
+        assert controller.active == 0
+
+    run(scenario())
+
+
+def test_waiters_served_in_arrival_order():
+    async def scenario():
+        controller = AdmissionController(max_concurrent=1, max_queue=4, queue_timeout_ms=1_000)
+        order = []
+
+        async def request(name):
+            await controller.acquire()
+            order.append(name)
+
+        await controller.acquire()
+        tasks = [asyncio.ensure_future(request(name)) for name in ("a", "b", "c")]
+        await asyncio.sleep(0)
+        for _ in tasks:
+            controller.release()
+            await asyncio.sleep(0)
+        await asyncio.gather(*tasks)
+        assert order == ["a", "b", "c"]
+
+    run(scenario())
+
+
+def test_deadline_shorter_than_queue_timeout():
+    async def scenario():
+        controller = AdmissionController(max_concurrent=1, max_queue=4, queue_timeout_ms=5_000)
+        await controller.acquire()
+        with pytest.raises(DeadlineExceeded) as exc:
+            await controller.acquire(Deadline.after_ms(30))
+        assert exc.value.status_code == 503 and exc.value.stage == "admission"
+        assert controller.queue_depth() == 0
+
+    run(scenario())
+
+
+def test_expired_deadline_not_admitted():
+    async def scenario():
+        controller = AdmissionController(max_concurrent=4)
+        with pytest.raises(DeadlineExceeded):
+            await controller.acquire(Deadline(time.monotonic() - 1))
+        assert controller.active == 0
+
+    run(scenario())
+
+
+def test_deadline_values():
+    assert Deadline.after_ms(0) is NO_DEADLINE and Deadline.after_ms(None) is NO_DEADLINE
+    assert NO_DEADLINE.remaining() is None and not NO_DEADLINE.expired()
+    NO_DEADLINE.check("ner")
+
+    deadline = Deadline.after_ms(10_000)
+    assert 9 < deadline.remaining() <= 10 and not deadline.expired()
+    expired = Deadline(time.monotonic() - 1)
+    assert expired.remaining() == 0.0 and expired.expired()
+    with pytest.raises(DeadlineExceeded) as exc:
+        expired.check("ner")
+    assert exc.value.stage == "ner"
+
+
+def test_deadline_from_headers():
+    deadline = deadline_from_headers({DEFAULT_DEADLINE_HEADER: "250"})
+    assert 0 < deadline.remaining() <= 0.25
+    for value in ("0", "-5", "abc"):
+        with pytest.raises(ValueError):
+            deadline_from_headers({DEFAULT_DEADLINE_HEADER: value})
+
+
+def test_wait_future_cancels_pending_work():
+    async def scenario():
+        future = Future()
+        with pytest.raises(DeadlineExceeded) as exc:
+            await wait_future(future, Deadline.after_ms(30), "ner")
+        assert exc.value.stage == "ner"
+        assert future.cancelled()
+
+        # Future partagé (cache) : pas annulé, les autres requêtes l'attendent encore
+        shared = Future()
+        with pytest.raises(DeadlineExceeded):
+            await wait_future(shared, Deadline.after_ms(30), "cache", cancel=False)
+        assert not shared.cancelled()
+        shared.set_result("ok")
+
+        done = Future()
+        done.set_result(42)
+        assert await wait_future(done, NO_DEADLINE, "ner") == 42
+
+    run(scenario())
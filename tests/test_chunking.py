@@ -0,0 +1,100 @@
+# ------------------------------------------------------------------------------------------------------------------------------------------------------------------
+# TESTS : FENETRES GLISSANTES (CHUNKING)
+# plan_windows : fenêtres bornées qui couvrent tout le texte, se recouvrent et coupent aux frontières de phrase.
+# merge_window_entities : une entité n'est gardée que par la fenêtre qui possède son début (milieu du
+# recouvrement), sans doublon ni chevauchement.
+# ------------------------------------------------------------------------------------------------------------------------------------------------------------------
+
+import re
+
+from app.chunking import merge_window_entities, plan_windows, segment_starts
+from app.models import Span
+
+
+def word_offsets(text):
+    return [m.span() for m in re.finditer(r"\S+", text)]
+
+
+# Texte de n phrases de 6 mots
+def make_text(sentences):
+    return " ".join(f"Phrase numéro {i} avec quatre mots." for i in range(sentences))
+
+
+def test_short_text_single_window():
+    text = "Un texte court."
+    assert plan_windows(text, word_offsets(text), window=10, stride=2) == [(0, len(text))]
+
+
+def test_windows_cover_text_and_overlap():
+    text = make_text(40)
+    offsets = word_offsets(text)
+    windows = plan_windows(text, offsets, window=20, stride=4)
+
+    assert len(windows) > 1
+    assert windows[0][0] == 0 and windows[-1][1] == len(text)
+    for (start, end), (next_start, next_end) in zip(windows, windows[1:]):
+        # Recouvrement, et la fenêtre avance
+        assert next_start < end and next_start > start and next_end > end
+    for start, end in windows:
+        assert sum(1 for a, b in offsets if start <= a and b <= end) <= 20
+
+
+def test_windows_cut_at_sentence_boundaries():
+    text = make_text(40)
+    # Recouvrement plus long qu'une phrase : la fenêtre suivante peut commencer sur un début de phrase
+    windows = plan_windows(text, word_offsets(text), window=20, stride=8)
+    starts = set(segment_starts(text))
+    for start, end in windows[1:]:
+        assert start in starts
+    for start, end in windows[:-1]:
+        assert text[end - 1] == "."
+
+
+def test_stride_larger_than_half_window_still_advances():
+    text = " ".join(f"mot{i}" for i in range(100))
+    windows = plan_windows(text, word_offsets(text), window=10, stride=50)
+    assert windows[-1][1] == len(text)
+    assert all(b[0] > a[0] for a, b in zip(windows, windows[1:]))
+
+
+def test_single_window_entities_unchanged():
+    entities = [Span("PER", 0, 4, 0.9, "ml")]
+    assert merge_window_entities([(0, 100)], [entities]) == entities
+
+
+def test_overlap_entity_kept_once():
+    # Recouvrement 80-100 : frontière de possession en 90
+    windows = [(0, 100), (80, 200)]
+    seen_by_both = Span("PER", 85, 88, 0.9, "ml")
+    merged = merge_window_entities(windows, [[seen_by_both], [Span("PER", 85, 88, 0.8, "ml")]])
+    assert merged == [seen_by_both]
+
+
+def test_boundary_owned_by_next_window():
+    windows = [(0, 100), (80, 200)]
+    from_first = Span("PER", 90, 95, 0.9, "ml")
+    from_second = Span("PER", 90, 95, 0.7, "ml")
+    # Début exactement sur la frontière : possédé par la seconde fenêtre
+    assert merge_window_entities(windows, [[from_first], [from_second]]) == [from_second]
+    # Avant la frontière : seule la première fenêtre compte
+    before = Span("LOC", 89, 92, 0.9, "ml")
+    assert merge_window_entities(windows, [[], [before]]) == []
+    assert merge_window_entities(windows, [[before], []]) == [before]
+
+
+def test_residual_overlap_first_entity_wins():
+    windows = [(0, 100), (80, 200)]
+    # Entité de la première fenêtre qui déborde sur la zone de la seconde
+    long_entity = Span("ORG", 86, 96, 0.9, "ml")
+    inside = Span("PER", 92, 94, 0.9, "ml")
+    later = Span("PER", 150, 155, 0.9, "ml")
+    merged = merge_window_entities(windows, [[long_entity], [inside, later]])
+    assert merged == [long_entity, later]
+
+
+def test_non_overlapping_windows_split_at_next_start():
+    windows = [(0, 50), (50, 100)]
+    a = Span("PER", 49, 52, 0.9, "ml")
+    b = Span("PER", 50, 53, 0.9, "ml")
+    assert merge_window_entities(windows, [[a], [b]]) == [a]
+    assert merge_window_entities(windows, [[b], [b]]) == [b]
@@ -0,0 +1,143 @@
+# ------------------------------------------------------------------------------------------------------------------------------------------------------------------
+# TESTS : DOCX MASQUE (SORTIE FICHIER)
+# Aller-retour extract_docx -> redact_docx sur un DOCX construit à la main : texte masqué dans les runs
+# (entité répartie sur plusieurs runs comprise), et aucune valeur d'entité dans aucune partie du zip de sortie
+# (suivi de modifications, codes de champ, auteurs, liens, propriétés du document, données XML personnalisées).
+# ------------------------------------------------------------------------------------------------------------------------------------------------------------------
+
+import io
+import zipfile
+from xml.etree import ElementTree
+
+from app.docx_stream import extract_docx, redact_docx
+from app.models import Span
+
+IBAN = "FR7630006000011234567890189"
+EMAIL = "jean.dupont@exemple.fr"
+NAME = "Jean Dupont"
+VALUES = [IBAN, EMAIL, NAME]
+
+W = 'xmlns:w="http://schemas.openxmlformats.org/wordprocessingml/2006/main"'
+R = 'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships"'
+WML = "application/vnd.openxmlformats-officedocument.wordprocessingml"
+
+CONTENT_TYPES = f"""<?xml version="1.0" encoding="UTF-8" standalone="yes"?>
+<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">
+<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>
+<Default Extension="xml" ContentType="application/xml"/>
+<Override PartName="/word/document.xml" ContentType="{WML}.document.main+xml"/>
+<Override PartName="/word/comments.xml" ContentType="{WML}.comments+xml"/>
+<Override PartName="/docProps/core.xml" ContentType="application/vnd.openxmlformats-package.core-properties+xml"/>
+<Override PartName="/docProps/app.xml" ContentType="application/vnd.openxmlformats-officedocument.extended-properties+xml"/>
+</Types>"""
+
+DOCUMENT = f"""<?xml version="1.0" encoding="UTF-8" standalone="yes"?>
+<w:document {W} {R}><w:body>
+<w:p><w:r><w:t xml:space="preserve">Titulaire : {NAME}, IBAN </w:t></w:r><w:r><w:rPr><w:b/></w:rPr><w:t>FR76300060</w:t></w:r><w:r><w:t>00011234567890189</w:t></w:r></w:p>
+<w:p><w:ins w:id="1" w:author="{NAME}" w:date="2024-01-01T00:00:00Z"><w:r><w:t>Contact : </w:t></w:r></w:ins><w:del w:id="2" w:author="{NAME}"><w:r><w:delText>ancien {IBAN}</w:delText></w:r></w:del><w:r><w:fldChar w:fldCharType="begin"/></w:r><w:r><w:instrText xml:space="preserve"> HYPERLINK "mailto:{EMAIL}" </w:instrText></w:r><w:r><w:fldChar w:fldCharType="separate"/></w:r><w:r><w:t>{EMAIL}</w:t></w:r><w:r><w:fldChar w:fldCharType="end"/></w:r></w:p>
+<w:p><w:fldSimple w:instr=" HYPERLINK &quot;mailto:{EMAIL}&quot; "><w:r><w:t>écrire</w:t></w:r></w:fldSimple><w:hyperlink r:id="rId9"><w:r><w:t>lien</w:t></w:r></w:hyperlink></w:p>
+</w:body></w:document>"""
+
+COMMENTS = f"""<?xml version="1.0" encoding="UTF-8" standalone="yes"?>
+<w:comments {W}><w:comment w:id="0" w:author="{NAME}" w:initials="JD"><w:p><w:r><w:t>Vérifier le compte</w:t></w:r></w:p></w:comment></w:comments>"""
+
+DOCUMENT_RELS = f"""<?xml version="1.0" encoding="UTF-8" standalone="yes"?>
+<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">
+<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/comments" Target="comments.xml"/>
+<Relationship Id="rId9" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/hyperlink" Target="mailto:{EMAIL}" TargetMode="External"/>
+</Relationships>"""
+
+CORE = f"""<?xml version="1.0" encoding="UTF-8" standalone="yes"?>
+<cp:coreProperties xmlns:cp="http://schemas.openxmlformats.org/package/2006/metadata/core-properties" xmlns:dc="http://purl.org/dc/elements/1.1/" xmlns:dcterms="http://purl.org/dc/terms/" xmlns:xsi="http://www.w3.org/2001/XMLSchema-instance">
+<dc:title>Dossier {NAME}</dc:title><dc:creator>{NAME}</dc:creator><cp:lastModifiedBy>{NAME}</cp:lastModifiedBy>
+<dcterms:created xsi:type="dcterms:W3CDTF">2024-01-01T00:00:00Z</dcterms:created>
+</cp:coreProperties>"""
+
+APP = f"""<?xml version="1.0" encoding="UTF-8" standalone="yes"?>
+<Properties xmlns="http://schemas.openxmlformats.org/officeDocument/2006/extended-properties" xmlns:vt="http://schemas.openxmlformats.org/officeDocument/2006/docPropsVTypes">
+<Company>Cabinet {NAME}</Company><Pages>1</Pages>
+</Properties>"""
+
+CUSTOM_XML = f"""<?xml version="1.0" encoding="UTF-8" standalone="yes"?>
+<client>
+  <nom>{NAME}</nom>
+  <iban>{IBAN}</iban>
+</client>"""
+
+
+def make_docx():
+    out = io.BytesIO()
+    with zipfile.ZipFile(out, "w", zipfile.ZIP_DEFLATED) as zf:
+        zf.writestr("[Content_Types].xml", CONTENT_TYPES)
+        zf.writestr("word/document.xml", DOCUMENT)
+        zf.writestr("word/comments.xml", COMMENTS)
+        zf.writestr("word/_rels/document.xml.rels", DOCUMENT_RELS)
+        zf.writestr("docProps/core.xml", CORE)
+        zf.writestr("docProps/app.xml", APP)
+        zf.writestr("customXml/item1.xml", CUSTOM_XML)
+    return out.getvalue()
+
+
+# Entités : toutes les occurrences des valeurs dans le texte extrait
+def find_spans(text):
+    spans = []
+    for value, kind in ((IBAN, "IBAN"), (EMAIL, "EMAIL"), (NAME, "PERSON")):
+        start = text.find(value)
+        while start != -1:
+            spans.append(Span(kind, start, start + len(value), 1.0))
+            start = text.find(value, start + 1)
+    return sorted(spans, key=lambda s: s.start)
+
+
+def redact(content):
+    extracted = extract_docx(content)
+    out = io.BytesIO()
+    redact_docx(content, extracted.text_map, find_spans(extracted.text), out, chunk_size=64)
+    return extracted, out.getvalue()
+
+
+def test_extracted_text_skips_revisions_and_field_codes():
+    text = extract_docx(make_docx()).text
+    assert text.split("\n") == [
+        f"Titulaire : {NAME}, IBAN {IBAN}",
+        f"Contact : {EMAIL}",
+        "écrirelien",
+        "Vérifier le compte",
+    ]
+
+
+def test_text_masked_in_runs():
+    _, redacted = redact(make_docx())
+    assert extract_docx(redacted).text.split("\n") == [
+        "Titulaire : <PERSON_MASKED>, IBAN <IBAN_MASKED>",
+        "Contact : <EMAIL_MASKED>",
+        "écrirelien",
+        "Vérifier le compte",
+    ]
+
+
+def test_no_entity_value_in_any_part():
+    _, redacted = redact(make_docx())
+    with zipfile.ZipFile(io.BytesIO(redacted)) as zf:
+        for name in zf.namelist():
+            data = zf.read(name).decode("utf-8")
+            for value in VALUES:
+                assert value not in data, (name, value)
+            # Chaque partie reste du XML bien formé
+            ElementTree.fromstring(data.encode("utf-8"))
+
+
+def test_structure_and_untouched_parts_kept():
+    content = make_docx()
+    _, redacted = redact(content)
+    with zipfile.ZipFile(io.BytesIO(content)) as zin, zipfile.ZipFile(io.BytesIO(redacted)) as zout:
+        assert zout.namelist() == zin.namelist()
+        assert zout.read("[Content_Types].xml") == zin.read("[Content_Types].xml")
+        document = zout.read("word/document.xml").decode()
+        core = zout.read("docProps/core.xml").decode()
+    # Mise en forme et champs conservés, codes de champ et texte supprimé retirés
+    assert "<w:b/>" in document and 'w:fldCharType="separate"' in document
+    assert "w:instrText" not in document and "w:del " not in document
+    assert 'w:author=""' in document and 'w:instr=""' in document
+    # Dates du document conservées
+    assert "2024-01-01T00:00:00Z</dcterms:created>" in core
@@ -0,0 +1,79 @@
+# ------------------------------------------------------------------------------------------------------------------------------------------------------------------
+# TESTS : FUSION DES ENTITES
+# fuse_sources : la source la plus prioritaire gagne, puis la plus confiante, puis la plus longue, puis la première
+# dans le texte ; aucun chevauchement en sortie, liste triée par position.
+# ------------------------------------------------------------------------------------------------------------------------------------------------------------------
+
+import random
+
+from app.entity_fusion import fuse_entities, fuse_sources
+from app.models import Span
+
+PRIORITY = ("rules", "general", "medical")
+
+
+def test_priority_beats_confidence():
+    rule = Span("IBAN", 10, 30, 0.5, "rules")
+    ml = Span("PER", 5, 15, 0.99, "general")
+    assert fuse_sources({"general": [ml], "rules": [rule]}, PRIORITY) == [rule]
+
+
+def test_priority_between_ml_sources():
+    general = Span("PER", 0, 10, 0.6, "general")
+    medical = Span("MEDICATION", 5, 20, 0.95, "medical")
+    assert fuse_sources({"medical": [medical], "general": [general]}, PRIORITY) == [general]
+    assert fuse_sources({"medical": [medical], "general": [general]}, ("medical", "general")) == [medical]
+
+
+def test_tie_break_confidence_then_length_then_position():
+    # Même source : la plus confiante
+    low, high = Span("PER", 0, 10, 0.6, "general"), Span("ORG", 5, 12, 0.9, "general")
+    assert fuse_sources({"general": [low, high]}, PRIORITY) == [high]
+    # Même confiance : la plus longue
+    short, long_ = Span("PER", 0, 6, 0.8, "general"), Span("ORG", 3, 15, 0.8, "general")
+    assert fuse_sources({"general": [short, long_]}, PRIORITY) == [long_]
+    # Même confiance et même longueur : la première dans le texte
+    first, second = Span("PER", 0, 8, 0.8, "general"), Span("ORG", 4, 12, 0.8, "general")
+    assert fuse_sources({"general": [second, first]}, PRIORITY) == [first]
+
+
+def test_unknown_sources_after_listed_ones_in_given_order():
+    listed = Span("PER", 0, 10, 0.1, "medical")
+    extra_a = Span("ORG", 2, 8, 0.9, "extra_a")
+    extra_b = Span("LOC", 12, 20, 0.9, "extra_b")
+    extra_b_overlap = Span("LOC", 15, 25, 0.99, "extra_c")
+    fused = fuse_sources({"extra_a": [extra_a], "extra_b": [extra_b], "extra_c": [extra_b_overlap],
+                          "medical": [listed]}, PRIORITY)
+    assert fused == [listed, extra_b]
+
+
+def test_empty_spans_dropped_and_touching_spans_kept():
+    empty = Span("PER", 5, 5, 1.0, "rules")
+    left, right = Span("PER", 0, 5, 0.9, "general"), Span("ORG", 5, 9, 0.9, "general")
+    assert fuse_sources({"rules": [empty], "general": [right, left]}, PRIORITY) == [left, right]
+
+
+def test_fuse_entities_rules_first():
+    rule = Span("EMAIL", 3, 20, 0.4, "rules")
+    ml = Span("PER", 0, 8, 0.99, "ml")
+    other = Span("LOC", 25, 30, 0.99, "ml")
+    assert fuse_entities([rule], [ml, other]) == [rule, other]
+
+
+def test_random_sources_sorted_without_overlap():
+    rng = random.Random(7)
+    sources = {}
+    for name in PRIORITY:
+        spans = []
+        for _ in range(300):
+            start = rng.randint(0, 5_000)
+            spans.append(Span("X", start, start + rng.randint(1, 40), rng.random(), name))
+        sources[name] = spans
+    fused = fuse_sources(sources, PRIORITY)
+
+    assert all(a.end <= b.start for a, b in zip(fused, fused[1:]))
+    # Toute entité des règles écartée chevauche une autre entité des règles gardée
+    kept_rules = [e for e in fused if e.source == "rules"]
+    for e in sources["rules"]:
+        if e not in fused:
+            assert any(k.start < e.end and e.start < k.end for k in kept_rules)
@@ -0,0 +1,85 @@
+# ------------------------------------------------------------------------------------------------------------------------------------------------------------------
+# TESTS : MASQUAGE
+# apply_masking (un seul parcours) donne exactement la sortie de l'ancien masquage (une reconstruction du texte
+# par entité) pour ALLOW, MASK et BLOCK ; même texte masqué via PipelineResult et via une entrée du cache.
+# ------------------------------------------------------------------------------------------------------------------------------------------------------------------
+
+import random
+
+import pytest
+
+from app.masking_engine import BLOCK_MESSAGE, apply_masking
+from app.models import Span
+from app.projection import PipelineResult
+from app.result_cache import entry_from_result, result_from_entry
+
+DECISIONS = ("ALLOW", "MASK", "BLOCK")
+
+
+# Ancienne implémentation : une copie complète du texte par entité.
+def legacy_masking(text, entities, decision):
+    if decision == "ALLOW":
+        return text
+    if decision == "BLOCK":
+        return BLOCK_MESSAGE
+    sanitized = text
+    for e in sorted(entities, key=lambda x: x.start, reverse=True):
+        sanitized = sanitized[:e.start] + f"<{e.type}_MASKED>" + sanitized[e.end:]
+    return sanitized
+
+
+# Texte aléatoire et entités sans chevauchement (sortie de la fusion), dans le désordre
+def make_case(seed, size=2_000):
+    rng = random.Random(seed)
+    text = "".join(rng.choice("abcdefghij klmnop éàè\n") for _ in range(size))
+    entities = []
+    pos = 0
+    while True:
+        start = pos + rng.randint(0, 60)
+        end = start + rng.randint(1, 20)
+        if end > size:
+            break
+        entities.append(Span(rng.choice(("PER", "IBAN", "EMAIL")), start, end, 1.0))
+        pos = end
+    rng.shuffle(entities)
+    return text, entities
+
+
+@pytest.mark.parametrize("seed", range(5))
+@pytest.mark.parametrize("decision", DECISIONS)
+def test_parity_with_legacy(seed, decision):
+    text, entities = make_case(seed)
+    assert apply_masking(text, entities, decision) == legacy_masking(text, entities, decision)
+
+
+def test_entities_at_text_edges():
+    text = "Jean paie FR7630006000011234567890189"
+    entities = [Span("IBAN", 10, len(text), 1.0), Span("PER", 0, 4, 0.9, "general")]
+    assert apply_masking(text, entities, "MASK") == "<PER_MASKED> paie <IBAN_MASKED>"
+    assert apply_masking(text, entities, "MASK") == legacy_masking(text, entities, "MASK")
+
+
+def test_no_entities_and_empty_text():
+    assert apply_masking("texte sans entité", [], "MASK") == "texte sans entité"
+    assert apply_masking("", [], "MASK") == ""
+    assert apply_masking("", [], "BLOCK") == BLOCK_MESSAGE
+
+
+def test_overlapping_entity_skipped():
+    # Entité qui chevauche la précédente : ignorée, le texte qui suit la première entité est gardé
+    text = "0123456789"
+    entities = [Span("A", 2, 6, 1.0), Span("B", 4, 8, 1.0)]
+    assert apply_masking(text, entities, "MASK") == "01<A_MASKED>6789"
+
+
+@pytest.mark.parametrize("decision", DECISIONS)
+def test_pipeline_result_and_cache_entry_same_text(decision):
+    text, entities = make_case(42)
+    result = PipelineResult(text, decision, 0.5, sorted(entities, key=lambda e: e.start), {})
+    expected = legacy_masking(text, entities, decision)
+    assert result.sanitized_text == expected
+
+    # Entrée de cache sans texte : le masquage est recalculé à partir du texte de la requête
+    entry = entry_from_result(result, text, store_raw_text=False)
+    assert entry.raw_text is None
+    assert result_from_entry(entry, text).sanitized_text == expected
@@ -0,0 +1,73 @@
+# ------------------------------------------------------------------------------------------------------------------------------------------------------------------
+# TESTS : NOMBRE DE PAGES PDF
+# Un PDF dont le champ /Count ne correspond pas aux pages réelles : toutes les pages doivent être extraites
+# (modes 'layout' et 'fast') et comptées dans la limite max_pages.
+# ------------------------------------------------------------------------------------------------------------------------------------------------------------------
+
+import io
+
+import pytest
+
+# app.ingestion importe l'OCR (pytesseract) : test ignoré si la dépendance n'est pas installée
+pytest.importorskip("pytesseract")
+
+from app.ingestion import (  # noqa: E402
+    IngestionLimitError, check_pdf_pages, count_pdf_pages, extract_pdf_page_range, ingest_file, iter_pdf_pages,
+)
+
+
+# PDF minimal (Helvetica), une ligne de texte par page ; declared_count : valeur écrite dans /Count.
+def make_pdf(lines, declared_count):
+    kids = " ".join(f"{4 + 2 * i} 0 R" for i in range(len(lines)))
+    objects = [
+        b"<< /Type /Catalog /Pages 2 0 R >>",
+        f"<< /Type /Pages /Kids [{kids}] /Count {declared_count} >>".encode(),
+        b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>",
+    ]
+    for i, line in enumerate(lines):
+        stream = f"BT /F1 12 Tf 50 800 Td ({line}) Tj ET".encode()
+        objects.append(f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 595 842] "
+                       f"/Resources << /Font << /F1 3 0 R >> >> /Contents {5 + 2 * i} 0 R >>".encode())
+        objects.append(b"<< /Length %d >>\nstream\n" % len(stream) + stream + b"\nendstream")
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(len(out))
+        out += b"%d 0 obj\n" % number + body + b"\nendobj\n"
+    xref = len(out)
+    out += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    for offset in offsets:
+        out += b"%010d 00000 n \n" % offset
+    out += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref)
+    return bytes(out)
+
+
+LINES = [f"Page {n} IBAN FR7630006000011234567890189" for n in range(1, 6)]
+PDF = make_pdf(LINES, declared_count=1)
+
+
+def test_count_walks_page_tree():
+    assert count_pdf_pages(io.BytesIO(PDF)) == 5
+
+
+@pytest.mark.parametrize("mode", ["layout", "fast"])
+def test_all_pages_extracted(mode):
+    count = count_pdf_pages(io.BytesIO(PDF))
+    pages = extract_pdf_page_range(PDF, 0, count, mode)
+    assert [text.strip() for text, _ in pages] == LINES
+
+
+@pytest.mark.parametrize("mode", ["layout", "fast"])
+def test_streaming_matches_count(mode):
+    assert [number for number, _ in iter_pdf_pages(io.BytesIO(PDF), mode)] == [1, 2, 3, 4, 5]
+
+
+def test_max_pages_uses_real_count():
+    with pytest.raises(IngestionLimitError):
+        check_pdf_pages(io.BytesIO(PDF), {"max_pages": 3})
+
+
+def test_ingest_file_reads_every_page():
+    result = ingest_file(PDF, "declared.pdf", "application/pdf")
+    assert result.metadata["pages"] == 5
+    assert all(line in result.raw_text for line in LINES)
@@ -0,0 +1,121 @@
+# ------------------------------------------------------------------------------------------------------------------------------------------------------------------
+# TESTS : CACHE DES RESULTATS
+# Regroupement des requêtes identiques (un leader calcule, les autres attendent), échec et abandon du leader,
+# clé liée à la version de configuration, éviction LRU et expiration.
+# ------------------------------------------------------------------------------------------------------------------------------------------------------------------
+
+import threading
+import time
+
+import pytest
+
+from app.result_cache import CachedResult, ResultCache
+
+
+def make_entry(size=500):
+    return CachedResult(decision="MASK", risk_score=0.5, spans=[("PER", 0, 4, 0.9, "general")], metadata={},
+                        size=size)
+
+
+def test_coalescing_single_leader():
+    cache = ResultCache()
+    key = cache.make_key("text", b"bonjour", 1)
+
+    entry, leader_future, is_leader = cache.begin(key)
+    assert entry is None and is_leader
+    _, waiter_future, waiter_is_leader = cache.begin(key)
+    assert not waiter_is_leader and waiter_future is leader_future
+    assert cache.stats()["coalesced"] == 1 and cache.stats()["inflight"] == 1
+
+    result = make_entry()
+    cache.complete(key, result)
+    assert waiter_future.result(timeout=1) is result
+    # Requête suivante : servie par le cache
+    assert cache.begin(key) == (result, None, False)
+    assert cache.stats()["inflight"] == 0 and cache.stats()["hits"] == 1
+
+
+def test_concurrent_begin_elects_one_leader():
+    cache = ResultCache()
+    key = cache.make_key("text", b"meme texte", 1)
+    barrier = threading.Barrier(16)
+    leaders = []
+    served = []
+
+    def request():
+        barrier.wait()
+        entry, future, is_leader = cache.begin(key)
+        if is_leader:
+            leaders.append(future)
+            cache.complete(key, make_entry())
+        # Entrée du cache, ou résultat du leader
+        served.append(entry if future is None else future.result(timeout=5))
+
+    threads = [threading.Thread(target=request) for _ in range(16)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert len(leaders) == 1
+    assert len(served) == 16 and all(entry is not None for entry in served)
+
+
+def test_leader_failure_shared_and_not_stored():
+    cache = ResultCache()
+    key = cache.make_key("text", b"erreur", 1)
+    cache.begin(key)
+    _, waiter_future, _ = cache.begin(key)
+
+    cache.fail(key, RuntimeError("modèle indisponible"))
+    with pytest.raises(RuntimeError):
+        waiter_future.result(timeout=1)
+    # Rien n'est stocké : la requête suivante recalcule
+    entry, _, is_leader = cache.begin(key)
+    assert entry is None and is_leader
+
+
+def test_leader_abandon_lets_waiters_retry():
+    cache = ResultCache()
+    key = cache.make_key("text", b"annule", 1)
+    cache.begin(key)
+    _, waiter_future, _ = cache.begin(key)
+
+    cache.abandon(key)
+    assert waiter_future.result(timeout=1) is None
+    entry, _, is_leader = cache.begin(key)
+    assert entry is None and is_leader
+    assert cache.stats()["entries"] == 0
+
+
+def test_key_depends_on_config_version_and_parts():
+    key = ResultCache.make_key("file", b"contenu", 1, "a.pdf", "application/pdf")
+    assert key != ResultCache.make_key("file", b"contenu", 2, "a.pdf", "application/pdf")
+    assert key != ResultCache.make_key("file", b"contenu", 1, "b.pdf", "application/pdf")
+    assert key != ResultCache.make_key("text", b"contenu", 1, "a.pdf", "application/pdf")
+    assert key == ResultCache.make_key("file", b"contenu", 1, "a.pdf", "application/pdf")
+
+
+def test_lru_eviction_by_entries_and_bytes():
+    cache = ResultCache(max_entries=2, max_bytes=10_000)
+    cache.put("a", make_entry())
+    cache.put("b", make_entry())
+    assert cache.get("a") is not None  # "a" devient la plus récente
+    cache.put("c", make_entry())
+    assert cache.get("b") is None and cache.get("a") is not None and cache.get("c") is not None
+
+    cache = ResultCache(max_entries=10, max_bytes=1_000)
+    cache.put("a", make_entry(600))
+    cache.put("b", make_entry(600))
+    assert cache.get("a") is None and cache.get("b") is not None
+    # Plus grosse que le cache entier : pas stockée
+    cache.put("big", make_entry(2_000))
+    assert cache.get("big") is None and cache.stats()["bytes"] == 600
+
+
+def test_ttl_expiration():
+    cache = ResultCache(ttl_seconds=0.05)
+    cache.put("a", make_entry())
+    assert cache.get("a") is not None
+    time.sleep(0.1)
+    assert cache.get("a") is None
+    assert cache.stats()["expirations"] == 1 and cache.stats()["entries"] == 0